@@ -0,0 +1,172 @@
+import asyncio
+from typing import Dict, List, Optional, Set
+from config import BALANCE_BATCH_SIZE, BALANCE_BATCH_WINDOW, BALANCE_BATCH_MODE, CACHE_TIMEOUT, BALANCE_CACHE_MAX_ENTRIES
+from cache import TTLCache
+
+LAMPORTS_PER_SOL = 1_000_000_000
+
+class BalanceService:
+    """
+    Agrupa consultas de saldo de várias origens em poucas requisições RPC
+    Cada chamador recebe um future; a cada janela curta (ou lote cheio) os
+    wallets pendentes viram chamadas getMultipleAccounts de até 100 chaves
+    (ou arrays JSON-RPC batch de getBalance) e todos os futures são resolvidos juntos
+    Saldos já consultados ficam em cache por CACHE_TIMEOUT segundos
+    Uma wallet já em busca não é consultada de novo: o novo chamador
+    espera o mesmo resultado (single-flight por wallet)
+    """
+    def __init__(self, rpc):
+        self.rpc = rpc  # Instância de SolanaRPC (rpc_request / rpc_batch_request)
+        self.batch_size = min(BALANCE_BATCH_SIZE, 100)  # getMultipleAccounts aceita no máximo 100 chaves
+        self.batch_window = BALANCE_BATCH_WINDOW
+        self.mode = BALANCE_BATCH_MODE
+        self._pending: Dict[str, List[asyncio.Future]] = {}
+        self._in_flight: Dict[str, List[asyncio.Future]] = {}  # Wallets do lote sendo buscado agora
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_tasks: Set[asyncio.Task] = set()  # Referência forte até o lote terminar
+        self.cache = TTLCache(ttl=CACHE_TIMEOUT, max_entries=BALANCE_CACHE_MAX_ENTRIES, name='balances')
+        self.batches_sent = 0
+        self.wallets_resolved = 0
+
+    async def get_balance(self, wallet_address: str) -> float:
+        """Saldo de uma wallet em SOL, agrupado com outras consultas simultâneas"""
+        cached = self.cache.get(wallet_address)
+        if cached is not None:
+            return cached
+        
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        in_flight = self._in_flight.get(wallet_address)
+        if in_flight is not None:
+            # Já está em um lote em andamento: espera o mesmo resultado
+            in_flight.append(future)
+            return await future
+        self._pending.setdefault(wallet_address, []).append(future)
+
+        if len(self._pending) >= self.batch_size:
+            # Lote cheio: envia imediatamente
+            self._schedule_flush(loop, delay=0)
+        elif self._flush_handle is None:
+            self._schedule_flush(loop, delay=self.batch_window)
+
+        return await future
+
+    async def get_balances(self, wallets: List[str]) -> Dict[str, float]:
+        """Saldos de várias wallets de uma vez (wallet -> SOL)"""
+        unique_wallets = list(dict.fromkeys(w for w in wallets if w))
+        if not unique_wallets:
+            return {}
+        balances = await asyncio.gather(*[self.get_balance(w) for w in unique_wallets])
+        return dict(zip(unique_wallets, balances))
+
+    def print_cache_stats(self):
+        stats = self.cache.stats()
+        print(f"💾 Cache de saldos: {stats['hits']} hits / {stats['misses']} misses ({stats['hit_ratio']:.0%}), {stats['entries']} wallets")
+
+    def cached_balances(self, wallets: List[str]) -> Dict[str, float]:
+        """Saldos que já estão no cache (sem nenhuma requisição)"""
+        balances = {}
+        for wallet in wallets:
+            balance = self.cache.peek(wallet)
+            if balance is not None:
+                balances[wallet] = balance
+        return balances
+
+    def _schedule_flush(self, loop: asyncio.AbstractEventLoop, delay: float):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self._flush_handle = loop.call_later(delay, self._start_flush, loop)
+
+    def _start_flush(self, loop: asyncio.AbstractEventLoop):
+        task = loop.create_task(self._flush())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_done)
+
+    def _flush_done(self, task: asyncio.Task):
+        self._flush_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"❌ Erro no envio do lote de saldos: {task.exception()!r}")
+
+    async def _flush(self):
+        """Envia todos os wallets pendentes em lotes e resolve os futures"""
+        self._flush_handle = None
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        self._in_flight.update(pending)
+        try:
+            await self._resolve(pending)
+        except BaseException as e:
+            # Erro inesperado (ou cancelamento): nenhum chamador fica esperando para sempre
+            for wallet, futures in pending.items():
+                self._in_flight.pop(wallet, None)
+                for future in futures:
+                    if future.done():
+                        continue
+                    if isinstance(e, Exception):
+                        future.set_exception(e)
+                    else:
+                        future.cancel()
+            raise
+
+    async def _resolve(self, pending: Dict[str, List[asyncio.Future]]):
+        wallets = list(pending.keys())
+        chunks = [wallets[i:i + self.batch_size] for i in range(0, len(wallets), self.batch_size)]
+        print(f"💰 Buscando saldos em lote: {len(wallets)} wallets em {len(chunks)} requisições")
+
+        results = await asyncio.gather(*[self._fetch_chunk(chunk) for chunk in chunks], return_exceptions=True)
+
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                print(f"⚠️ Erro ao buscar lote de saldos: {result}")
+                result = {}
+            for wallet in chunk:
+                balance = result.get(wallet)
+                if balance is None:
+                    balance = 0.0  # Falha na consulta: não vai para o cache
+                else:
+                    self.cache.set(wallet, balance)
+                self._in_flight.pop(wallet, None)
+                for future in pending[wallet]:
+                    if not future.done():
+                        future.set_result(balance)
+                self.wallets_resolved += 1
+
+    async def _fetch_chunk(self, wallets: List[str]) -> Dict[str, float]:
+        self.batches_sent += 1
+        if self.mode == 'jsonrpc_batch':
+            return await self._fetch_chunk_jsonrpc_batch(wallets)
+        return await self._fetch_chunk_multiple_accounts(wallets)
+
+    async def _fetch_chunk_multiple_accounts(self, wallets: List[str]) -> Dict[str, float]:
+        """Um getMultipleAccounts sem dados da conta (só lamports)"""
+        params = [
+            wallets,
+            {
+                "encoding": "base64",
+                "dataSlice": {"offset": 0, "length": 0},
+                "commitment": "confirmed"
+            }
+        ]
+        result = await self.rpc.rpc_request("getMultipleAccounts", params)
+        if not result or 'value' not in result:
+            return {}
+
+        balances = {}
+        for wallet, account in zip(wallets, result['value']):
+            # Conta inexistente vem como null = saldo zero
+            lamports = account.get('lamports', 0) if account else 0
+            balances[wallet] = lamports / LAMPORTS_PER_SOL
+        return balances
+
+    async def _fetch_chunk_jsonrpc_batch(self, wallets: List[str]) -> Dict[str, float]:
+        """Um array JSON-RPC batch com um getBalance por wallet"""
+        calls = [("getBalance", [wallet, {"commitment": "confirmed"}]) for wallet in wallets]
+        results = await self.rpc.rpc_batch_request(calls)
+
+        balances = {}
+        for wallet, result in zip(wallets, results):
+            if result and 'value' in result:
+                balances[wallet] = result['value'] / LAMPORTS_PER_SOL
+        return balances
@@ -0,0 +1,239 @@
+"""
+Benchmark ponta a ponta da busca de compradores via RPC, contra o mock_rpc_server.py (sem rede)
+
+Para cada tamanho de token (small, medium, huge) roda extract_buyers_from_mint em um
+processo novo (caches frios, pico de memória isolado) e mostra: tempo total,
+requisições por segundo, chamadas RPC por wallet, pico de RSS e bytes recebidos
+(JSON descomprimido e na rede).
+
+Com --decode N compara, transação a transação, o getTransaction em jsonParsed com o
+base64 decodificado pelo solders: bytes da resposta e tempo de decodificação
+(contra o mock ou um RPC real com --rpc-url e --mint).
+
+Uso: python benchmark.py --sizes small,medium,huge --latency 0.05 --jitter 0.02 --rate-429 0.01
+     python benchmark.py --holder-mode program_accounts
+     python benchmark.py --discovery auto
+     python benchmark.py --decode 200 [--rpc-url https://... --mint <endereço>]
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULT_PREFIX = 'BENCHMARK_RESULT '
+
+def http_json(url: str, method: str = 'GET'):
+    request = urllib.request.Request(url, method=method, data=b'' if method == 'POST' else None)
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read())
+
+def peak_rss_mb() -> float:
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+async def run_child(size: str, rpc_url: str, planner: bool) -> dict:
+    """Executa a busca de um token (processo filho, já apontado para o mock)"""
+    from solana_rpc import solana_rpc
+    from solscan_api import solscan_api
+    from http_session import http_session
+    from metrics import metrics
+
+    mint = http_json(f"{rpc_url}mints")[size]
+    # Metadados fixos: a busca não sai para Solscan/Jupiter
+    solana_rpc.metadata._loaded = True
+    solana_rpc.metadata.cache.set(mint, {'name': f'Benchmark {size}', 'symbol': size.upper(),
+                                         'decimals': 6, 'source': 'benchmark'})
+    http_json(f"{rpc_url}reset", method='POST')
+
+    started = time.perf_counter()
+    if planner:
+        buyers, _, _ = await solscan_api.extract_buyers(mint)
+    else:
+        buyers, _, _ = await solana_rpc.extract_buyers_from_mint(mint)
+    wall = time.perf_counter() - started
+    await http_session.close()
+
+    stats = http_json(f"{rpc_url}stats")
+    calls = stats['total_calls']
+    return {
+        'size': size,
+        'wallets': len(buyers),
+        'wall_seconds': round(wall, 3),
+        'rpc_calls': calls,
+        'http_requests': stats['http_requests'],
+        'throttled': stats['throttled'],
+        'calls_per_second': round(calls / wall, 1) if wall else 0.0,
+        'calls_per_wallet': round(calls / len(buyers), 2) if buyers else 0.0,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'json_mb': round(metrics.counter_total('rpc_response_bytes_total') / 1_048_576, 2),
+        'wire_mb': round(metrics.counter_total('rpc_wire_bytes_total') / 1_048_576, 2),
+        'calls': stats['calls']
+    }
+
+async def run_decode(rpc_url: str, mint: str, count: int) -> dict:
+    """Mesmas transações nas duas codificações: bytes e tempo de decodificação por transação"""
+    from solana_rpc import solana_rpc
+    from transport import transport
+    from http_session import http_session
+    from tx_store import trim_transaction
+    from tx_decoder import decode_transaction, decode_available
+
+    if not decode_available():
+        raise RuntimeError('solders não está instalado')
+
+    async def call(method: str, params: list, wire: list = None):
+        payload = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
+        response = await transport.request('rpc', method, 'POST', rpc_url, params, json_body=payload, timeout=60)
+        if wire is not None:
+            wire.append(response.wire_size)
+        return response.body
+
+    accounts = json.loads(await call('getTokenLargestAccounts', [mint]))['result']['value']
+    signatures = []
+    for account in accounts:
+        page = json.loads(await call('getSignaturesForAddress', [account['address'], {'limit': count}]))['result']
+        signatures += [item['signature'] for item in page]
+        if len(signatures) >= count:
+            break
+    signatures = signatures[:count]
+
+    results = {}
+    for encoding, decode in (('jsonParsed', trim_transaction), ('base64', decode_transaction)):
+        wire = []
+        bodies = [await call('getTransaction', solana_rpc.transaction_params(sig, encoding), wire) for sig in signatures]
+        started = time.perf_counter()
+        decoded = [decode(json.loads(body)['result']) for body in bodies]
+        elapsed = time.perf_counter() - started
+        results[encoding] = {
+            'bytes_per_tx': round(sum(len(body) for body in bodies) / len(bodies)),
+            'wire_bytes_per_tx': round(sum(wire) / len(wire)),
+            'decode_us_per_tx': round(elapsed / len(bodies) * 1e6, 1),
+            'first_keys': [tx['transaction']['message']['accountKeys'][:3] for tx in decoded]
+        }
+    await http_session.close()
+
+    same = results['jsonParsed'].pop('first_keys') == results['base64'].pop('first_keys')
+    return {'transactions': len(signatures), 'same_account_keys': same, **results}
+
+def print_decode(result: dict):
+    print(f"{'encoding':<11} {'bytes/tx':>9} {'rede/tx':>8} {'decode(us)/tx':>14}")
+    print('-' * 45)
+    for encoding in ('jsonParsed', 'base64'):
+        r = result[encoding]
+        print(f"{encoding:<11} {r['bytes_per_tx']:>9} {r['wire_bytes_per_tx']:>8} {r['decode_us_per_tx']:>14.1f}")
+    parsed, packed = result['jsonParsed'], result['base64']
+    print(f"\n📦 base64: {packed['bytes_per_tx'] / parsed['bytes_per_tx']:.0%} dos bytes do jsonParsed | "
+          f"{result['transactions']} transações | accountKeys iguais: {'sim' if result['same_account_keys'] else 'NÃO'}")
+
+def start_mock(args) -> subprocess.Popen:
+    command = [sys.executable, os.path.join(HERE, 'mock_rpc_server.py'), '--port', str(args.port),
+               '--latency', str(args.latency), '--jitter', str(args.jitter),
+               '--rate-429', str(args.rate_429), '--max-concurrency', str(args.max_concurrency)]
+    if args.fixtures:
+        command += ['--fixtures', args.fixtures]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{args.port}/"
+    for _ in range(100):
+        try:
+            http_json(f"{url}stats")
+            return process
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError(f"mock_rpc_server.py terminou (código {process.returncode})")
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError('mock_rpc_server.py não respondeu')
+
+def run_size(size: str, rpc_url: str, verbose: bool, holder_mode: str, discovery: Optional[str]) -> dict:
+    env = dict(os.environ, HELIUS_RPC_URL=rpc_url, EXTRA_RPC_URLS='', HOLDER_DISCOVERY_MODE=holder_mode,
+               DISCOVERY_STRATEGY=discovery or 'auto', SOLSCAN_PRO_API_KEY='',
+               TX_STORE_ENABLED='false', METADATA_CACHE_PATH='', METRICS_ENABLED='false')
+    command = [sys.executable, os.path.abspath(__file__), '--child', size, '--rpc-url', rpc_url]
+    if discovery:
+        command.append('--planner')
+    completed = subprocess.run(command,
+                               env=env, cwd=HERE, capture_output=True, text=True)
+    if verbose:
+        sys.stdout.write(completed.stdout)
+    for line in reversed(completed.stdout.splitlines()):
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    raise RuntimeError(f"Benchmark {size} falhou:\n{completed.stderr[-2000:]}")
+
+def print_table(results: list):
+    header = (f"{'tamanho':<8} {'wallets':>8} {'tempo(s)':>9} {'chamadas':>9} {'req/s':>8} {'cham/wallet':>12} "
+              f"{'429':>5} {'RSS(MB)':>8} {'JSON(MB)':>9} {'rede(MB)':>9}")
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        print(f"{r['size']:<8} {r['wallets']:>8} {r['wall_seconds']:>9.2f} {r['rpc_calls']:>9} "
+              f"{r['calls_per_second']:>8.1f} {r['calls_per_wallet']:>12.2f} {r['throttled']:>5} {r['peak_rss_mb']:>8.1f} "
+              f"{r['json_mb']:>9.2f} {r['wire_mb']:>9.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da busca de compradores contra o RPC local')
+    parser.add_argument('--sizes', default='small,medium,huge', help='Tamanhos separados por vírgula')
+    parser.add_argument('--port', type=int, default=8899)
+    parser.add_argument('--rpc-url', help='Usa um RPC (mock) já em execução em vez de iniciar um')
+    parser.add_argument('--fixtures', help='Respostas gravadas repassadas ao mock')
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--jitter', type=float, default=0.01)
+    parser.add_argument('--rate-429', type=float, default=0.0)
+    parser.add_argument('--max-concurrency', type=int, default=0)
+    parser.add_argument('--holder-mode', default='largest_accounts', choices=['largest_accounts', 'program_accounts'],
+                        help='HOLDER_DISCOVERY_MODE usado na busca')
+    parser.add_argument('--discovery', choices=['auto', 'mint_signatures', 'largest_accounts', 'program_accounts'],
+                        help='Busca pelo planejador de descoberta (DISCOVERY_STRATEGY) em vez do RPC direto')
+    parser.add_argument('--json', help='Salva os resultados neste arquivo')
+    parser.add_argument('--verbose', action='store_true', help='Mostra a saída de cada busca')
+    parser.add_argument('--decode', type=int, metavar='N', help='Compara jsonParsed x base64 em N transações')
+    parser.add_argument('--mint', help='Token usado no --decode (padrão: token "medium" do mock)')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--planner', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = asyncio.run(run_child(args.child, args.rpc_url, args.planner))
+        print(RESULT_PREFIX + json.dumps(result))
+        return
+
+    process = None if args.rpc_url else start_mock(args)
+    rpc_url = args.rpc_url or f"http://127.0.0.1:{args.port}/"
+    if args.decode:
+        try:
+            mint = args.mint or http_json(f"{rpc_url}mints")['medium']
+            result = asyncio.run(run_decode(rpc_url, mint, args.decode))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+        print_decode(result)
+        return
+
+    results = []
+    try:
+        for size in [s.strip() for s in args.sizes.split(',') if s.strip()]:
+            print(f"⏱️ Rodando {size}...")
+            results.append(run_size(size, rpc_url, args.verbose, args.holder_mode, args.discovery))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    print()
+    print_table(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Resultados salvos em {args.json}")
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,18 @@
 import asyncio
 import logging
+import time
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, CallbackQueryHandler
 from solscan_api import solscan_api
-from config import TELEGRAM_BOT_TOKEN
+from solana_rpc import solana_rpc
+from http_session import http_session
+from transport import transport
+from tx_store import tx_store
+from overlap import WalletOverlapEngine
+from buyer_records import BuyerRecords
+from scheduler import JobScheduler
+from metrics import metrics
+from config import TELEGRAM_BOT_TOKEN, SOLANA_RPC_URLS, SAMEWALLETS_MAX_TOKENS, MAX_WALLETS_DISPLAY, ADMIN_USER_IDS
 
 # Configuração de logging
 logging.basicConfig(
@@ -12,9 +21,63 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+class BuyerProgress:
+    """
+    Mostra na mensagem de processamento as wallets já encontradas enquanto a busca roda
+    (o pipeline entrega cada comprador assim que o saldo dele chega)
+    A primeira wallet aparece na hora; depois, no máximo uma edição a cada INTERVAL segundos
+    """
+    INTERVAL = 3.0
+    SHOWN = 3
+
+    def __init__(self, message, text: str):
+        self.message = message
+        self.text = text
+        self.count = 0
+        self.first = []
+        self._last_edit = 0.0
+        self._task = None
+        self._closed = False
+
+    def __call__(self, buyer):
+        self.count += 1
+        if len(self.first) < self.SHOWN:
+            self.first.append(buyer['wallet'])
+        now = time.monotonic()
+        if self._closed or (self._task and not self._task.done()) or now - self._last_edit < self.INTERVAL:
+            return
+        self._last_edit = now
+        self._task = asyncio.create_task(self._edit())
+
+    async def _edit(self):
+        wallets = "\n".join(f"`{wallet}`" for wallet in self.first)
+        try:
+            await self.message.edit_text(
+                f"{self.text}\n\n📥 **{self.count} wallets encontradas até agora**\n{wallets}",
+                parse_mode='Markdown'
+            )
+        except Exception as e:
+            print(f"⚠️ Erro ao atualizar progresso: {e}")
+
+    async def close(self):
+        """Para as atualizações e espera a última edição (o resultado final não pode ser sobrescrito)"""
+        self._closed = True
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+
 class ListWalletBot:
     def __init__(self):
-        self.app = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+        self.app = (
+            Application.builder()
+            .token(TELEGRAM_BOT_TOKEN)
+            .post_init(self.on_startup)
+            .post_shutdown(self.on_shutdown)
+            .concurrent_updates(True)  # Um usuário não bloqueia os outros; a fila justa fica no scheduler
+            .build()
+        )
+        # Fila justa das buscas pesadas (limite global e por usuário, rodízio entre usuários)
+        self.scheduler = JobScheduler()
+        metrics.register_collector(self.collect_metrics)
         # Armazena configurações de saldo mínimo por usuário
         self.user_min_balance = {}  # user_id -> min_balance_sol
         # Armazena estado do comando samewallets por usuário
@@ -23,12 +86,82 @@ class ListWalletBot:
     
     def setup_handlers(self):
         """Configura os handlers do bot"""
-        self.app.add_handler(CommandHandler("start", self.start_command))
-        self.app.add_handler(CommandHandler("help", self.help_command))
-        self.app.add_handler(CommandHandler("balance", self.balance_command))
-        self.app.add_handler(CommandHandler("samewallets", self.samewallets_command))
-        self.app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
-        self.app.add_handler(CallbackQueryHandler(self.button_callback))
+        self.app.add_handler(CommandHandler("start", self.instrumented("start", self.start_command)))
+        self.app.add_handler(CommandHandler("help", self.instrumented("help", self.help_command)))
+        self.app.add_handler(CommandHandler("balance", self.instrumented("balance", self.balance_command)))
+        self.app.add_handler(CommandHandler("samewallets", self.instrumented("samewallets", self.samewallets_command)))
+        self.app.add_handler(CommandHandler("stats", self.instrumented("stats", self.stats_command)))
+        self.app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.instrumented("message", self.handle_message)))
+        self.app.add_handler(CallbackQueryHandler(self.instrumented("button", self.button_callback)))
+    
+    def instrumented(self, command, handler):
+        """Envolve o handler registrando duração e resultado (métricas bot_command_*)"""
+        async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            started = time.monotonic()
+            outcome = 'ok'
+            try:
+                return await handler(update, context)
+            except Exception:
+                outcome = 'error'
+                raise
+            finally:
+                metrics.observe('bot_command_duration_seconds', time.monotonic() - started, command=command)
+                metrics.inc('bot_commands_total', command=command, outcome=outcome)
+        return wrapper
+    
+    def collect_metrics(self):
+        """Métricas lidas na hora: fila de buscas e buscas compartilhadas"""
+        jobs = self.scheduler.snapshot()
+        yield 'jobs_running', 'gauge', {}, jobs['running']
+        yield 'jobs_queued', 'gauge', {}, jobs['queued']
+        yield 'jobs_started_total', 'counter', {}, jobs['started']
+        yield 'jobs_fast_lane_total', 'counter', {}, jobs['fast_lane']
+        yield 'jobs_max_wait_seconds', 'gauge', {}, jobs['max_wait']
+        yield 'scans_shared_total', 'counter', {}, solscan_api.scans.shared
+    
+    def queue_notifier(self, processing_msg, processing_text):
+        """Atualiza a mensagem de processamento com a posição na fila"""
+        async def notify(position, estimate):
+            await processing_msg.edit_text(
+                f"{processing_text}\n\n"
+                f"🕒 **Na fila:** posição {position}\n"
+                f"⏳ **Espera estimada:** ~{estimate:.0f}s",
+                parse_mode='Markdown'
+            )
+        return notify
+    
+    async def show_queue_wait(self, processing_msg, processing_text, ticket):
+        """Se o pedido ficou na fila, mostra quanto tempo esperou"""
+        if not ticket.position:
+            return
+        try:
+            await processing_msg.edit_text(
+                f"{processing_text}\n\n⏱️ **Aguardou {ticket.waited:.0f}s na fila** - iniciando busca...",
+                parse_mode='Markdown'
+            )
+        except Exception as e:
+            print(f"⚠️ Erro ao atualizar mensagem: {e}")
+    
+    async def on_startup(self, application: Application):
+        """Abre a sessão HTTP compartilhada e aquece as conexões com os RPCs"""
+        if transport.live:
+            await http_session.get_session()
+            await http_session.warmup(SOLANA_RPC_URLS)
+        else:
+            print(f"📼 Modo replay: respostas de {transport.path}, sem rede")
+        try:
+            await metrics.start_server()
+        except OSError as e:
+            print(f"⚠️ Não foi possível abrir o endpoint de métricas: {e}")
+    
+    async def on_shutdown(self, application: Application):
+        """Fecha a sessão HTTP compartilhada ao encerrar o bot"""
+        await metrics.stop_server()
+        await solana_rpc.metadata.flush()  # Grava o cache de metadados pendente
+        await http_session.close()
+        transport.close()
+        if tx_store is not None:
+            tx_store.close()  # Grava as escritas pendentes
     
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Comando /start"""
@@ -172,6 +305,49 @@ Com `/balance 2`, apenas wallets com 2+ SOL aparecerão nos resultados.
                 parse_mode='Markdown'
             )
     
+    async def stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Comando /stats (apenas administradores): resumo das métricas"""
+        if update.effective_user.id not in ADMIN_USER_IDS:
+            await update.message.reply_text("❌ Comando disponível apenas para administradores.")
+            return
+        
+        uptime = time.time() - metrics.started_at
+        lines = [f"⏱️ Uptime: {uptime / 3600:.1f}h", "", "📡 RPC por método (qtd | média | p95 | rede):"]
+        for method, item in sorted(metrics.summary('rpc_request_duration_seconds', by='method').items()):
+            wire = metrics.counter_total('rpc_wire_bytes_total', method=method)
+            lines.append(f"  {method}: {item['count']} | {item['avg'] * 1000:.0f}ms | ≤{item['p95'] * 1000:.0f}ms | "
+                         f"{wire / 1_048_576:.1f} MB")
+        
+        rate_limited = metrics.counter_total('rpc_responses_total', status=429)
+        retries = metrics.counter_total('rpc_retries_total')
+        received = metrics.counter_total('rpc_response_bytes_total')
+        wire = metrics.counter_total('rpc_wire_bytes_total')
+        lines.append(f"  429: {rate_limited:.0f} | retries: {retries:.0f} | "
+                     f"recebido: {received / 1_048_576:.1f} MB ({wire / 1_048_576:.1f} MB na rede)")
+        
+        solscan = metrics.summary('solscan_request_duration_seconds', by='endpoint')
+        if solscan:
+            lines += ["", "🔗 Solscan (qtd | média):"]
+            lines += [f"  {name}: {item['count']} | {item['avg'] * 1000:.0f}ms" for name, item in sorted(solscan.items())]
+        
+        gauges = metrics.collect_gauges()
+        lines += ["", "💾 Caches (hit ratio | entradas):"]
+        for key, (_, ratio) in gauges.get('cache_hit_ratio', {}).items():
+            entries = gauges.get('cache_entries', {}).get(key, ('', 0))[1]
+            lines.append(f"  {dict(key)['cache']}: {ratio:.0%} | {entries:.0f}")
+        
+        lines += ["", "🌐 Endpoints (limite | em voo | erro):"]
+        for key, (_, limit) in gauges.get('rpc_concurrency_limit', {}).items():
+            in_flight = gauges['rpc_in_flight'][key][1]
+            error_rate = gauges['rpc_endpoint_error_rate'][key][1]
+            lines.append(f"  {dict(key)['endpoint'][:30]}: {limit:.1f} | {in_flight:.0f} | {error_rate:.0%}")
+        
+        jobs = self.scheduler.snapshot()
+        lines += ["", f"📋 Fila: {jobs['running']} em execução, {jobs['queued']} aguardando, "
+                      f"{jobs['fast_lane']} via rápida, espera máx {jobs['max_wait']:.0f}s"]
+        
+        await update.message.reply_text("📈 Estatísticas\n\n" + "\n".join(lines))
+    
     async def samewallets_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Comando /samewallets para encontrar wallets que compraram múltiplos tokens"""
         user_id = update.effective_user.id
@@ -184,7 +360,7 @@ Com `/balance 2`, apenas wallets com 2+ SOL aparecerão nos resultados.
         # Modo interativo - solicita tokens
         self.samewallets_waiting[user_id] = True
         
-        help_text = """
+        help_text = f"""
 🔍 **Comando /samewallets - Modo Interativo**
 
 📝 **Agora envie os endereços dos tokens que você quer analisar:**
@@ -197,12 +373,13 @@ BxrYotq7fzH5tw4k4UQyekYje8n7rhNNgRCwa5Shpump
 ```
 
 ⚙️ **Instruções:**
-• Envie **2-5 tokens** (um por linha)
+• Envie **2-{SAMEWALLETS_MAX_TOKENS} tokens** (um por linha)
 • Cole cada endereço em uma mensagem separada OU
 • Cole todos os endereços de uma vez (separados por quebra de linha)
+• Adicione `min=3` para wallets que compraram **pelo menos 3** dos tokens
 • Digite `/cancel` para cancelar
 
-🎯 **O bot encontrará wallets que compraram TODOS os tokens listados**
+🎯 **O bot encontrará wallets que compraram TODOS os tokens listados (ou pelo menos `min`)**
 
 💡 **Aguardando seus tokens...**
         """
@@ -210,9 +387,25 @@ BxrYotq7fzH5tw4k4UQyekYje8n7rhNNgRCwa5Shpump
         await update.message.reply_text(help_text, parse_mode='Markdown')
         print(f"✅ Usuário {user_id} iniciou modo interativo /samewallets")
     
+    def split_min_tokens(self, items):
+        """
+        Separa a opção `min=K` (ou `k=K`) da lista de tokens
+        Retorna (tokens, K) - K é None quando não informado (todos os tokens)
+        """
+        tokens = []
+        min_tokens = None
+        for item in items:
+            key, sep, value = item.partition('=')
+            if sep and key.lower() in ('min', 'k') and value.isdigit():
+                min_tokens = int(value)
+            else:
+                tokens.append(item)
+        return tokens, min_tokens
+    
     async def process_samewallets_tokens(self, update, tokens):
         """Processa lista de tokens para comando samewallets"""
         user_id = update.effective_user.id
+        tokens, min_tokens = self.split_min_tokens(tokens)
         
         # Valida número de tokens
         if len(tokens) < 2:
@@ -224,11 +417,18 @@ BxrYotq7fzH5tw4k4UQyekYje8n7rhNNgRCwa5Shpump
             )
             return
         
-        if len(tokens) > 5:
+        if len(tokens) > SAMEWALLETS_MAX_TOKENS:
             await update.message.reply_text(
-                "❌ **Erro:** Máximo de 5 tokens por consulta.\n\n"
+                f"❌ **Erro:** Máximo de {SAMEWALLETS_MAX_TOKENS} tokens por consulta.\n\n"
                 "**Use novamente:** `/samewallets`\n"
-                "**E forneça no máximo 5 endereços**",
+                f"**E forneça no máximo {SAMEWALLETS_MAX_TOKENS} endereços**",
+                parse_mode='Markdown'
+            )
+            return
+        
+        if min_tokens is not None and not 1 <= min_tokens <= len(tokens):
+            await update.message.reply_text(
+                f"❌ **Erro:** `min` deve ficar entre 1 e {len(tokens)} (número de tokens).",
                 parse_mode='Markdown'
             )
             return
@@ -249,72 +449,99 @@ BxrYotq7fzH5tw4k4UQyekYje8n7rhNNgRCwa5Shpump
             return
         
         # Inicia processamento
-        processing_msg = await update.message.reply_text(
+        processing_text = (
             f"🔍 **Buscando wallets comuns...**\n\n"
             f"🎯 **Tokens a analisar:** {len(tokens)}\n"
-            f"📊 **Processando:** 1/{len(tokens)} tokens...\n"
-            f"⏳ **Estimativa:** {len(tokens) * 30}-{len(tokens) * 60} segundos\n"
-            f"🔄 **Aguarde o processamento completo...**",
-            parse_mode='Markdown'
+            f"⚡ **Processando todos os tokens em paralelo...**\n"
+            f"🔄 **Aguarde o processamento completo...**"
         )
+        processing_msg = await update.message.reply_text(processing_text, parse_mode='Markdown')
         
+        ticket = None
         try:
-            print(f"🔍 Iniciando busca de wallets comuns para {len(tokens)} tokens")
+            # Espera a vez na fila (todos os tokens já em cache: via rápida)
+            ticket = await self.scheduler.acquire(
+                user_id, fast=all(solscan_api.is_cached(token, None) for token in tokens),
+                on_queued=self.queue_notifier(processing_msg, processing_text)
+            )
+            await self.show_queue_wait(processing_msg, processing_text, ticket)
+            
+            print(f"🔍 Iniciando busca de wallets comuns para {len(tokens)} tokens (em paralelo)")
             
             # Busca wallets para cada token
             all_wallets_data = {}
             token_names = {}
+            token_status = {token: '⏳' for token in tokens}  # token -> status exibido no progresso
+            failed_tokens = {}  # token -> motivo da falha
+            token_buyers = {}  # token -> lista de compradores
             
-            for i, token in enumerate(tokens, 1):
+            async def scan_token(i, token):
+                """Busca os compradores de um token; exceções ficam restritas a este token"""
                 try:
-                    # Atualiza progresso
-                    await processing_msg.edit_text(
-                        f"🔍 **Buscando wallets comuns...**\n\n"
-                        f"🎯 **Tokens a analisar:** {len(tokens)}\n"
-                        f"📊 **Processando:** {i}/{len(tokens)} tokens...\n"
-                        f"🔄 **Token atual:** {token[:8]}...\n"
-                        f"⏳ **Aguarde o processamento...**",
-                        parse_mode='Markdown'
-                    )
-                    
                     print(f"📊 Processando token {i}/{len(tokens)}: {token}")
-                    
-                    # Busca wallets do token
-                    buyers, token_info, balance_info = await solscan_api.extract_buyers(token)
-                    
-                    if not buyers:
-                        await processing_msg.edit_text(
-                            f"❌ **Token sem wallets encontradas**\n\n"
-                            f"🎯 **Token:** {token[:8]}...\n"
-                            f"📊 **Posição:** {i}/{len(tokens)}\n\n"
-                            f"💡 **Possíveis motivos:**\n"
-                            f"• Token muito novo\n"
-                            f"• Token sem holders\n"
-                            f"• Problema temporário de rede",
-                            parse_mode='Markdown'
-                        )
-                        return
-                    
+                    # Sem limite de compradores: a sobreposição precisa da lista completa
+                    buyers, token_info, balance_info = await solscan_api.extract_buyers(token, max_buyers=None)
+                    return i, token, buyers, token_info, None
+                except Exception as e:
+                    print(f"❌ Erro ao processar token {token}: {e}")
+                    return i, token, [], {}, e
+            
+            # Todos os tokens ao mesmo tempo; o limite de requisições RPC é adaptativo por RPC (rate_limiter.py, rpc_router.py)
+            tasks = [asyncio.create_task(scan_token(i, token)) for i, token in enumerate(tokens, 1)]
+            
+            for finished, task in enumerate(asyncio.as_completed(tasks), 1):
+                i, token, buyers, token_info, error = await task
+                
+                if error is not None:
+                    token_status[token] = '❌'
+                    failed_tokens[token] = f"erro: {str(error)[:50]}"
+                elif not buyers:
+                    token_status[token] = '❌'
+                    failed_tokens[token] = "sem wallets encontradas"
+                else:
                     # Armazena dados
                     token_name = token_info.get('name', f'Token {i}')
                     token_symbol = token_info.get('symbol', 'N/A')
                     token_names[token] = f"{token_name} ({token_symbol})"
                     
-                    # Converte para set para interseção rápida
+                    # Converte para set para contagem; lista mantém a ordem cronológica
                     all_wallets_data[token] = set(buyers)
+                    token_buyers[token] = buyers
+                    token_status[token] = '✅'
                     
                     print(f"✅ Token {i}: {len(buyers)} wallets encontradas - {token_name}")
-                    
+                
+                # Progresso agregado: status de cada token conforme os resultados chegam
+                progress_text = (
+                    f"🔍 **Buscando wallets comuns...**\n\n"
+                    f"📊 **Concluídos:** {finished}/{len(tokens)} tokens\n\n"
+                )
+                for n, t in enumerate(tokens, 1):
+                    detail = f" - {len(all_wallets_data[t])} wallets" if t in all_wallets_data else ""
+                    progress_text += f"{token_status[t]} {n}. `{t[:8]}...`{detail}\n"
+                try:
+                    await processing_msg.edit_text(progress_text, parse_mode='Markdown')
                 except Exception as e:
-                    print(f"❌ Erro ao processar token {token}: {e}")
-                    await processing_msg.edit_text(
-                        f"❌ **Erro ao processar token**\n\n"
-                        f"🎯 **Token:** {token[:8]}...\n"
-                        f"📊 **Posição:** {i}/{len(tokens)}\n\n"
-                        f"💡 **Tente usar `/samewallets` novamente**",
-                        parse_mode='Markdown'
-                    )
-                    return
+                    print(f"⚠️ Erro ao atualizar progresso: {e}")
+            
+            # Interseção só faz sentido com pelo menos 2 tokens com resultado
+            if len(all_wallets_data) < 2:
+                error_text = "❌ **Não foi possível analisar tokens suficientes**\n\n"
+                for n, token in enumerate(tokens, 1):
+                    reason = failed_tokens.get(token, "ok")
+                    error_text += f"{token_status[token]} {n}. `{token[:8]}...` - {reason}\n"
+                error_text += (
+                    f"\n💡 **Possíveis motivos:**\n"
+                    f"• Token muito novo\n"
+                    f"• Token sem holders\n"
+                    f"• Problema temporário de rede\n\n"
+                    f"💡 **Tente usar `/samewallets` novamente**"
+                )
+                await processing_msg.edit_text(error_text, parse_mode='Markdown')
+                return
+            
+            # Tokens que falharam ficam de fora da interseção (e são informados no resultado)
+            analyzed_tokens = [token for token in tokens if token in all_wallets_data]
             
             # Encontra interseção (wallets comuns)
             print("🔍 Calculando interseção de wallets...")
@@ -327,17 +554,18 @@ BxrYotq7fzH5tw4k4UQyekYje8n7rhNNgRCwa5Shpump
                 parse_mode='Markdown'
             )
             
-            # Começa com wallets do primeiro token
-            common_wallets = all_wallets_data[tokens[0]]
-            
-            # Faz interseção com cada token subsequente
-            for token in tokens[1:]:
-                common_wallets = common_wallets.intersection(all_wallets_data[token])
+            # Motor de sobreposição: wallets viram IDs inteiros (tokens na ordem informada = resultado determinístico)
+            engine = WalletOverlapEngine()
+            for token in analyzed_tokens:
+                engine.add_token(token, token_buyers[token])
             
-            # Converte de volta para lista
-            common_wallets_list = list(common_wallets)
+            # Sem `min`: compraram TODOS; com `min`: pelo menos K dos tokens analisados
+            required = min(min_tokens or len(analyzed_tokens), len(analyzed_tokens))
+            ranked = engine.at_least(required, analyzed_tokens)
+            common_wallets_list = [wallet for wallet, _ in ranked]
+            overlap_counts = dict(ranked)
             
-            print(f"📊 Interseção calculada: {len(common_wallets_list)} wallets comuns")
+            print(f"📊 Interseção calculada: {len(common_wallets_list)} wallets em {required}+ de {len(analyzed_tokens)} tokens")
             
             # Comando samewallets não aplica filtro de saldo
             print(f"📊 Wallets comuns encontradas: {len(common_wallets_list)}")
@@ -345,8 +573,9 @@ BxrYotq7fzH5tw4k4UQyekYje8n7rhNNgRCwa5Shpump
             
             # Envia resultados
             await self.send_samewallets_results(
-                update, processing_msg, tokens, token_names, 
-                common_wallets_list, all_wallets_data
+                update, processing_msg, analyzed_tokens, token_names, 
+                common_wallets_list, all_wallets_data, failed_tokens,
+                overlap_counts=overlap_counts, min_tokens=required
             )
             
         except Exception as e:
@@ -357,10 +586,25 @@ BxrYotq7fzH5tw4k4UQyekYje8n7rhNNgRCwa5Shpump
                 f"💡 **Use `/samewallets` para tentar novamente**",
                 parse_mode='Markdown'
             )
+        finally:
+            if ticket is not None:
+                self.scheduler.release(ticket)
     
-    async def send_samewallets_results(self, update, processing_msg, tokens, token_names, common_wallets, all_wallets_data):
+    async def send_samewallets_results(self, update, processing_msg, tokens, token_names, common_wallets, all_wallets_data,
+                                       failed_tokens=None, overlap_counts=None, min_tokens=None):
         """Envia resultados do comando /samewallets"""
         
+        # Critério "pelo menos K de N": wallets ranqueadas pela quantidade de tokens
+        partial = min_tokens is not None and min_tokens < len(tokens)
+        overlap_counts = overlap_counts or {}
+        
+        # Tokens que falharam não entram na interseção, mas são informados
+        failed_text = ""
+        if failed_tokens:
+            failed_text = f"\n⚠️ **Tokens ignorados ({len(failed_tokens)}):**\n"
+            for token, reason in failed_tokens.items():
+                failed_text += f"• `{token[:8]}...` - {reason}\n"
+        
         if not common_wallets:
             # Nenhuma wallet comum encontrada
             error_text = "⚠️ **Nenhuma wallet comum encontrada**\n\n"
@@ -383,6 +627,7 @@ BxrYotq7fzH5tw4k4UQyekYje8n7rhNNgRCwa5Shpump
             error_text += f"• Tente tokens mais populares\n"
             error_text += f"• Analise tokens relacionados\n"
             error_text += f"• Verifique se os tokens têm atividade recente"
+            error_text += failed_text
             
             try:
                 await processing_msg.edit_text(error_text, parse_mode='Markdown')
@@ -405,21 +650,33 @@ BxrYotq7fzH5tw4k4UQyekYje8n7rhNNgRCwa5Shpump
             result_text += f"{i}. {token_name}: {wallet_count} wallets\n"
         
         result_text += f"\n🔍 **Wallets comuns encontradas:** {len(common_wallets)}\n"
-        result_text += f"📊 **Critério:** Compraram **TODOS** os {len(tokens)} tokens\n\n"
-        
-        # Mostra TODAS as wallets comuns (sem limite)
-        result_text += f"💰 **WALLETS QUE COMPRARAM TODOS OS TOKENS:**\n\n```\n"
         
-        for i, wallet in enumerate(common_wallets, 1):
-            result_text += f"{i:2d}. {wallet}\n"
+        if partial:
+            result_text += f"📊 **Critério:** Compraram **pelo menos {min_tokens}** dos {len(tokens)} tokens\n\n"
+            
+            # Ranking por quantidade de tokens (limitado para caber na mensagem)
+            shown = common_wallets[:MAX_WALLETS_DISPLAY]
+            result_text += f"💰 **WALLETS QUE COMPRARAM {min_tokens}+ TOKENS (top {len(shown)}):**\n\n```\n"
+            for i, wallet in enumerate(shown, 1):
+                result_text += f"{i:2d}. {wallet} - {overlap_counts.get(wallet, 0)}/{len(tokens)}\n"
+        else:
+            result_text += f"📊 **Critério:** Compraram **TODOS** os {len(tokens)} tokens\n\n"
+            
+            # Mostra TODAS as wallets comuns (sem limite)
+            result_text += f"💰 **WALLETS QUE COMPRARAM TODOS OS TOKENS:**\n\n```\n"
+            
+            for i, wallet in enumerate(common_wallets, 1):
+                result_text += f"{i:2d}. {wallet}\n"
         
         result_text += "```\n"
         
         # Estatísticas
-        if len(tokens) == 2:
+        if len(tokens) == 2 and not partial:
             overlap_rate = (len(common_wallets) / min(len(all_wallets_data[tokens[0]]), len(all_wallets_data[tokens[1]]))) * 100
             result_text += f"\n📈 **Taxa de sobreposição:** {overlap_rate:.1f}%"
         
+        result_text += failed_text
+        
         # Envia resultado
         try:
             await processing_msg.edit_text(result_text, parse_mode='Markdown')
@@ -429,9 +686,9 @@ BxrYotq7fzH5tw4k4UQyekYje8n7rhNNgRCwa5Shpump
             simple_text = f"ANALISE DE WALLETS COMUNS CONCLUIDA\n\n"
             simple_text += f"Tokens analisados: {len(tokens)}\n"
             simple_text += f"Wallets comuns: {len(common_wallets)}\n\n"
-            simple_text += f"WALLETS QUE COMPRARAM TODOS OS TOKENS:\n\n"
+            simple_text += f"WALLETS QUE COMPRARAM {min_tokens}+ TOKENS:\n\n" if partial else f"WALLETS QUE COMPRARAM TODOS OS TOKENS:\n\n"
             
-            for i, wallet in enumerate(common_wallets, 1):
+            for i, wallet in enumerate(common_wallets[:MAX_WALLETS_DISPLAY] if partial else common_wallets, 1):
                 simple_text += f"{i:2d}. {wallet}\n"
             
             try:
@@ -469,11 +726,12 @@ BxrYotq7fzH5tw4k4UQyekYje8n7rhNNgRCwa5Shpump
                 unique_tokens.append(token)
         
         tokens = unique_tokens
+        display_tokens, min_tokens = self.split_min_tokens(tokens)
         
         print(f"📝 Usuário {user_id} forneceu {len(tokens)} tokens: {[t[:8]+'...' for t in tokens]}")
         
         # Valida se forneceu tokens
-        if not tokens:
+        if not display_tokens:
             await update.message.reply_text(
                 "❌ **Nenhum token válido encontrado**\n\n"
                 "📝 **Formato esperado:**\n"
@@ -487,14 +745,16 @@ BxrYotq7fzH5tw4k4UQyekYje8n7rhNNgRCwa5Shpump
             return
         
         # Confirma tokens recebidos
-        confirm_text = f"✅ **Tokens recebidos: {len(tokens)}**\n\n"
+        confirm_text = f"✅ **Tokens recebidos: {len(display_tokens)}**\n\n"
+        if min_tokens:
+            confirm_text += f"🎯 **Critério:** pelo menos {min_tokens} dos tokens\n\n"
         confirm_text += f"📋 **Lista de tokens a analisar:**\n"
         
-        for i, token in enumerate(tokens[:5], 1):  # Mostra até 5
+        for i, token in enumerate(display_tokens[:5], 1):  # Mostra até 5
             confirm_text += f"{i}. `{token[:8]}...{token[-8:]}`\n"
         
-        if len(tokens) > 5:
-            confirm_text += f"... e mais {len(tokens) - 5} tokens\n"
+        if len(display_tokens) > 5:
+            confirm_text += f"... e mais {len(display_tokens) - 5} tokens\n"
         
         confirm_text += f"\n🔍 **Iniciando busca de wallets comuns...**"
         
@@ -563,25 +823,34 @@ BxrYotq7fzH5tw4k4UQyekYje8n7rhNNgRCwa5Shpump
         fonte_info = "🔗 Fonte: API Pro Solscan" if SOLSCAN_PRO_API_KEY else "🔗 Fonte: RPC Solana (gratuito)"
         
         # Envia mensagem de processamento
-        processing_msg = await update.message.reply_text(
+        processing_text = (
             "🔍 **Buscando wallets...**\n\n"
             f"{fonte_info}\n"
             "⏳ Analisando transações na blockchain...\n"
             "⚡ **Versão otimizada** - pode levar 1-2 minutos\n"
-            "⚡ RPC Helius: Processamento ultra-rápido",
-            parse_mode='Markdown'
+            "⚡ RPC Helius: Processamento ultra-rápido"
         )
+        processing_msg = await update.message.reply_text(processing_text, parse_mode='Markdown')
         
+        ticket = None
         try:
+            # Espera a vez na fila (token em cache ou já em busca: via rápida)
+            ticket = await self.scheduler.acquire(
+                user_id, fast=solscan_api.is_cached(user_input),
+                on_queued=self.queue_notifier(processing_msg, processing_text)
+            )
+            await self.show_queue_wait(processing_msg, processing_text, ticket)
+            
             print(f"🔍 Iniciando busca para token: {user_input}")
             
-            # Busca as wallets que compraram o token (agora com saldos)
+            # Busca as wallets que compraram o token (com saldos, em colunas)
+            # As wallets encontradas aparecem na mensagem enquanto a busca continua
+            progress = BuyerProgress(processing_msg, processing_text)
             try:
-                buyers, token_info, balance_info = await solscan_api.extract_buyers(user_input)
-            except ValueError:
-                # Fallback para compatibilidade
-                buyers, token_info = await solscan_api.extract_buyers(user_input)
-                balance_info = []
+                with solana_rpc.watch_buyers(user_input, progress):
+                    buyers, token_info, balance_info = await solscan_api.extract_buyers(user_input)
+            finally:
+                await progress.close()
             
             print(f"📊 Busca concluída: {len(buyers)} wallets encontradas")
             
@@ -609,40 +878,13 @@ BxrYotq7fzH5tw4k4UQyekYje8n7rhNNgRCwa5Shpump
                     except:
                         pass
                     
-                    # Busca saldos individuais para todas as wallets
-                    new_balance_info = []
-                    for i, wallet in enumerate(buyers):
-                        try:
-                            wallet_balance = await solscan_api.get_wallet_balance(wallet)
-                            new_balance_info.append({
-                                'wallet': wallet,
-                                'balance': wallet_balance,
-                                'timestamp': 0,
-                                'account_index': 0,
-                                'sig_index': i
-                            })
-                        except:
-                            # Se falhar, assume saldo 0
-                            new_balance_info.append({
-                                'wallet': wallet,
-                                'balance': 0.0,
-                                'timestamp': 0,
-                                'account_index': 0,
-                                'sig_index': i
-                            })
-                    
-                    balance_info = new_balance_info
+                    # Busca saldos de todas as wallets em lote (se falhar, assume saldo 0)
+                    balances = await solscan_api.get_wallet_balances(buyers)
+                    balance_info = BuyerRecords.from_wallets(buyers, balances)
                 
-                # Agora filtra com base no saldo mínimo
-                filtered_balance_info = []
-                
-                for item in balance_info:
-                    wallet_balance = item.get('balance', 0.0) if isinstance(item, dict) else 0.0
-                    if wallet_balance >= min_balance:
-                        filtered_balance_info.append(item)
-                
-                balance_info = filtered_balance_info
-                buyers = [item.get('wallet', '') for item in balance_info] if balance_info else []
+                # Agora filtra com base no saldo mínimo (direto na coluna de saldos)
+                balance_info = balance_info.filter_min_balance(min_balance)
+                buyers = balance_info.wallets()
                 
                 filtered_count = len(buyers)
                 print(f"📊 Filtro aplicado: {original_count} → {filtered_count} wallets (mín: {min_balance} SOL)")
@@ -667,13 +909,8 @@ BxrYotq7fzH5tw4k4UQyekYje8n7rhNNgRCwa5Shpump
                 print(f"🔄 APLICANDO ORDENAÇÃO CRONOLÓGICA FINAL...")
                 
                 # Ordena por timestamp, índices e wallet (CONSISTÊNCIA TOTAL)
-                balance_info.sort(key=lambda x: (
-                    x.get('timestamp', 0), 
-                    x.get('account_index', 0), 
-                    x.get('sig_index', 0), 
-                    x.get('wallet', '')
-                ))
-                buyers = [item.get('wallet', '') for item in balance_info]
+                balance_info = balance_info.sort_chronological()
+                buyers = balance_info.wallets()
                 print(f"✅ ORDEM CRONOLÓGICA DETERMINÍSTICA GARANTIDA!")
                 print(f"🎯 Resultados serão IDÊNTICOS em consultas futuras do mesmo token")
             
@@ -702,6 +939,9 @@ BxrYotq7fzH5tw4k4UQyekYje8n7rhNNgRCwa5Shpump
                     )
                 except:
                     print("❌ Falha total na comunicação com Telegram")
+        finally:
+            if ticket is not None:
+                self.scheduler.release(ticket)
     
     async def send_results(self, update, processing_msg, token_address, buyers, token_info, balance_info=None):
         """Envia os resultados da busca"""
@@ -762,21 +1002,16 @@ BxrYotq7fzH5tw4k4UQyekYje8n7rhNNgRCwa5Shpump
         # Mostra TODAS as wallets encontradas em bloco de código (sem quebra) - COM NUMERAÇÃO
         if balance_info and len(balance_info) > 0:
             # Usa dados detalhados com saldo
-            for i, wallet_data in enumerate(balance_info, 1):
-                wallet = wallet_data.get('wallet', '')
-                balance = wallet_data.get('balance', 0.0)
+            for i, (wallet, balance) in enumerate(balance_info.rows(), 1):
                 result_text += f"{i}. {wallet} - {balance:.2f}\n"
         else:
             # Fallback: busca saldos das wallets na hora (mais lento)
             from solana_rpc import solana_rpc
-            print("💰 Buscando saldos das wallets...")
+            print("💰 Buscando saldos das wallets em lote...")
+            balances = await solana_rpc.get_wallet_balances(buyers)
             for i, wallet in enumerate(buyers, 1):
-                try:
-                    balance = await solana_rpc.get_wallet_balance(wallet)
-                    result_text += f"{i}. {wallet} - {balance:.2f}\n"
-                    print(f"💰 Wallet {i}: {balance:.2f}")
-                except:
-                    result_text += f"{i}. {wallet} - 0.00\n"
+                balance = balances.get(wallet, 0.0)
+                result_text += f"{i}. {wallet} - {balance:.2f}\n"
         
         result_text += "```"
         
@@ -807,9 +1042,7 @@ BxrYotq7fzH5tw4k4UQyekYje8n7rhNNgRCwa5Shpump
                     
                     if balance_info and len(balance_info) > 0:
                         # Usa dados com saldo - formato sem quebra COM NUMERAÇÃO
-                        for i, wallet_data in enumerate(balance_info, 1):
-                            wallet = wallet_data.get('wallet', '')
-                            balance = wallet_data.get('balance', 0.0)
+                        for i, (wallet, balance) in enumerate(balance_info.rows(), 1):
                             simple_msg += f"{i}. {wallet} - {balance:.2f}\n"
                     else:
                         # Fallback sem saldo - formato sem quebra COM NUMERAÇÃO
@@ -831,7 +1064,8 @@ BxrYotq7fzH5tw4k4UQyekYje8n7rhNNgRCwa5Shpump
                 bot = processing_msg.bot
                 if not hasattr(bot, '_wallet_cache'):
                     bot._wallet_cache = {}
-                bot._wallet_cache[token_address] = buyers
+                # Guardado em colunas (32 bytes por wallet); convertido para texto só no callback
+                bot._wallet_cache[token_address] = BuyerRecords.from_wallets(buyers)
                 print(f"✅ Cache armazenado para {len(buyers)} wallets")
             else:
                 print(f"⚠️ Bot não disponível para cache, mas isso não é crítico")
@@ -849,7 +1083,8 @@ BxrYotq7fzH5tw4k4UQyekYje8n7rhNNgRCwa5Shpump
         # Recupera os dados do cache
         try:
             cache = getattr(context.bot, '_wallet_cache', {})
-            buyers = cache.get(token_address, [])
+            records = cache.get(token_address)
+            buyers = records.wallets() if records is not None else []
             print(f"📋 Cache recuperado: {len(buyers)} wallets para {token_address[:8]}...")
         except Exception as e:
             print(f"⚠️ Erro ao recuperar cache: {e}")
@@ -0,0 +1,328 @@
+import asyncio
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from config import (
+    TX_FETCH_CONCURRENCY, PIPELINE_QUEUE_SIZE, PIPELINE_REORDER_WINDOW, BALANCE_BATCH_SIZE,
+    MINT_STORE_MAX_NEW_SIGNATURES
+)
+
+# Marcador de fim de fluxo entre as etapas
+_END = object()
+
+# Consultas seguidas em que uma transação pode falhar antes de ser abandonada (podada ou indisponível)
+TX_RETRY_LIMIT = 3
+
+class StaleCursorError(Exception):
+    """Signatures novas demais desde o cursor salvo: a atualização incremental deixaria um buraco"""
+
+class BuyerPipeline:
+    """
+    Pipeline em streaming para extrair compradores de um token:
+    signatures -> transações -> wallets -> saldos
+
+    Cada etapa é um async generator; entre elas há filas limitadas
+    (PIPELINE_QUEUE_SIZE) que seguram a etapa anterior quando a seguinte
+    está ocupada (backpressure), limitando a memória e mantendo todas
+    as etapas trabalhando ao mesmo tempo.
+    """
+    def __init__(self, rpc, mint_address: str, accounts: List[Dict], signatures_limit: int = 1000,
+                 cursors: Optional[Dict[str, Dict]] = None, known_wallets: Optional[List[str]] = None):
+        self.rpc = rpc  # Instância de SolanaRPC
+        self.mint_address = mint_address
+        self.accounts = accounts
+        self.signatures_limit = signatures_limit
+        self.semaphore = asyncio.Semaphore(TX_FETCH_CONCURRENCY)
+        # Busca incremental: por conta, a signature mais nova já processada (busca só as mais novas com 'until')
+        self.cursors = cursors or {}
+        self.processed_owners = set(known_wallets or ())
+        self.account_state: Dict[str, Dict] = {}  # Novo cursor de cada conta processada
+        # Transações que não puderam ser buscadas, por conta: tentadas de novo na próxima consulta
+        self.failed_signatures: Dict[str, Dict[str, Dict]] = {}
+        self._retry_attempts: Dict[str, int] = {}  # Tentativas anteriores das signatures repetidas agora
+        self._next_index = max((c['index'] for c in self.cursors.values()), default=-1) + 1
+        self.stats = {'signatures': 0, 'transactions': 0, 'wallets': 0}
+        self.stage_done: Dict[str, float] = {}
+        self.first_wallet_at: Optional[float] = None
+        self._started_at = 0.0
+
+    async def run(self) -> AsyncIterator[Dict]:
+        """Executa o pipeline completo e produz cada comprador (com saldo) assim que fica pronto"""
+        self._started_at = time.perf_counter()
+        tasks = []
+        try:
+            signatures = self._buffered(self.signature_pager(), tasks)
+            transactions = self._buffered(self.transaction_fetcher(signatures), tasks)
+            wallets = self._buffered(self.wallet_extractor(transactions), tasks)
+            async for buyer in self.balance_enricher(wallets):
+                if self.first_wallet_at is None:
+                    self.first_wallet_at = time.perf_counter() - self._started_at
+                yield buyer
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._mark_done('balances')
+            self.print_timings()
+
+    def _buffered(self, source: AsyncIterator, tasks: list) -> AsyncIterator:
+        """Roda a etapa em uma task própria, publicando em uma fila limitada"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+
+        async def pump():
+            try:
+                async for item in source:
+                    await queue.put(item)
+            except Exception as e:
+                await queue.put(e)
+                return
+            await queue.put(_END)
+
+        tasks.append(asyncio.create_task(pump()))
+
+        async def drain():
+            while True:
+                item = await queue.get()
+                if item is _END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+
+        return drain()
+
+    def _mark_done(self, stage: str):
+        if stage not in self.stage_done:
+            self.stage_done[stage] = time.perf_counter() - self._started_at
+
+    def _account_index(self, position: int, account_address: str) -> int:
+        """Índice estável da conta: o salvo na busca anterior ou o próximo livre"""
+        if account_address in self.cursors:
+            return self.cursors[account_address]['index']
+        if not self.cursors:
+            return position  # Primeira busca: posição na lista de contas
+        index = self._next_index
+        self._next_index += 1
+        return index
+
+    async def signature_pager(self) -> AsyncIterator[Tuple[int, int, str, int, str]]:
+        """ETAPA 1: signatures de cada conta, em ordem (conta, signature) cronológica"""
+        for position, account in enumerate(self.accounts):
+            # account é um dicionário com chaves: address, amount, decimals, uiAmount, uiAmountString
+            account_address = account.get('address') if isinstance(account, dict) else None
+            if not account_address:
+                print(f"⚠️ Conta {position+1} sem endereço válido: {account}")
+                continue
+
+            i = self._account_index(position, account_address)
+            cursor = self.cursors.get(account_address, {})
+            offset = cursor.get('sig_count', 0)
+
+            self.rpc.count_request()
+            if cursor:
+                # Incremental: pagina até chegar ao cursor (nunca pula signatures entre ele e as mais novas)
+                limit = max(self.signatures_limit, MINT_STORE_MAX_NEW_SIGNATURES)
+                raw_signatures = await self.rpc.get_signatures_raw(
+                    account_address, limit, until=cursor.get('newest_signature')
+                )
+                if len(raw_signatures) >= limit:
+                    raise StaleCursorError(f"{account_address[:8]}...: {limit}+ signatures novas desde o cursor")
+            else:
+                raw_signatures = await self.rpc.get_signatures_raw(account_address, self.signatures_limit)
+            # Falhas da consulta anterior (mais antigas que o cursor): tentadas de novo antes das novas
+            retry = cursor.get('retry', {})
+            for signature, info in retry.items():
+                self._retry_attempts[signature] = info['attempts']
+                self.stats['signatures'] += 1
+                yield (i, info['sig_index'], signature, info['block_time'], account_address)
+
+            if not raw_signatures:
+                if retry:
+                    self.account_state[account_address] = {k: v for k, v in cursor.items() if k != 'retry'}
+                elif not cursor:
+                    print(f"⚠️ Nenhuma transação encontrada para {account_address[:8]}")
+                continue
+
+            # O RPC devolve das mais novas para as mais antigas: a primeira é o novo cursor
+            self.account_state[account_address] = {
+                'index': i,
+                'newest_signature': raw_signatures[0].get('signature'),
+                'newest_slot': raw_signatures[0].get('slot'),
+                'sig_count': offset + len(raw_signatures)
+            }
+
+            signatures = self.rpc.sort_signatures_chronologically(raw_signatures)
+            novas = " novas" if cursor else ""
+            print(f"📜 Conta {position+1}/{len(self.accounts)}: {account_address[:8]}... - {len(signatures)} transações{novas}")
+            for j, sig_info in enumerate(signatures, offset):
+                signature = sig_info.get('signature')
+                if signature:
+                    self.stats['signatures'] += 1
+                    yield (i, j, signature, sig_info.get('blockTime', 0), account_address)
+        self._mark_done('signatures')
+
+    def updated_cursors(self) -> Dict[str, Dict]:
+        """
+        Cursores para salvar após a busca
+        O cursor sempre avança; transações que falharam ficam em 'retry' e são buscadas
+        de novo nas próximas consultas (até TX_RETRY_LIMIT vezes)
+        """
+        cursors = dict(self.cursors)
+        for address, state in self.account_state.items():
+            state = dict(state)
+            pending = {signature: info for signature, info in self.failed_signatures.get(address, {}).items()
+                       if info['attempts'] < TX_RETRY_LIMIT}
+            if pending:
+                state['retry'] = pending
+            cursors[address] = state
+        return cursors
+
+    async def transaction_fetcher(self, jobs: AsyncIterator) -> AsyncIterator[Tuple[Tuple, Optional[Dict]]]:
+        """
+        ETAPA 2: getTransaction em paralelo (até TX_FETCH_CONCURRENCY em voo)
+        Resultados saem na mesma ordem das signatures (janela de reordenação)
+        """
+        window = deque()
+
+        async def fetch(signature: str) -> Optional[Dict]:
+            async with self.semaphore:
+                self.rpc.count_request()
+                try:
+                    return await self.rpc.get_transaction(signature)
+                except Exception as e:
+                    print(f"⚠️ Erro ao buscar transação: {e}")
+                    return None
+
+        try:
+            async for job in jobs:
+                window.append((job, asyncio.create_task(fetch(job[2]))))
+                # Janela cheia: espera a mais antiga para manter a ordem
+                while len(window) >= PIPELINE_REORDER_WINDOW:
+                    head_job, head_task = window.popleft()
+                    yield self._completed(head_job, await head_task)
+
+            while window:
+                head_job, head_task = window.popleft()
+                yield self._completed(head_job, await head_task)
+        finally:
+            for _, task in window:
+                task.cancel()
+        self._mark_done('transactions')
+
+    def _completed(self, job: Tuple, tx_details: Optional[Dict]) -> Tuple[Tuple, Optional[Dict]]:
+        self.stats['transactions'] += 1
+        if tx_details is None:
+            i, j, signature, block_time, account_address = job
+            attempts = self._retry_attempts.get(signature, 0) + 1
+            if attempts >= TX_RETRY_LIMIT:
+                print(f"⚠️ Transação {signature[:8]}... indisponível após {attempts} tentativas - ignorada")
+            self.failed_signatures.setdefault(account_address, {})[signature] = {
+                'sig_index': j, 'block_time': block_time, 'attempts': attempts
+            }
+        return job, tx_details
+
+    async def wallet_extractor(self, transactions: AsyncIterator) -> AsyncIterator[Dict]:
+        """ETAPA 3: primeiras contas de cada transação que são wallets de usuário novas"""
+        async for (i, j, signature, block_time, account_address), tx_details in transactions:
+            try:
+                if not tx_details:
+                    continue
+
+                # Extrai wallets das contas envolvidas
+                transaction = tx_details.get('transaction', {})
+                message = transaction.get('message', {})
+                account_keys = message.get('accountKeys', [])
+
+                # Adiciona as primeiras contas como possíveis compradores
+                for account_key in account_keys[:3]:  # Apenas 3 primeiras
+                    if isinstance(account_key, str):
+                        wallet = account_key
+                    else:
+                        wallet = account_key.get('pubkey', '')
+
+                    # Usa o filtro robusto para validar wallets
+                    if (wallet and
+                        self.rpc.is_valid_user_wallet(wallet, self.mint_address) and
+                        wallet not in self.processed_owners):
+
+                        # Timestamp mais preciso e estável
+                        final_timestamp = block_time if block_time > 0 else int(time.time())
+                        self.processed_owners.add(wallet)
+                        self.stats['wallets'] += 1
+
+                        print(f"✅ Wallet: {wallet[:8]}... | TS: {final_timestamp} | Conta: {i} | Sig: {j}")
+                        yield {
+                            'wallet': wallet,
+                            'balance': 0.0,  # Preenchido pela etapa de saldos
+                            'timestamp': final_timestamp,
+                            'account_index': i,  # Índice da conta processada
+                            'sig_index': j       # Índice da signature processada
+                        }
+
+                    elif wallet and wallet in self.rpc.SYSTEM_PROGRAMS:
+                        print(f"🔧 Programa filtrado: {wallet[:8]}... (sistema Solana)")
+
+            except Exception as e:
+                print(f"⚠️ Erro ao processar transação: {e}")
+                continue
+        self._mark_done('extraction')
+
+    async def balance_enricher(self, wallets: AsyncIterator) -> AsyncIterator[Dict]:
+        """
+        ETAPA 4: saldos em lote
+        Junta até BALANCE_BATCH_SIZE wallets; se a etapa anterior ficar sem
+        novidades, envia o lote parcial para não atrasar a primeira wallet
+        """
+        batch: List[Dict] = []
+        iterator = wallets.__aiter__()
+        next_item = asyncio.ensure_future(iterator.__anext__())
+
+        try:
+            while True:
+                if batch and not next_item.done():
+                    # Nada novo no momento: não segura o lote parcial
+                    done, _ = await asyncio.wait({next_item}, timeout=0.05)
+                    if not done:
+                        async for buyer in self._flush_balances(batch):
+                            yield buyer
+                        batch = []
+                        continue
+                try:
+                    buyer = await next_item
+                except StopAsyncIteration:
+                    break
+                batch.append(buyer)
+                next_item = asyncio.ensure_future(iterator.__anext__())
+
+                if len(batch) >= BALANCE_BATCH_SIZE:
+                    async for enriched in self._flush_balances(batch):
+                        yield enriched
+                    batch = []
+
+            async for buyer in self._flush_balances(batch):
+                yield buyer
+        finally:
+            if not next_item.done():
+                next_item.cancel()
+
+    async def _flush_balances(self, batch: List[Dict]) -> AsyncIterator[Dict]:
+        if not batch:
+            return
+        balances = await self.rpc.get_wallet_balances([item['wallet'] for item in batch])
+        for item in batch:
+            item['balance'] = balances.get(item['wallet'], 0.0)
+            yield item
+
+    def print_timings(self):
+        """Tempo (desde o início) em que cada etapa terminou"""
+        stages = " | ".join(f"{name}: {seconds:.2f}s" for name, seconds in self.stage_done.items())
+        first = f"{self.first_wallet_at:.2f}s" if self.first_wallet_at is not None else "-"
+        print(f"⏱️ Pipeline: {stages} | primeira wallet: {first}")
+        print(f"📊 Pipeline: {self.stats['signatures']} signatures, {self.stats['transactions']} transações, {self.stats['wallets']} wallets")
+        balance_service = getattr(self.rpc, 'balance_service', None)
+        if balance_service is not None:
+            balance_service.print_cache_stats()
+        hedger = getattr(self.rpc, 'hedger', None)
+        if hedger and hedger.stats['hedged']:
+            hedge = hedger.snapshot()
+            print(f"🛡️ Hedge: {hedge['hedged']} cópias ({hedge['hedge_rate']:.1%}), cópia venceu {hedge['hedge_win_rate']:.0%}")
@@ -0,0 +1,220 @@
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import base58
+
+try:
+    import numpy as np  # Opcional: ordenação e filtros vetorizados
+except ImportError:
+    np = None
+
+try:
+    from solders.pubkey import Pubkey  # Conversão base58 <-> bytes em Rust (bem mais rápida)
+except ImportError:
+    Pubkey = None
+
+KEY_SIZE = 32
+
+def encode_wallet(wallet: str) -> Optional[bytes]:
+    """Endereço base58 -> 32 bytes (None se não for uma chave pública válida)"""
+    try:
+        if Pubkey is not None:
+            return bytes(Pubkey.from_string(wallet))
+        key = base58.b58decode(wallet)
+        return key if len(key) == KEY_SIZE else None
+    except ValueError:
+        return None
+
+def decode_wallet(key: bytes) -> str:
+    """32 bytes -> endereço base58"""
+    if Pubkey is not None:
+        return str(Pubkey.from_bytes(key))
+    return base58.b58encode(key).decode()
+
+class BuyerRecords:
+    """
+    Lista de compradores em colunas: chaves de 32 bytes em um único bytearray e
+    arrays numéricos para saldo, timestamp, account_index e sig_index
+    Ocupa ~60 bytes por wallet (contra centenas em um dict com strings base58).
+    Ordenação, filtro de saldo mínimo e top-k trabalham direto nas colunas
+    (numpy quando disponível); o endereço em texto só é gerado para exibir.
+    """
+    def __init__(self):
+        self.keys = bytearray()
+        self.balance = array('d')
+        self.timestamp = array('q')
+        self.account_index = array('i')
+        self.sig_index = array('i')
+        self._odd: Dict[int, str] = {}  # Endereços que não são chaves de 32 bytes (guardados como texto)
+
+    def __len__(self) -> int:
+        return len(self.balance)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    @property
+    def nbytes(self) -> int:
+        """Memória aproximada das colunas"""
+        return (len(self.keys) + self.balance.itemsize * len(self) + self.timestamp.itemsize * len(self) +
+                self.account_index.itemsize * len(self) + self.sig_index.itemsize * len(self))
+
+    def append(self, wallet: str, balance: float = 0.0, timestamp: int = 0, account_index: int = 0, sig_index: int = 0):
+        key = encode_wallet(wallet)
+        if key is None:
+            self._odd[len(self)] = wallet
+            key = bytes(KEY_SIZE)
+        self.append_key(key, balance, timestamp, account_index, sig_index)
+
+    def append_key(self, key: bytes, balance: float = 0.0, timestamp: int = 0, account_index: int = 0, sig_index: int = 0):
+        """Linha a partir da chave já em bytes (ex.: owner lido de dados de conta), sem passar por base58"""
+        self.keys += key
+        self.balance.append(float(balance or 0.0))
+        self.timestamp.append(int(timestamp or 0))
+        self.account_index.append(int(account_index or 0))
+        self.sig_index.append(int(sig_index or 0))
+
+    def append_dict(self, item: Dict):
+        self.append(item.get('wallet', ''), item.get('balance', 0.0), item.get('timestamp', 0),
+                    item.get('account_index', 0), item.get('sig_index', 0))
+
+    @classmethod
+    def from_dicts(cls, items: Iterable[Dict]) -> 'BuyerRecords':
+        records = cls()
+        for item in items:
+            records.append_dict(item)
+        return records
+
+    @classmethod
+    def from_wallets(cls, wallets: Sequence[str], balances: Optional[Dict[str, float]] = None) -> 'BuyerRecords':
+        """Wallets já ordenadas (sig_index = posição), com saldos opcionais"""
+        balances = balances or {}
+        records = cls()
+        for i, wallet in enumerate(wallets):
+            records.append(wallet, balances.get(wallet, 0.0), sig_index=i)
+        return records
+
+    def key(self, i: int) -> bytes:
+        return bytes(self.keys[i * KEY_SIZE:(i + 1) * KEY_SIZE])
+
+    def wallet(self, i: int) -> str:
+        """Endereço base58 da posição i (convertido só quando pedido)"""
+        odd = self._odd.get(i)
+        return odd if odd is not None else decode_wallet(self.key(i))
+
+    def wallets(self) -> List[str]:
+        return [self.wallet(i) for i in range(len(self))]
+
+    def rows(self, limit: Optional[int] = None) -> Iterator[Tuple[str, float]]:
+        """(wallet, saldo) em ordem, para montar mensagens"""
+        for i in range(len(self) if limit is None else min(limit, len(self))):
+            yield self.wallet(i), self.balance[i]
+
+    def to_dict(self, i: int) -> Dict:
+        return {
+            'wallet': self.wallet(i),
+            'balance': self.balance[i],
+            'timestamp': self.timestamp[i],
+            'account_index': self.account_index[i],
+            'sig_index': self.sig_index[i]
+        }
+
+    def to_dicts(self) -> List[Dict]:
+        return [self.to_dict(i) for i in range(len(self))]
+
+    def take(self, indices: Iterable[int]) -> 'BuyerRecords':
+        """Novo resultado com as linhas indicadas, na ordem indicada"""
+        indices = [int(i) for i in indices]
+        records = BuyerRecords()
+        if np is not None and len(self):
+            idx = np.asarray(indices, dtype=np.int64)
+            keys = np.frombuffer(bytes(self.keys), dtype=np.uint8).reshape(-1, KEY_SIZE)
+            records.keys = bytearray(keys[idx].tobytes())
+            records.balance = array('d', np.asarray(self.balance)[idx].tobytes())
+            records.timestamp = array('q', np.asarray(self.timestamp)[idx].tobytes())
+            records.account_index = array('i', np.asarray(self.account_index)[idx].tobytes())
+            records.sig_index = array('i', np.asarray(self.sig_index)[idx].tobytes())
+        else:
+            for i in indices:
+                records.keys += self.keys[i * KEY_SIZE:(i + 1) * KEY_SIZE]
+                records.balance.append(self.balance[i])
+                records.timestamp.append(self.timestamp[i])
+                records.account_index.append(self.account_index[i])
+                records.sig_index.append(self.sig_index[i])
+        if self._odd:
+            records._odd = {new: self._odd[old] for new, old in enumerate(indices) if old in self._odd}
+        return records
+
+    def copy(self) -> 'BuyerRecords':
+        records = BuyerRecords()
+        records.keys = bytearray(self.keys)
+        records.balance = array('d', self.balance)
+        records.timestamp = array('q', self.timestamp)
+        records.account_index = array('i', self.account_index)
+        records.sig_index = array('i', self.sig_index)
+        records._odd = dict(self._odd)
+        return records
+
+    def extend(self, other: 'BuyerRecords'):
+        offset = len(self)
+        self.keys += other.keys
+        self.balance.extend(other.balance)
+        self.timestamp.extend(other.timestamp)
+        self.account_index.extend(other.account_index)
+        self.sig_index.extend(other.sig_index)
+        self._odd.update({offset + i: wallet for i, wallet in other._odd.items()})
+
+    def set_balances(self, balances: Dict[str, float]):
+        """Atualiza os saldos das wallets presentes em balances (as outras ficam como estão)"""
+        for i in range(len(self)):
+            balance = balances.get(self.wallet(i))
+            if balance is not None:
+                self.balance[i] = balance
+
+    def chronological_order(self) -> List[int]:
+        """
+        Índices em ordem (timestamp, account_index, sig_index, wallet)
+        Os três primeiros são ordenados nas colunas; o endereço só é convertido
+        para desempatar linhas com os mesmos três valores (mesma transação).
+        """
+        n = len(self)
+        if np is not None and n:
+            columns = (np.asarray(self.sig_index), np.asarray(self.account_index), np.asarray(self.timestamp))
+            order_array = np.lexsort(columns)
+            sig, account, ts = (column[order_array] for column in columns)
+            tied = np.flatnonzero((ts[1:] == ts[:-1]) & (account[1:] == account[:-1]) & (sig[1:] == sig[:-1]))
+            order = order_array.tolist()
+            tied = tied.tolist()
+        else:
+            order = sorted(range(n), key=lambda i: (self.timestamp[i], self.account_index[i], self.sig_index[i]))
+            tied = [p for p in range(n - 1) if (self.timestamp[order[p]], self.account_index[order[p]], self.sig_index[order[p]]) ==
+                    (self.timestamp[order[p + 1]], self.account_index[order[p + 1]], self.sig_index[order[p + 1]])]
+
+        # Cada posição em tied empata com a seguinte: ordena esses trechos pelo endereço
+        p = 0
+        while p < len(tied):
+            first = tied[p]
+            last = first + 1
+            while p + 1 < len(tied) and tied[p + 1] == last:
+                p += 1
+                last += 1
+            order[first:last + 1] = sorted(order[first:last + 1], key=self.wallet)
+            p += 1
+        return order
+
+    def sort_chronological(self) -> 'BuyerRecords':
+        """Ordenação cronológica determinística (mesma ordem das versões com dicts)"""
+        return self.take(self.chronological_order())
+
+    def filter_min_balance(self, min_balance: float) -> 'BuyerRecords':
+        """Só as wallets com saldo >= min_balance, mantendo a ordem"""
+        if np is not None:
+            return self.take(np.flatnonzero(np.asarray(self.balance) >= min_balance).tolist())
+        return self.take(i for i in range(len(self)) if self.balance[i] >= min_balance)
+
+    def top_k(self, k: int) -> 'BuyerRecords':
+        """As k wallets de maior saldo (maior primeiro; empate mantém a ordem atual)"""
+        n = len(self)
+        k = max(0, min(k, n))
+        if np is not None and k:
+            return self.take(np.argsort(-np.asarray(self.balance), kind='stable')[:k].tolist())
+        return self.take(sorted(range(n), key=lambda i: (-self.balance[i], i))[:k])
@@ -0,0 +1,82 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    Cache em memória com expiração (TTL) e limite de entradas (LRU)
+    Ao passar do limite, remove a entrada usada há mais tempo
+    """
+    def __init__(self, ttl: float, max_entries: int, name: str = 'cache'):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.name = name
+        self._data: "OrderedDict[Any, tuple]" = OrderedDict()  # chave -> (valor, expira_em)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Retorna o valor se existir e não tiver expirado"""
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        """Armazena o valor (TTL próprio opcional) e aplica o limite LRU"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def peek(self, key, default=None):
+        """Como get, mas sem contar hit/miss nem mudar a ordem LRU"""
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING or entry[1] < time.monotonic():
+            return default
+        return entry[0]
+
+    def delete(self, key):
+        """Remove a entrada (se existir)"""
+        self._data.pop(key, None)
+
+    def __contains__(self, key) -> bool:
+        entry = self._data.get(key, _MISSING)
+        return entry is not _MISSING and entry[1] >= time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def clear(self):
+        self._data.clear()
+
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict:
+        return {
+            'name': self.name,
+            'entries': len(self._data),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': self.hit_ratio()
+        }
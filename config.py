@@ -19,7 +19,7 @@ SOLSCAN_HEADERS = {
 
 # Configuração simplificada - APENAS HELIUS
 # RPC Helius Fast (testado e funcional)
-HELIUS_RPC_URL = "https://rahel-v0lqwp-fast-mainnet.helius-rpc.com/"
+HELIUS_RPC_URL = os.getenv('HELIUS_RPC_URL', "https://rahel-v0lqwp-fast-mainnet.helius-rpc.com/")  # Sobrescrever aponta o bot para outro RPC (ex.: mock_rpc_server.py)
 
 print(f"🚀 Configuração simplificada: APENAS Helius")
 print(f"🔑 RPC único: rahel-v0lqwp-fast-mainnet.helius-rpc.com")
@@ -28,6 +28,11 @@ print(f"✅ Funcionalidade: Busca de tokens FUNCIONANDO")
 # Lista de RPCs simplificada - APENAS HELIUS
 SOLANA_RPC_URLS = [HELIUS_RPC_URL]
 
+# RPCs adicionais (separados por vírgula): as requisições são distribuídas entre todos
+# os saudáveis, na proporção da vazão medida de cada um (rpc_router.py)
+SOLANA_RPC_URLS += [url.strip() for url in os.getenv('EXTRA_RPC_URLS', '').split(',')
+                    if url.strip() and url.strip() not in SOLANA_RPC_URLS]
+
 # Configurações especiais por RPC (vazio para Helius)
 RPC_CONFIGS = {}
 
@@ -38,4 +43,119 @@ RPC_REQUEST_DELAY = float(os.getenv('RPC_REQUEST_DELAY', '0.0'))  # SEM delay en
 
 # Configurações do bot (lidas do .env ou valores padrão)
 MAX_WALLETS_DISPLAY = int(os.getenv('MAX_WALLETS_DISPLAY', '50'))  # Máximo de wallets para exibir
-CACHE_TIMEOUT = int(os.getenv('CACHE_TIMEOUT', '300'))  # Timeout do cache em segundos
\ No newline at end of file
+CACHE_TIMEOUT = int(os.getenv('CACHE_TIMEOUT', '300'))  # Timeout do cache em segundos
+
+# Pool de conexões HTTP compartilhado (uma sessão por processo, com keep-alive)
+HTTP_POOL_LIMIT = int(os.getenv('HTTP_POOL_LIMIT', '100'))  # Máximo de conexões abertas no total
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', '50'))  # Máximo de conexões por host
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', '60'))  # Segundos que uma conexão ociosa fica aberta
+HTTP_DNS_CACHE_TTL = int(os.getenv('HTTP_DNS_CACHE_TTL', '300'))  # Cache de DNS em segundos
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '10'))  # Timeout para abrir conexão
+HTTP_WARMUP_ENABLED = os.getenv('HTTP_WARMUP_ENABLED', 'true').lower() == 'true'  # Aquece conexões ao iniciar o bot
+HTTP_COMPRESSION = os.getenv('HTTP_COMPRESSION', 'true').lower() == 'true'  # Pede respostas comprimidas (gzip; br com o pacote Brotli)
+JSON_OFFLOAD_BYTES = int(os.getenv('JSON_OFFLOAD_BYTES', '262144'))  # Respostas maiores são decodificadas fora do event loop
+
+# Consultas de saldo em lote (getMultipleAccounts / JSON-RPC batch)
+BALANCE_BATCH_SIZE = int(os.getenv('BALANCE_BATCH_SIZE', '100'))  # Wallets por requisição (máx. 100)
+BALANCE_BATCH_WINDOW = float(os.getenv('BALANCE_BATCH_WINDOW', '0.02'))  # Janela para juntar consultas (segundos)
+BALANCE_BATCH_MODE = os.getenv('BALANCE_BATCH_MODE', 'multiple_accounts')  # multiple_accounts ou jsonrpc_batch
+
+# Busca paralela de transações (getSignaturesForAddress / getTransaction)
+TX_FETCH_CONCURRENCY = int(os.getenv('TX_FETCH_CONCURRENCY', '20'))  # Máximo de requisições simultâneas por consulta
+
+# Pipeline em streaming (signatures -> transações -> wallets -> saldos)
+SIGNATURE_PAGE_SIZE = int(os.getenv('SIGNATURE_PAGE_SIZE', '1000'))  # Signatures por página (máx. 1000)
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '200'))  # Itens em espera entre duas etapas
+PIPELINE_REORDER_WINDOW = int(os.getenv('PIPELINE_REORDER_WINDOW', '100'))  # Transações em andamento mantidas em ordem
+
+# Descoberta de holders: largest_accounts (até 20 maiores contas + histórico de signatures)
+# ou program_accounts (todas as contas do token em um getProgramAccounts, sem histórico)
+HOLDER_DISCOVERY_MODE = os.getenv('HOLDER_DISCOVERY_MODE', 'largest_accounts').lower()
+# Como descobrir os compradores: legacy (Solscan Pro e depois RPC, comportamento original),
+# auto (planejador escolhe pela estimativa de custo; pode trocar a fonte e o conjunto de
+# contas percorrido) ou uma estratégia fixa: solscan_transfers, mint_signatures,
+# largest_accounts ou program_accounts
+DISCOVERY_STRATEGY = os.getenv('DISCOVERY_STRATEGY', 'legacy').lower()
+
+# Armazenamento local de transações confirmadas (SQLite)
+TX_STORE_ENABLED = os.getenv('TX_STORE_ENABLED', 'true').lower() == 'true'  # Lê getTransaction do disco quando possível
+TX_STORE_PATH = os.getenv('TX_STORE_PATH', 'tx_store.db')  # Arquivo do banco SQLite
+TX_STORE_MAX_ENTRIES = int(os.getenv('TX_STORE_MAX_ENTRIES', '500000'))  # Máximo de transações armazenadas
+TX_STORE_MAX_MB = float(os.getenv('TX_STORE_MAX_MB', '1024'))  # Máximo de dados armazenados (MB, soma das transações)
+TX_STORE_WRITE_BATCH = int(os.getenv('TX_STORE_WRITE_BATCH', '200'))  # Escritas acumuladas por commit
+
+# Cache de saldos (TTL = CACHE_TIMEOUT)
+BALANCE_CACHE_MAX_ENTRIES = int(os.getenv('BALANCE_CACHE_MAX_ENTRIES', '50000'))  # Máximo de wallets em cache (LRU)
+
+# Cache de metadados de tokens (salvo em disco)
+METADATA_CACHE_TTL = int(os.getenv('METADATA_CACHE_TTL', '604800'))  # Metadados encontrados: 7 dias
+METADATA_NEGATIVE_TTL = int(os.getenv('METADATA_NEGATIVE_TTL', '1800'))  # Tokens não encontrados: 30 minutos
+METADATA_CACHE_MAX_ENTRIES = int(os.getenv('METADATA_CACHE_MAX_ENTRIES', '20000'))  # Máximo de tokens em cache
+METADATA_CACHE_PATH = os.getenv('METADATA_CACHE_PATH', 'token_metadata_cache.json')  # Arquivo do cache
+METADATA_FETCH_TIMEOUT = float(os.getenv('METADATA_FETCH_TIMEOUT', '10'))  # Timeout por fonte (segundos)
+METADATA_SAVE_DELAY = float(os.getenv('METADATA_SAVE_DELAY', '5'))  # Agrupa as gravações do cache em disco (segundos)
+
+# Resultado salvo por token (atualização incremental em vez de nova varredura completa)
+MINT_STORE_TTL = int(os.getenv('MINT_STORE_TTL', '86400'))  # Tempo que o resultado de um token é reaproveitado (segundos)
+MINT_STORE_MAX_MINTS = int(os.getenv('MINT_STORE_MAX_MINTS', '500'))  # Máximo de tokens guardados
+MINT_STORE_MAX_NEW_SIGNATURES = int(os.getenv('MINT_STORE_MAX_NEW_SIGNATURES', '10000'))  # Acima disso por conta, refaz a busca do zero
+
+# Orçamento global de requisições RPC simultâneas (compartilhado por todas as buscas, ex: /samewallets)
+# Controle adaptativo (AIMD): o limite sobe aos poucos com sucesso e cai pela metade com 429/timeout
+# Valores em unidades de peso (getTransaction pesa 3, getBalance 1 - ver rate_limiter.py)
+RPC_MAX_CONCURRENCY = int(os.getenv('RPC_MAX_CONCURRENCY', '100'))  # Teto do limite adaptativo
+RPC_MIN_CONCURRENCY = int(os.getenv('RPC_MIN_CONCURRENCY', '2'))  # Piso do limite adaptativo
+RPC_INITIAL_CONCURRENCY = int(os.getenv('RPC_INITIAL_CONCURRENCY', '20'))  # Limite inicial
+AIMD_INCREASE = float(os.getenv('AIMD_INCREASE', '1.0'))  # Aumento por janela de respostas bem-sucedidas
+AIMD_DECREASE = float(os.getenv('AIMD_DECREASE', '0.5'))  # Fator de redução ao receber 429
+AIMD_DECREASE_COOLDOWN = float(os.getenv('AIMD_DECREASE_COOLDOWN', '1.0'))  # Intervalo mínimo entre reduções (segundos)
+RPC_MAX_SHARED_PAUSE = float(os.getenv('RPC_MAX_SHARED_PAUSE', '1.0'))  # Teto da pausa (Retry-After) imposta às outras requisições
+RPC_THROTTLE_RETRIES = int(os.getenv('RPC_THROTTLE_RETRIES', '5'))  # Novas tentativas após 429 (com backoff)
+RPC_BACKOFF_BASE = float(os.getenv('RPC_BACKOFF_BASE', '0.25'))  # Base do backoff exponencial (segundos)
+RPC_BACKOFF_MAX = float(os.getenv('RPC_BACKOFF_MAX', '10.0'))  # Espera máxima entre tentativas (segundos)
+
+# /samewallets: máximo de tokens por consulta (a sobreposição usa IDs inteiros, então escala bem)
+SAMEWALLETS_MAX_TOKENS = int(os.getenv('SAMEWALLETS_MAX_TOKENS', '50'))
+
+# Solscan: transferências paginadas (ordenadas pelo servidor, mais antigas primeiro)
+SOLSCAN_PAGE_SIZE = int(os.getenv('SOLSCAN_PAGE_SIZE', '100'))  # Itens por página (10, 20, 30, 40, 60 ou 100)
+SOLSCAN_PREFETCH_PAGES = int(os.getenv('SOLSCAN_PREFETCH_PAGES', '2'))  # Páginas seguintes buscadas em paralelo
+SOLSCAN_MAX_PAGES = int(os.getenv('SOLSCAN_MAX_PAGES', '100'))  # Limite de páginas por token
+
+# Corrida entre fontes: Solscan Pro e RPC em paralelo (início escalonado), a primeira resposta válida vence
+SOURCE_RACE_ENABLED = os.getenv('SOURCE_RACE_ENABLED', 'false').lower() == 'true'
+SOURCE_RACE_STAGGER = float(os.getenv('SOURCE_RACE_STAGGER', '1.5'))  # Segundos até a segunda fonte começar
+
+# Roteamento entre RPCs: score por latência/erros (média móvel) e circuit breaker
+ROUTER_EWMA_ALPHA = float(os.getenv('ROUTER_EWMA_ALPHA', '0.2'))  # Peso da medição mais recente na média móvel
+ROUTER_FAILURE_THRESHOLD = int(os.getenv('ROUTER_FAILURE_THRESHOLD', '5'))  # Falhas seguidas para tirar o RPC de rotação
+ROUTER_OPEN_SECONDS = float(os.getenv('ROUTER_OPEN_SECONDS', '30'))  # Tempo fora de rotação antes do teste
+ROUTER_MAX_OPEN_SECONDS = float(os.getenv('ROUTER_MAX_OPEN_SECONDS', '300'))  # Tempo máximo fora (dobra a cada teste falho)
+
+# Hedge: cópia de chamadas só de leitura que passam do percentil de latência do método
+HEDGE_ENABLED = os.getenv('HEDGE_ENABLED', 'true').lower() == 'true'
+HEDGE_PERCENTILE = float(os.getenv('HEDGE_PERCENTILE', '0.95'))  # Percentil da latência usado como espera
+HEDGE_MIN_DELAY = float(os.getenv('HEDGE_MIN_DELAY', '0.05'))  # Espera mínima antes da cópia (segundos)
+HEDGE_MAX_DELAY = float(os.getenv('HEDGE_MAX_DELAY', '5.0'))  # Espera máxima antes da cópia (segundos)
+HEDGE_MIN_SAMPLES = int(os.getenv('HEDGE_MIN_SAMPLES', '20'))  # Amostras por método antes de começar
+HEDGE_BUDGET_RATIO = float(os.getenv('HEDGE_BUDGET_RATIO', '0.1'))  # Cópias por requisição (10% de carga extra no máximo)
+HEDGE_BUDGET_BURST = int(os.getenv('HEDGE_BUDGET_BURST', '10'))  # Cópias acumuladas disponíveis de uma vez
+
+# Fila de buscas do bot: limite global e por usuário (rodízio justo entre usuários)
+SCHED_GLOBAL_CONCURRENCY = int(os.getenv('SCHED_GLOBAL_CONCURRENCY', '4'))  # Buscas pesadas ao mesmo tempo
+SCHED_PER_USER_CONCURRENCY = int(os.getenv('SCHED_PER_USER_CONCURRENCY', '1'))  # Buscas pesadas por usuário
+
+# Métricas (formato Prometheus) em um endpoint HTTP local e comando /stats para administradores
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')  # Só local por padrão
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9464'))
+ADMIN_USER_IDS = {int(user_id) for user_id in os.getenv('ADMIN_USER_IDS', '').split(',') if user_id.strip().isdigit()}
+
+# Gravação/reprodução das chamadas HTTP (RPC, Solscan, Jupiter)
+# live = rede normal; record = rede + grava cada requisição/resposta; replay = responde do arquivo, sem rede
+TRANSPORT_MODE = os.getenv('TRANSPORT_MODE', 'live').lower()
+TRANSPORT_FIXTURE_PATH = os.getenv('TRANSPORT_FIXTURE_PATH', 'fixtures/session.jsonl.gz')  # Arquivo JSONL (gzip)
+TRANSPORT_REPLAY_SPEED = float(os.getenv('TRANSPORT_REPLAY_SPEED', '0'))  # 0 = instantâneo; 1 = latência original
+
+# Codificação do getTransaction: base64 (decodificado localmente com solders, resposta bem menor) ou jsonParsed
+TX_ENCODING = os.getenv('TX_ENCODING', 'base64')
@@ -0,0 +1,351 @@
+import asyncio
+import math
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from config import (
+    MAX_WALLETS_DISPLAY, BALANCE_BATCH_SIZE, SIGNATURE_PAGE_SIZE, SOLSCAN_PRO_API_KEY, SOLSCAN_PAGE_SIZE,
+    SOLSCAN_PREFETCH_PAGES, SOLSCAN_MAX_PAGES, HOLDER_DISCOVERY_MODE, DISCOVERY_STRATEGY,
+    SOURCE_RACE_ENABLED, SOURCE_RACE_STAGGER
+)
+from buyer_records import encode_wallet
+from metrics import metrics, count_requests
+
+# Wallets novas por transação (média aproximada em tokens reais; usada só nas estimativas)
+WALLETS_PER_TRANSACTION = 0.5
+# Signatures lidas na sondagem e no histórico de cada endereço (o pipeline lê até 1000)
+PROBE_SIGNATURES = 1000
+# getTokenLargestAccounts devolve no máximo 20 contas
+LARGEST_ACCOUNTS_LIMIT = 20
+
+def _pages(items: float, page_size: int) -> int:
+    return max(1, math.ceil(items / page_size))
+
+def _balance_calls(wallets: float) -> int:
+    return math.ceil(wallets / min(BALANCE_BATCH_SIZE, 100)) if wallets > 0 else 0
+
+def valid_result(result: Optional[tuple], mint_address: str) -> bool:
+    """Resultado aproveitável: há wallets e todas são chaves públicas válidas (nenhuma é o próprio mint)"""
+    if not result or not result[0]:
+        return False
+    return all(wallet != mint_address and encode_wallet(wallet) is not None for wallet in result[0])
+
+async def race_sources(sources: List[Tuple[str, Callable[[], Awaitable]]], stagger: float,
+                       validate: Callable[[object], bool]) -> Optional[Tuple[str, object]]:
+    """
+    Corrida entre fontes: cada uma começa stagger segundos depois da anterior (ou
+    imediatamente, se todas as que já começaram terminaram sem resultado válido)
+    O primeiro resultado válido vence e as outras são canceladas (economiza cota)
+    Retorna (nome da fonte, resultado) ou None se nenhuma acertar
+    """
+    loop = asyncio.get_running_loop()
+    waiting = list(sources)
+    running: Dict[asyncio.Task, str] = {}
+    next_start = loop.time()
+    try:
+        while waiting or running:
+            if waiting and (not running or loop.time() >= next_start):
+                name, start = waiting.pop(0)
+                running[asyncio.ensure_future(start())] = name
+                next_start = loop.time() + stagger
+                continue
+
+            timeout = max(0.0, next_start - loop.time()) if waiting else None
+            done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = running.pop(task)
+                try:
+                    result = task.result()
+                except Exception as e:
+                    print(f"❌ Corrida: erro em {name}: {e}")
+                    continue
+                if validate(result):
+                    if running or waiting:
+                        losers = ", ".join(list(running.values()) + [n for n, _ in waiting])
+                        print(f"🏁 Corrida: {name} venceu - cancelando {losers}")
+                    return name, result
+                print(f"⚠️ Corrida: {name} terminou sem resultado válido")
+        return None
+    finally:
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+
+class DiscoveryProbe:
+    """Sondagem barata de um token: supply, maiores contas e densidade de signatures"""
+    def __init__(self, mint_address: str, supply: int, largest_accounts: List[Dict], mint_signatures: int,
+                 account_signatures: List[int]):
+        self.mint_address = mint_address
+        self.supply = supply  # Quantidade bruta (sem decimais); 0 se desconhecida
+        self.largest_accounts = largest_accounts
+        self.mint_signatures = mint_signatures  # Signatures do próprio mint (até PROBE_SIGNATURES)
+        self.account_signatures = account_signatures  # Signatures da maior e da menor das maiores contas
+
+    @property
+    def holders(self) -> Optional[int]:
+        """Número exato de contas quando o getTokenLargestAccounts não veio cheio"""
+        count = len(self.largest_accounts)
+        return count if count < LARGEST_ACCOUNTS_LIMIT else None
+
+    @property
+    def signatures_per_account(self) -> float:
+        """Média estimada de signatures por conta (interpolação entre a maior e a menor)"""
+        if not self.account_signatures:
+            return 0.0
+        return sum(self.account_signatures) / len(self.account_signatures)
+
+    def describe(self) -> str:
+        holders = self.holders if self.holders is not None else f"{LARGEST_ACCOUNTS_LIMIT}+"
+        mint = f"{PROBE_SIGNATURES}+" if self.mint_signatures >= PROBE_SIGNATURES else self.mint_signatures
+        accounts = "/".join(str(count) for count in self.account_signatures) or "-"
+        return f"supply {self.supply} | contas {holders} | signatures do mint {mint} | signatures maior/menor conta {accounts}"
+
+class DiscoveryStrategy(ABC):
+    """
+    Uma forma de descobrir os compradores de um token
+    estimate() devolve (requisições, wallets esperadas) a partir da sondagem (None = não se aplica)
+    run() devolve (wallets, token_info, BuyerRecords), ou None/vazio se não encontrou nada
+    """
+    name = ''
+    source = 'rpc'  # Fonte de dados (a corrida junta estratégias de fontes diferentes)
+    chronological = True  # False: holders atuais em vez da ordem de compra
+
+    def __init__(self, rpc):
+        self.rpc = rpc  # Instância de SolanaRPC
+
+    @abstractmethod
+    def estimate(self, probe: DiscoveryProbe, max_buyers: Optional[int]) -> Optional[Tuple[int, int]]:
+        ...
+
+    @abstractmethod
+    async def run(self, probe: DiscoveryProbe, max_buyers: Optional[int]) -> Optional[tuple]:
+        ...
+
+class SolscanTransfersStrategy(DiscoveryStrategy):
+    """Transferências do Solscan Pro em ordem cronológica (para ao juntar max_buyers wallets)"""
+    name = 'solscan_transfers'
+    source = 'solscan'
+
+    def __init__(self, rpc, solscan):
+        super().__init__(rpc)
+        self.solscan = solscan  # Instância de SolscanAPI
+
+    def estimate(self, probe, max_buyers):
+        if not SOLSCAN_PRO_API_KEY:
+            return None
+        if max_buyers:
+            transfers = max_buyers / WALLETS_PER_TRANSACTION
+        elif probe.mint_signatures < PROBE_SIGNATURES:
+            transfers = probe.mint_signatures
+        else:
+            transfers = SOLSCAN_MAX_PAGES * SOLSCAN_PAGE_SIZE
+        # Ao parar, as páginas buscadas em paralelo também já foram pedidas
+        pages = min(SOLSCAN_MAX_PAGES, _pages(transfers, SOLSCAN_PAGE_SIZE) + SOLSCAN_PREFETCH_PAGES)
+        wallets = round(transfers * WALLETS_PER_TRANSACTION)
+        if max_buyers:
+            wallets = min(wallets, max_buyers)
+        return pages + _balance_calls(wallets), wallets
+
+    async def run(self, probe, max_buyers):
+        return await self.solscan.extract_buyers_solscan(probe.mint_address, max_buyers)
+
+class MintSignatureScanStrategy(DiscoveryStrategy):
+    """Histórico de signatures do próprio mint (um único endereço em vez das 20 maiores contas)"""
+    name = 'mint_signatures'
+
+    def estimate(self, probe, max_buyers):
+        if not probe.mint_signatures:
+            return None
+        signatures = probe.mint_signatures
+        wallets = round(signatures * WALLETS_PER_TRANSACTION)
+        # getAccountInfo do mint + páginas de signatures + getTransaction de cada uma + saldos
+        return 1 + _pages(signatures, SIGNATURE_PAGE_SIZE) + signatures + _balance_calls(wallets), wallets
+
+    async def run(self, probe, max_buyers):
+        return await self.rpc.extract_buyers_from_mint(
+            probe.mint_address, accounts=[{'address': probe.mint_address}], holder_mode='largest_accounts',
+            scope=self.name
+        )
+
+class LargestAccountsStrategy(DiscoveryStrategy):
+    """Histórico de cada uma das maiores contas do token (até 20)"""
+    name = 'largest_accounts'
+
+    def estimate(self, probe, max_buyers):
+        if not probe.largest_accounts:
+            return None
+        accounts = len(probe.largest_accounts)
+        per_account = probe.signatures_per_account
+        signatures = accounts * per_account
+        wallets = round(signatures * WALLETS_PER_TRANSACTION)
+        pages = accounts * _pages(per_account, SIGNATURE_PAGE_SIZE)
+        return round(1 + pages + signatures) + _balance_calls(wallets), wallets
+
+    async def run(self, probe, max_buyers):
+        return await self.rpc.extract_buyers_from_mint(
+            probe.mint_address, accounts=probe.largest_accounts or None, holder_mode='largest_accounts'
+        )
+
+class ProgramAccountsStrategy(DiscoveryStrategy):
+    """Todas as contas do token em um getProgramAccounts (holders atuais, maior saldo primeiro)"""
+    name = 'program_accounts'
+    chronological = False
+
+    def estimate(self, probe, max_buyers):
+        if not probe.supply:
+            return None
+        holders = probe.holders
+        if holders is None:
+            # Mais contas do que o getTokenLargestAccounts mostra: pelo menos 20, ou o que o histórico indica
+            holders = max(LARGEST_ACCOUNTS_LIMIT, round(probe.mint_signatures * WALLETS_PER_TRANSACTION))
+        # getAccountInfo do mint + getProgramAccounts + saldos
+        return 2 + _balance_calls(holders), holders
+
+    async def run(self, probe, max_buyers):
+        return await self.rpc.extract_buyers_from_mint(probe.mint_address, holder_mode='program_accounts')
+
+class DiscoveryPlanner:
+    """
+    Escolhe como descobrir os compradores de um token pelo custo estimado
+    0. Token com resultado salvo (mint_results): só a atualização incremental, sem sondagem
+    1. Sondagem barata (5 requisições): supply, maiores contas, signatures do mint
+       e das contas maior/menor (densidade)
+    2. Estimativa de requisições e wallets de cada estratégia
+    3. Roda a mais barata que alcança o alvo (max_buyers ou MAX_WALLETS_DISPLAY); se
+       não encontrar nada, a próxima do plano
+    Registra o plano e o custo real contra o estimado (log e métricas discovery_*); o custo
+    é contado só nas requisições desta busca (count_requests), mesmo com buscas simultâneas.
+    """
+    def __init__(self, rpc, solscan, strategy: str = DISCOVERY_STRATEGY):
+        self.rpc = rpc
+        self.strategy = strategy
+        self.strategies: List[DiscoveryStrategy] = [
+            SolscanTransfersStrategy(rpc, solscan),
+            MintSignatureScanStrategy(rpc),
+            LargestAccountsStrategy(rpc),
+            ProgramAccountsStrategy(rpc),
+        ]
+
+    async def probe(self, mint_address: str) -> DiscoveryProbe:
+        supply, largest, mint_signatures = await asyncio.gather(
+            self.rpc.get_token_supply(mint_address),
+            self.rpc.get_token_accounts_by_mint(mint_address),
+            self.rpc.get_signatures_page(mint_address, PROBE_SIGNATURES)
+        )
+        edges = [largest[0], largest[-1]] if len(largest) > 1 else largest
+        pages = await asyncio.gather(*(self.rpc.get_signatures_page(account['address'], PROBE_SIGNATURES)
+                                       for account in edges if account.get('address')))
+        try:
+            amount = int(supply.get('amount', 0))
+        except (TypeError, ValueError):
+            amount = 0
+        return DiscoveryProbe(mint_address, amount, largest, len(mint_signatures), [len(page) for page in pages])
+
+    def plan(self, probe: DiscoveryProbe, max_buyers: Optional[int]) -> List[Tuple[DiscoveryStrategy, int, int]]:
+        """(estratégia, requisições, wallets) em ordem de tentativa"""
+        target = max_buyers or MAX_WALLETS_DISPLAY
+        candidates = []
+        for strategy in self.strategies:
+            if self.strategy not in ('auto', strategy.name):
+                continue
+            # Holders atuais só entram no automático se a configuração pedir esse modo
+            if self.strategy == 'auto' and not strategy.chronological and HOLDER_DISCOVERY_MODE != 'program_accounts':
+                continue
+            estimate = strategy.estimate(probe, max_buyers)
+            if estimate is not None:
+                candidates.append((strategy, *estimate))
+        # Primeiro as que alcançam o alvo (mais barata primeiro), depois as que rendem mais wallets
+        return sorted(candidates, key=lambda c: (c[2] < target, c[1] if c[2] >= target else -c[2]))
+
+    async def run(self, mint_address: str, max_buyers: Optional[int]) -> Optional[tuple]:
+        """Sonda, planeja e executa; retorna (wallets, token_info, BuyerRecords) ou None"""
+        stored = self._stored_strategy(mint_address)
+        if stored is not None:
+            # Já há resultado salvo: atualização incremental pela mesma estratégia, sem sondar de novo
+            print(f"♻️ Resultado salvo ({stored.name}): atualização incremental sem sondagem")
+            with count_requests() as spent:
+                try:
+                    result = await stored.run(DiscoveryProbe(mint_address, 0, [], 0, []), max_buyers)
+                except Exception as e:
+                    print(f"❌ Erro na estratégia {stored.name}: {e}")
+                    result = None
+            if valid_result(result, mint_address):
+                metrics.inc('discovery_runs_total', strategy=stored.name, outcome='incremental')
+                metrics.inc('discovery_requests_total', spent.count, strategy=stored.name)
+                return result
+            print(f"⚠️ Atualização incremental sem wallets válidas - planejando do zero")
+
+        with count_requests() as spent:
+            probe = await self.probe(mint_address)
+        probe_cost = spent.count
+        metrics.inc('discovery_probe_requests_total', probe_cost)
+        print(f"🧭 Sondagem ({probe_cost:.0f} req): {probe.describe()}")
+
+        plan = self.plan(probe, max_buyers)
+        if not plan:
+            print("🧭 Nenhuma estratégia de descoberta se aplica a este token")
+            return None
+        print("🧭 Plano: " + " → ".join(f"{s.name} (~{cost} req, ~{wallets} wallets)" for s, cost, wallets in plan))
+
+        if SOURCE_RACE_ENABLED:
+            # A melhor estratégia corre contra a melhor da outra fonte (Solscan x RPC)
+            rival = next((entry for entry in plan[1:] if entry[0].source != plan[0][0].source), None)
+            if rival is not None:
+                result = await self._race([plan[0], rival], probe, max_buyers, probe_cost)
+                if result:
+                    return result
+                plan = [entry for entry in plan if entry is not plan[0] and entry is not rival]
+
+        for strategy, estimated, expected in plan:
+            with count_requests() as spent:
+                try:
+                    result = await strategy.run(probe, max_buyers)
+                except Exception as e:
+                    print(f"❌ Erro na estratégia {strategy.name}: {e}")
+                    result = None
+            found = len(result[0]) if valid_result(result, mint_address) else 0
+            self._report(strategy.name, estimated, expected, spent.count, found, probe_cost)
+            if found:
+                return result
+            print(f"⚠️ {strategy.name} não encontrou wallets válidas - tentando a próxima estratégia")
+        return None
+
+    def _stored_strategy(self, mint_address: str) -> Optional[DiscoveryStrategy]:
+        """Estratégia permitida que já tem estado incremental salvo para o token (mint_results)"""
+        scopes = self.rpc.mint_results.scopes(mint_address)
+        for strategy in self.strategies:
+            if strategy.name in scopes and self.strategy in ('auto', strategy.name):
+                return strategy
+        return None
+
+    async def _race(self, entries: List[Tuple[DiscoveryStrategy, int, int]], probe: DiscoveryProbe,
+                    max_buyers: Optional[int], probe_cost: float) -> Optional[tuple]:
+        """Corrida entre as estratégias (início escalonado); o custo medido inclui a perdedora"""
+        names = " x ".join(strategy.name for strategy, _, _ in entries)
+        print(f"🏁 Corrida: {names} (segunda fonte após {SOURCE_RACE_STAGGER:.1f}s)")
+        with count_requests() as spent:
+            winner = await race_sources(
+                [(strategy.name, lambda strategy=strategy: strategy.run(probe, max_buyers)) for strategy, _, _ in entries],
+                SOURCE_RACE_STAGGER, lambda result: valid_result(result, probe.mint_address)
+            )
+        actual = spent.count
+        if winner is None:
+            for strategy, _, _ in entries:
+                metrics.inc('discovery_runs_total', strategy=strategy.name, outcome='empty')
+            print(f"⚠️ Corrida sem resultado válido ({actual:.0f} req)")
+            return None
+
+        name, result = winner
+        _, estimated, expected = next(entry for entry in entries if entry[0].name == name)
+        metrics.inc('discovery_race_wins_total', strategy=name)
+        self._report(name, estimated, expected, actual, len(result[0]), probe_cost)
+        return result
+
+    def _report(self, name: str, estimated: int, expected: int, actual: float, found: int, probe_cost: float):
+        """Custo real contra o estimado (log e métricas)"""
+        deviation = f"{actual / estimated - 1:+.0%}" if estimated else "-"
+        print(f"📐 {name}: {actual:.0f} req (estimado {estimated}, {deviation}) | "
+              f"{found} wallets (estimado {expected}) | total com sondagem: {actual + probe_cost:.0f} req")
+        metrics.inc('discovery_runs_total', strategy=name, outcome='found' if found else 'empty')
+        metrics.inc('discovery_requests_total', actual, strategy=name)
+        metrics.inc('discovery_estimated_requests_total', estimated, strategy=name)
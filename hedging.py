@@ -0,0 +1,119 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+from config import (
+    HEDGE_PERCENTILE, HEDGE_MIN_DELAY, HEDGE_MAX_DELAY, HEDGE_MIN_SAMPLES,
+    HEDGE_BUDGET_RATIO, HEDGE_BUDGET_BURST
+)
+
+# Métodos só de leitura: repetir a chamada não tem efeito colateral
+HEDGEABLE_METHODS = {
+    'getTransaction', 'getSignaturesForAddress', 'getMultipleAccounts', 'getAccountInfo',
+    'getTokenLargestAccounts', 'getTokenSupply', 'getBalance', 'getProgramAccounts',
+}
+
+class LatencyWindow:
+    """Últimas latências de um método, para calcular o percentil usado como espera do hedge"""
+    def __init__(self, size: int = 500):
+        self.samples = deque(maxlen=size)
+        self._cached: Optional[float] = None
+        self._since_cache = 0
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+        self._since_cache += 1
+        if self._since_cache >= 25:
+            self._cached = None  # Recalcula o percentil de tempos em tempos, não a cada amostra
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self.samples) < HEDGE_MIN_SAMPLES:
+            return None
+        if self._cached is None:
+            ordered = sorted(self.samples)
+            self._cached = ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+            self._since_cache = 0
+        return self._cached
+
+class RequestHedger:
+    """
+    Requisições "hedged": se a chamada não responder até o percentil
+    HEDGE_PERCENTILE da latência do método, envia uma cópia (o roteador
+    escolhe o mesmo ou outro RPC) e usa a primeira resposta válida,
+    cancelando a outra. As cópias ficam limitadas a HEDGE_BUDGET_RATIO
+    das requisições (balde de créditos), para não virar carga extra.
+    """
+    def __init__(self):
+        self.windows: Dict[str, LatencyWindow] = {}
+        self.budget = float(HEDGE_BUDGET_BURST)
+        self.stats = {'requests': 0, 'hedged': 0, 'hedge_wins': 0, 'primary_wins': 0, 'budget_denied': 0}
+
+    def delay(self, method: str) -> Optional[float]:
+        """Espera antes de enviar a cópia (None: poucas amostras ainda)"""
+        window = self.windows.get(method)
+        value = window.percentile(HEDGE_PERCENTILE) if window else None
+        if value is None:
+            return None
+        return min(max(value, HEDGE_MIN_DELAY), HEDGE_MAX_DELAY)
+
+    def _observe(self, method: str, seconds: float):
+        self.windows.setdefault(method, LatencyWindow()).add(seconds)
+
+    def _take_budget(self) -> bool:
+        if self.budget >= 1:
+            self.budget -= 1
+            return True
+        self.stats['budget_denied'] += 1
+        return False
+
+    async def run(self, method: str, call: Callable[[], Awaitable[Optional[Dict]]]) -> Optional[Dict]:
+        """Executa call(); se demorar, dispara uma cópia e retorna o primeiro resultado válido"""
+        self.stats['requests'] += 1
+        self.budget = min(HEDGE_BUDGET_BURST, self.budget + HEDGE_BUDGET_RATIO)
+
+        async def timed():
+            started = time.monotonic()
+            try:
+                result = await call()
+            except asyncio.CancelledError:
+                # Chamada lenta cancelada: a espera até aqui ainda é uma amostra (limite inferior)
+                self._observe(method, time.monotonic() - started)
+                raise
+            if result is not None:
+                self._observe(method, time.monotonic() - started)
+            return result
+
+        delay = self.delay(method)
+        primary = asyncio.ensure_future(timed())
+        if delay is None:
+            return await primary
+
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done or not self._take_budget():
+                return await primary
+
+            self.stats['hedged'] += 1
+            hedge = asyncio.ensure_future(timed())
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.cancelled() or task.exception() is not None or task.result() is None:
+                        continue  # Falhou: espera a outra
+                    self.stats['hedge_wins' if task is hedge else 'primary_wins'] += 1
+                    return task.result()
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def snapshot(self) -> Dict:
+        hedged = self.stats['hedged']
+        return {
+            **self.stats,
+            'hedge_rate': hedged / self.stats['requests'] if self.stats['requests'] else 0.0,
+            'hedge_win_rate': self.stats['hedge_wins'] / hedged if hedged else 0.0,
+            'delays': {method: self.delay(method) for method in self.windows}
+        }
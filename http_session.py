@@ -0,0 +1,75 @@
+import aiohttp
+import asyncio
+from typing import List, Optional
+from config import (
+    HTTP_POOL_LIMIT, HTTP_POOL_LIMIT_PER_HOST, HTTP_KEEPALIVE_TIMEOUT,
+    HTTP_DNS_CACHE_TTL, HTTP_CONNECT_TIMEOUT, HTTP_WARMUP_ENABLED
+)
+
+class HttpSessionManager:
+    """
+    Mantém UMA sessão aiohttp compartilhada por processo
+    Reaproveita conexões TCP+TLS (keep-alive) entre todas as chamadas RPC e Solscan
+    """
+    def __init__(self):
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        """Cria a sessão com pool de conexões, keep-alive e cache de DNS"""
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+            use_dns_cache=True
+        )
+        # Timeout total é definido por requisição; aqui só limita a conexão
+        timeout = aiohttp.ClientTimeout(total=None, connect=HTTP_CONNECT_TIMEOUT)
+        return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Retorna a sessão compartilhada, criando (ou recriando) se necessário"""
+        if self.session is not None and not self.session.closed:
+            return self.session
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            if self.session is None or self.session.closed:
+                self.session = self._create_session()
+                print(f"🔌 Sessão HTTP criada (pool: {HTTP_POOL_LIMIT}, por host: {HTTP_POOL_LIMIT_PER_HOST})")
+        return self.session
+
+    async def warmup(self, rpc_urls: List[str]):
+        """
+        Abre as conexões com os RPCs antes da primeira consulta
+        Usa getHealth (barato) só para completar o handshake TCP+TLS
+        """
+        if not HTTP_WARMUP_ENABLED:
+            return
+
+        session = await self.get_session()
+        payload = {"jsonrpc": "2.0", "id": 1, "method": "getHealth"}
+
+        async def _warm(url: str):
+            try:
+                async with session.post(url, json=payload, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                    await response.read()
+                    print(f"🔥 Conexão aquecida: {url[:40]}... (status {response.status})")
+            except Exception as e:
+                print(f"⚠️ Falha ao aquecer conexão com {url[:40]}...: {e}")
+
+        await asyncio.gather(*[_warm(url) for url in rpc_urls])
+
+    async def close(self):
+        """Fecha a sessão compartilhada e libera as conexões do pool"""
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+            print("🔌 Sessão HTTP encerrada")
+        self.session = None
+        self._lock = None
+
+# Instância global da sessão HTTP
+http_session = HttpSessionManager()
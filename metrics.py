@@ -0,0 +1,236 @@
+import bisect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+from aiohttp import web
+from config import METRICS_ENABLED, METRICS_HOST, METRICS_PORT
+
+# Limites dos buckets de latência (segundos)
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Descrição das métricas principais (linha # HELP)
+HELP = {
+    'rpc_request_duration_seconds': 'Latência de cada tentativa RPC',
+    'rpc_responses_total': 'Respostas RPC por status HTTP (ou timeout/error)',
+    'rpc_response_bytes_total': 'Bytes recebidos do RPC (JSON descomprimido)',
+    'rpc_wire_bytes_total': 'Bytes do RPC na rede (comprimidos, quando o servidor comprime)',
+    'rpc_retries_total': 'Novas tentativas RPC (retry, 429 ou troca de RPC)',
+    'solscan_request_duration_seconds': 'Latência das chamadas à API do Solscan',
+    'solscan_responses_total': 'Respostas do Solscan por status HTTP',
+    'solscan_response_bytes_total': 'Bytes recebidos do Solscan (JSON descomprimido)',
+    'solscan_wire_bytes_total': 'Bytes do Solscan na rede',
+    'discovery_runs_total': 'Execuções de cada estratégia de descoberta de compradores',
+    'discovery_requests_total': 'Requisições gastas por estratégia de descoberta (medidas)',
+    'discovery_estimated_requests_total': 'Requisições estimadas pelo planejador por estratégia',
+    'discovery_probe_requests_total': 'Requisições gastas nas sondagens do planejador',
+    'discovery_race_wins_total': 'Corridas entre fontes vencidas por estratégia',
+    'bot_command_duration_seconds': 'Duração de cada comando/mensagem do bot',
+    'bot_commands_total': 'Comandos/mensagens do bot por resultado',
+    'process_uptime_seconds': 'Tempo desde o início do processo',
+}
+
+# Serviços externos contados por count_requests (requisições que gastam cota)
+COUNTED_SERVICES = ('rpc', 'solscan')
+
+LabelKey = Tuple[Tuple[str, str], ...]
+# Coletor chamado na hora da leitura: produz (nome, tipo, labels, valor)
+Collector = Callable[[], Iterable[Tuple[str, str, Dict[str, str], float]]]
+
+def endpoint_label(url: str) -> str:
+    """Só o host do endpoint (nunca caminho/query, que podem ter chaves de API)"""
+    return urlparse(url).netloc or url
+
+def _key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+class RequestCounter:
+    """Requisições externas feitas dentro de um bloco count_requests (e das tarefas criadas nele)"""
+    def __init__(self):
+        self.count = 0
+
+# Contadores ativos no contexto atual; aninháveis (o planejador conta a busca que ele mesmo chama)
+_request_counters: ContextVar[Tuple[RequestCounter, ...]] = ContextVar('request_counters', default=())
+
+@contextmanager
+def count_requests() -> Iterator[RequestCounter]:
+    """
+    Conta as requisições RPC/Solscan só deste fluxo: tarefas criadas dentro do bloco herdam
+    o contador, então buscas simultâneas não entram na conta umas das outras
+    """
+    counter = RequestCounter()
+    token = _request_counters.set(_request_counters.get() + (counter,))
+    try:
+        yield counter
+    finally:
+        _request_counters.reset(token)
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Último = acima do maior limite (+Inf)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimativa do quantil pelo limite do bucket (suficiente para o /stats)"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return float('inf')
+
+class MetricsRegistry:
+    """
+    Contadores e histogramas em memória, exportados no formato texto do Prometheus
+    Valores que já existem em outros objetos (caches, filas, limites) são lidos
+    por coletores registrados, na hora da consulta.
+    """
+    def __init__(self):
+        self.counters: Dict[str, Dict[LabelKey, float]] = {}
+        self.histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self.collectors: List[Collector] = []
+        self.started_at = time.time()
+        self._runner: Optional[web.AppRunner] = None
+
+    def inc(self, name: str, value: float = 1, **labels):
+        series = self.counters.setdefault(name, {})
+        key = _key(labels)
+        series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        series = self.histograms.setdefault(name, {})
+        key = _key(labels)
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram()
+        histogram.observe(value)
+
+    def record_request(self, service: str, status, started: float, size: int = 0, wire_size: int = 0, **labels):
+        """
+        Uma chamada HTTP externa: latência, status e bytes recebidos (service = 'rpc', 'solscan'...)
+        size = corpo descomprimido; wire_size = bytes na rede
+        """
+        self.observe(f'{service}_request_duration_seconds', time.monotonic() - started, **labels)
+        self.inc(f'{service}_responses_total', status=status, **labels)
+        if service in COUNTED_SERVICES:
+            for counter in _request_counters.get():
+                counter.count += 1
+        if size:
+            self.inc(f'{service}_response_bytes_total', size, **labels)
+        if wire_size:
+            self.inc(f'{service}_wire_bytes_total', wire_size, **labels)
+
+    def register_collector(self, collector: Collector):
+        self.collectors.append(collector)
+
+    def collect_gauges(self) -> Dict[str, Dict[LabelKey, Tuple[str, float]]]:
+        gauges: Dict[str, Dict[LabelKey, Tuple[str, float]]] = {}
+        for collector in self.collectors:
+            try:
+                for name, kind, labels, value in collector():
+                    gauges.setdefault(name, {})[_key(labels)] = (kind, float(value))
+            except Exception as e:
+                print(f"⚠️ Erro em coletor de métricas: {e}")
+        return gauges
+
+    def render(self) -> str:
+        """Todas as métricas no formato texto do Prometheus"""
+        lines = []
+        for name, series in sorted(self.counters.items()):
+            if name in HELP:
+                lines.append(f"# HELP {name} {HELP[name]}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in series.items():
+                lines.append(f"{name}{_format_labels(key)} {value:g}")
+
+        for name, series in sorted(self.histograms.items()):
+            if name in HELP:
+                lines.append(f"# HELP {name} {HELP[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, histogram in series.items():
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', f'{bound:g}'))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {histogram.count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+
+        for name, series in sorted(self.collect_gauges().items()):
+            kind = next(iter(series.values()))[0]
+            lines.append(f"# TYPE {name} {kind}")
+            for key, (_, value) in series.items():
+                lines.append(f"{name}{_format_labels(key)} {value:g}")
+
+        lines.append(f"# HELP process_uptime_seconds {HELP['process_uptime_seconds']}")
+        lines.append("# TYPE process_uptime_seconds gauge")
+        lines.append(f"process_uptime_seconds {time.time() - self.started_at:.0f}")
+        return '\n'.join(lines) + '\n'
+
+    def summary(self, name: str, by: str) -> Dict[str, Dict]:
+        """Resumo de um histograma agrupado por um label (para o /stats): quantidade, média, p50, p95"""
+        merged: Dict[str, Histogram] = {}
+        for key, histogram in self.histograms.get(name, {}).items():
+            label = dict(key).get(by, '-')
+            total = merged.setdefault(label, Histogram(histogram.buckets))
+            total.counts = [a + b for a, b in zip(total.counts, histogram.counts)]
+            total.sum += histogram.sum
+            total.count += histogram.count
+        return {
+            label: {
+                'count': h.count,
+                'avg': h.sum / h.count if h.count else 0.0,
+                'p50': h.quantile(0.5),
+                'p95': h.quantile(0.95)
+            }
+            for label, h in merged.items()
+        }
+
+    def counter_total(self, name: str, **match) -> float:
+        """Soma das séries de um contador cujos labels batem com match"""
+        wanted = {k: str(v) for k, v in match.items()}
+        return sum(value for key, value in self.counters.get(name, {}).items()
+                   if all(dict(key).get(k) == v for k, v in wanted.items()))
+
+    async def start_server(self):
+        """Endpoint HTTP local com as métricas (GET /metrics)"""
+        if not METRICS_ENABLED or self._runner is not None:
+            return
+
+        async def handle(request):
+            return web.Response(text=self.render(), content_type='text/plain', charset='utf-8')
+
+        app = web.Application()
+        app.router.add_get('/metrics', handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, METRICS_HOST, METRICS_PORT).start()
+        print(f"📈 Métricas em http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+
+    async def stop_server(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+# Instância global
+metrics = MetricsRegistry()
@@ -0,0 +1,58 @@
+from typing import Dict, List, Optional
+from config import MINT_STORE_TTL, MINT_STORE_MAX_MINTS
+from cache import TTLCache
+from buyer_records import BuyerRecords
+
+# Conjunto de endereços cujo histórico foi percorrido: o das maiores contas do token
+DEFAULT_SCOPE = 'largest_accounts'
+
+class MintResultStore:
+    """
+    Guarda o resultado da última busca de compradores de cada token
+    Para cada conta de token registra a signature/slot mais nova já vista,
+    permitindo que a próxima consulta busque só as signatures novas (until)
+    Cada estratégia guarda seu estado em um scope próprio (ex.: largest_accounts,
+    mint_signatures): buscas sobre conjuntos de contas diferentes não se misturam
+    """
+    def __init__(self, ttl: float = MINT_STORE_TTL, max_mints: int = MINT_STORE_MAX_MINTS):
+        self.cache = TTLCache(ttl=ttl, max_entries=max_mints, name='mint_results')
+
+    def get(self, mint_address: str, scope: str = DEFAULT_SCOPE) -> Optional[Dict]:
+        """
+        Resultado salvo do token para o conjunto de endereços percorrido (scope):
+        {'buyers': BuyerRecords, 'accounts': {endereço: {'index', 'newest_signature', 'newest_slot', 'sig_count'}},
+         'token_info': dict}
+        """
+        return self.cache.get(mint_address, {}).get(scope)
+
+    def save(self, mint_address: str, buyers: BuyerRecords, accounts: Dict[str, Dict], scope: str = DEFAULT_SCOPE,
+             token_info: Optional[Dict] = None):
+        """Salva a lista ordenada de compradores e o cursor de cada conta (sem tocar nos outros scopes)"""
+        scopes = dict(self.cache.peek(mint_address) or {})
+        scopes[scope] = {
+            'buyers': buyers.copy(),
+            'accounts': {address: dict(state) for address, state in accounts.items()},
+            'token_info': dict(token_info or {})
+        }
+        self.cache.set(mint_address, scopes)
+
+    def scopes(self, mint_address: str) -> List[str]:
+        """Scopes com resultado salvo para o token (sem contar hit/miss no cache)"""
+        return list(self.cache.peek(mint_address) or {})
+
+    def contains(self, mint_address: str) -> bool:
+        """Há resultado salvo em algum scope (sem contar hit/miss no cache)"""
+        return bool(self.scopes(mint_address))
+
+    def invalidate(self, mint_address: str, scope: Optional[str] = None):
+        """Descarta o resultado salvo do token (só o scope informado, ou todos)"""
+        if scope is None:
+            self.cache.delete(mint_address)
+            return
+        scopes = dict(self.cache.peek(mint_address) or {})
+        if scopes.pop(scope, None) is None:
+            return
+        if scopes:
+            self.cache.set(mint_address, scopes)
+        else:
+            self.cache.delete(mint_address)
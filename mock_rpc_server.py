@@ -0,0 +1,423 @@
+"""
+Servidor JSON-RPC local que imita um RPC Solana, para testes e benchmarks sem gastar créditos
+
+Responde getTokenLargestAccounts, getProgramAccounts (contas SPL Token, filtros
+memcmp/dataSize e dataSlice), getSignaturesForAddress, getTransaction, getBalance,
+getMultipleAccounts, getAccountInfo, getTokenSupply e getHealth (inclusive em arrays
+batch) a partir de:
+- fixtures gravadas (--fixtures arquivo.jsonl[.gz], linhas {"method", "params", "result"})
+- dados sintéticos determinísticos: tokens "small", "medium" e "huge" (GET /mints)
+
+Falhas configuráveis: latência + jitter, 429 aleatório e 429 acima de N requisições simultâneas.
+GET /stats mostra as chamadas recebidas; POST /reset zera os contadores.
+
+Uso: python mock_rpc_server.py --port 8899 --latency 0.05 --jitter 0.02 --rate-429 0.01
+"""
+import argparse
+import asyncio
+import base64
+import gzip
+import hashlib
+import json
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+import base58
+from aiohttp import web
+
+try:
+    from solders.hash import Hash
+    from solders.instruction import CompiledInstruction
+    from solders.message import MessageHeader, MessageV0
+    from solders.pubkey import Pubkey
+    from solders.signature import Signature
+    from solders.transaction import VersionedTransaction
+except ImportError:
+    VersionedTransaction = None  # Sem solders: só jsonParsed/json
+
+TOKEN_PROGRAM = 'TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA'
+SYSTEM_PROGRAM = '11111111111111111111111111111111'
+
+# Perfil -> (contas de token, signatures por conta)
+PROFILES = {
+    'small': (3, 50),
+    'medium': (10, 300),
+    'huge': (20, 1000),
+}
+
+def pubkey(label: str) -> str:
+    """Endereço base58 determinístico (32 bytes) a partir de um rótulo"""
+    return base58.b58encode(hashlib.sha256(label.encode()).digest()).decode()
+
+def signature(label: str) -> str:
+    """Signature base58 determinística (64 bytes)"""
+    return base58.b58encode(hashlib.sha512(label.encode()).digest()).decode()
+
+def canonical(method: str, params) -> Tuple[str, str]:
+    return method, json.dumps(params, sort_keys=True, separators=(',', ':'))
+
+class RpcError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+class SyntheticChain:
+    """Tokens sintéticos: contas, signatures (mais novas primeiro), transações e saldos"""
+    def __init__(self, seed: int = 1):
+        self.seed = seed
+        self.mints: Dict[str, Dict] = {}  # endereço do mint -> info
+        self.signatures: Dict[str, List[Dict]] = {}  # conta -> signatures (mais novas primeiro)
+        self.transactions: Dict[str, Dict] = {}
+        self.token_accounts: Dict[str, Dict[str, Tuple[str, int]]] = {}  # mint -> conta de token -> (owner, amount)
+        self.slot = 250_000_000
+        for profile in PROFILES:
+            self._generate(profile)
+
+    def mint_address(self, profile: str) -> str:
+        return pubkey(f"{self.seed}:mint:{profile}")
+
+    def _generate(self, profile: str):
+        accounts_count, per_account = PROFILES[profile]
+        rng = random.Random(f"{self.seed}:{profile}")
+        mint = self.mint_address(profile)
+        # Parte dos compradores repete entre transações (como em um token real)
+        wallets = [pubkey(f"{self.seed}:{profile}:wallet:{i}") for i in range(max(1, accounts_count * per_account * 3 // 5))]
+        accounts = []
+        for a in range(accounts_count):
+            address = pubkey(f"{self.seed}:{profile}:account:{a}")
+            amount = 10 ** 12 // (a + 1)
+            accounts.append({'address': address, 'amount': str(amount), 'decimals': 6,
+                             'uiAmount': amount / 10 ** 6, 'uiAmountString': str(amount / 10 ** 6)})
+            self.token_accounts.setdefault(mint, {})[address] = (pubkey(f"{self.seed}:{profile}:owner:{a}"), amount)
+            self.signatures[address] = []
+            for j in range(per_account):
+                self.add_transaction(mint, address, rng.choice(wallets), f"{profile}:{a}:{j}")
+        self.mints[mint] = {'profile': profile, 'accounts': accounts, 'decimals': 6,
+                            'supply': str(sum(int(acc['amount']) for acc in accounts))}
+
+    def add_transaction(self, mint: str, account: str, buyer: str, label: str) -> str:
+        """Nova transação na conta (vira a signature mais nova)"""
+        self.slot += 1
+        block_time = 1_700_000_000 + (self.slot - 250_000_000) * 2
+        sig = signature(f"{self.seed}:tx:{label}")
+        buyer_token_account = pubkey(f"ata:{buyer}:{mint}")
+        # Saldo atual da conta do comprador (~15% já venderam tudo: conta zerada)
+        digest = hashlib.sha256(sig.encode()).digest()
+        self.token_accounts.setdefault(mint, {})[buyer_token_account] = (
+            buyer, 0 if digest[0] < 38 else int.from_bytes(digest[1:5], 'big') % 10 ** 9 + 1)
+        self.transactions[sig] = {
+            'slot': self.slot,
+            'blockTime': block_time,
+            'version': 0,
+            'meta': {
+                'err': None,
+                'fee': 5000,
+                'preTokenBalances': [],
+                'postTokenBalances': [{'accountIndex': 1, 'mint': mint, 'owner': buyer,
+                                       'uiTokenAmount': {'amount': '1000000', 'decimals': 6}}],
+                'loadedAddresses': {'readonly': [], 'writable': []},
+                'logMessages': ['Program log: Instruction: Transfer'] * 3,
+            },
+            'transaction': {
+                'signatures': [sig],
+                'message': {
+                    'accountKeys': [
+                        {'pubkey': buyer, 'signer': True, 'writable': True, 'source': 'transaction'},
+                        {'pubkey': buyer_token_account, 'signer': False, 'writable': True, 'source': 'transaction'},
+                        {'pubkey': account, 'signer': False, 'writable': True, 'source': 'transaction'},
+                        {'pubkey': mint, 'signer': False, 'writable': False, 'source': 'transaction'},
+                        {'pubkey': TOKEN_PROGRAM, 'signer': False, 'writable': False, 'source': 'transaction'},
+                    ],
+                    'instructions': [{'programId': TOKEN_PROGRAM, 'parsed': {'type': 'transfer'}}],
+                    'recentBlockhash': pubkey(f"blockhash:{self.slot}"),
+                },
+            },
+        }
+        entry = {'signature': sig, 'slot': self.slot, 'blockTime': block_time,
+                 'err': None, 'memo': None, 'confirmationStatus': 'finalized'}
+        # A transação aparece no histórico da conta e no do mint (está nas accountKeys)
+        self.signatures.setdefault(account, []).insert(0, entry)
+        self.signatures.setdefault(mint, []).insert(0, dict(entry))
+        return sig
+
+    def grow(self, mint: str, count: int) -> int:
+        """Adiciona transações novas ao token (para testar atualização incremental)"""
+        info = self.mints[mint]
+        rng = random.Random()
+        for n in range(count):
+            account = rng.choice(info['accounts'])['address']
+            buyer = pubkey(f"{self.seed}:grow:{time.time_ns()}:{n}")
+            self.add_transaction(mint, account, buyer, f"grow:{time.time_ns()}:{n}")
+        return count
+
+    @staticmethod
+    def lamports(address: str) -> Optional[int]:
+        """Saldo determinístico; ~10% das contas não existem (null)"""
+        digest = hashlib.sha256(f"balance:{address}".encode()).digest()
+        if digest[0] < 26:
+            return None
+        return int.from_bytes(digest[1:5], 'big') % (50 * 10 ** 9)
+
+    def call(self, method: str, params: list):
+        context = {'slot': self.slot, 'apiVersion': '1.18.0'}
+        if method == 'getHealth':
+            return 'ok'
+        if method == 'getTokenLargestAccounts':
+            info = self.mints.get(params[0])
+            if info is None:
+                raise RpcError(-32602, 'Invalid param: not a Token mint')
+            return {'context': context, 'value': info['accounts']}
+        if method == 'getTokenSupply':
+            info = self.mints.get(params[0])
+            if info is None:
+                raise RpcError(-32602, 'Invalid param: not a Token mint')
+            supply = int(info['supply'])
+            return {'context': context, 'value': {'amount': info['supply'], 'decimals': info['decimals'],
+                                                  'uiAmount': supply / 10 ** 6, 'uiAmountString': str(supply / 10 ** 6)}}
+        if method == 'getSignaturesForAddress':
+            return self._signatures(params[0], params[1] if len(params) > 1 else {})
+        if method == 'getTransaction':
+            encoding = (params[1] if len(params) > 1 else {}).get('encoding', 'json')
+            return self._transaction(params[0], encoding)
+        if method == 'getBalance':
+            return {'context': context, 'value': self.lamports(params[0]) or 0}
+        if method == 'getAccountInfo':
+            return {'context': context, 'value': self._account(params[0])}
+        if method == 'getMultipleAccounts':
+            return {'context': context, 'value': [self._account(address) for address in params[0]]}
+        if method == 'getProgramAccounts':
+            return self._program_accounts(params[0], params[1] if len(params) > 1 else {})
+        raise RpcError(-32601, 'Method not found')
+
+    def _signatures(self, address: str, options: Dict) -> List[Dict]:
+        signatures = self.signatures.get(address, [])
+        start = 0
+        if options.get('before'):
+            index = next((i for i, s in enumerate(signatures) if s['signature'] == options['before']), None)
+            start = len(signatures) if index is None else index + 1
+        end = len(signatures)
+        if options.get('until'):
+            index = next((i for i, s in enumerate(signatures) if s['signature'] == options['until']), None)
+            if index is not None:
+                end = index
+        limit = min(int(options.get('limit', 1000)), 1000)
+        return signatures[start:min(end, start + limit)]
+
+    def _transaction(self, sig: str, encoding: str) -> Optional[Dict]:
+        """getTransaction no encoding pedido (jsonParsed, json ou base64)"""
+        tx = self.transactions.get(sig)
+        if tx is None or encoding == 'jsonParsed':
+            return tx
+        keys = [key['pubkey'] for key in tx['transaction']['message']['accountKeys']]
+        if encoding == 'json':
+            message = {'accountKeys': keys, 'header': {'numRequiredSignatures': 1, 'numReadonlySignedAccounts': 0,
+                                                       'numReadonlyUnsignedAccounts': 2},
+                       'instructions': [{'programIdIndex': 4, 'accounts': [1, 2, 0], 'data': '3Bxs4h24hBtQy9rw'}],
+                       'recentBlockhash': tx['transaction']['message']['recentBlockhash']}
+            return {**tx, 'transaction': {'signatures': [sig], 'message': message}}
+        if encoding == 'base64':
+            if VersionedTransaction is None:
+                raise RpcError(-32602, 'Invalid params: base64 encoding requires solders no mock')
+            message = MessageV0(MessageHeader(1, 0, 2), [Pubkey.from_string(key) for key in keys],
+                                Hash.from_string(tx['transaction']['message']['recentBlockhash']),
+                                [CompiledInstruction(4, bytes([3]) + (1_000_000).to_bytes(8, 'little'), bytes([1, 2, 0]))], [])
+            raw = bytes(VersionedTransaction.populate(message, [Signature.from_string(sig)]))
+            return {**tx, 'transaction': [base64.b64encode(raw).decode(), 'base64']}
+        raise RpcError(-32602, f'Invalid params: unsupported encoding {encoding}')
+
+    def _program_accounts(self, program: str, options: Dict) -> List[Dict]:
+        """getProgramAccounts do Token Program: contas de 165 bytes em base64, com filtros e dataSlice"""
+        if options.get('encoding', 'base64') != 'base64':
+            raise RpcError(-32602, 'Invalid params: mock supports only base64 for getProgramAccounts')
+        if program != TOKEN_PROGRAM:
+            return []
+        filters = options.get('filters', [])
+        data_slice = options.get('dataSlice')
+        result = []
+        for mint, accounts in self.token_accounts.items():
+            for address, (owner, amount) in accounts.items():
+                # mint, owner, amount, delegate (None), state = 1 (inicializada), resto zerado
+                data = (base58.b58decode(mint) + base58.b58decode(owner) + amount.to_bytes(8, 'little') +
+                        bytes(36) + b'\x01').ljust(165, b'\x00')
+                if not all(self._matches(data, f) for f in filters):
+                    continue
+                if data_slice:
+                    data = data[data_slice['offset']:data_slice['offset'] + data_slice['length']]
+                result.append({'pubkey': address, 'account': {
+                    'lamports': 2_039_280, 'owner': TOKEN_PROGRAM, 'executable': False, 'rentEpoch': 0,
+                    'space': 165, 'data': [base64.b64encode(data).decode(), 'base64']}})
+        return result
+
+    @staticmethod
+    def _matches(data: bytes, condition: Dict) -> bool:
+        if 'dataSize' in condition:
+            return len(data) == condition['dataSize']
+        if 'memcmp' in condition:
+            offset = condition['memcmp']['offset']
+            expected = base58.b58decode(condition['memcmp']['bytes'])
+            return data[offset:offset + len(expected)] == expected
+        raise RpcError(-32602, 'Invalid params: unsupported filter')
+
+    def _account(self, address: str) -> Optional[Dict]:
+        info = self.mints.get(address)
+        if info is not None:
+            return {
+                'lamports': 1_461_600, 'owner': TOKEN_PROGRAM, 'executable': False, 'rentEpoch': 0, 'space': 82,
+                'data': {'program': 'spl-token', 'space': 82, 'parsed': {'type': 'mint', 'info': {
+                    'decimals': info['decimals'], 'supply': info['supply'], 'isInitialized': True,
+                    'mintAuthority': None, 'freezeAuthority': None}}}
+            }
+        lamports = self.lamports(address)
+        if lamports is None:
+            return None
+        return {'lamports': lamports, 'owner': SYSTEM_PROGRAM, 'executable': False, 'rentEpoch': 0,
+                'space': 0, 'data': ['', 'base64']}
+
+class MockRpcServer:
+    """Servidor aiohttp com fixtures, dados sintéticos e injeção de latência/429"""
+    def __init__(self, chain: SyntheticChain, fixtures: Optional[Dict] = None, latency: float = 0.0,
+                 jitter: float = 0.0, rate_429: float = 0.0, max_concurrency: int = 0, retry_after: float = 1.0,
+                 compression: bool = True):
+        self.chain = chain
+        self.fixtures = fixtures or {}
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.max_concurrency = max_concurrency
+        self.retry_after = retry_after
+        self.compression = compression
+        self.in_flight = 0
+        self.reset()
+
+    def reset(self):
+        self.calls: Dict[str, int] = {}
+        self.http_requests = 0
+        self.throttled = 0
+        self.bytes_sent = 0
+        self.peak_in_flight = 0
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post('/', self.handle_rpc)
+        app.router.add_get('/stats', self.handle_stats)
+        app.router.add_post('/reset', self.handle_reset)
+        app.router.add_get('/mints', self.handle_mints)
+        app.router.add_post('/grow', self.handle_grow)
+        return app
+
+    def _answer(self, request: Dict) -> Dict:
+        method = request.get('method', '')
+        params = request.get('params', [])
+        self.calls[method] = self.calls.get(method, 0) + 1
+        response = {'jsonrpc': '2.0', 'id': request.get('id')}
+        key = canonical(method, params)
+        if key in self.fixtures:
+            response['result'] = self.fixtures[key]
+            return response
+        try:
+            response['result'] = self.chain.call(method, params)
+        except RpcError as e:
+            response['error'] = {'code': e.code, 'message': e.message}
+        return response
+
+    async def handle_rpc(self, request: web.Request) -> web.Response:
+        self.http_requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            if (self.max_concurrency and self.in_flight > self.max_concurrency) or random.random() < self.rate_429:
+                self.throttled += 1
+                return web.json_response({'jsonrpc': '2.0', 'error': {'code': 429, 'message': 'Too many requests'}},
+                                         status=429, headers={'Retry-After': f"{self.retry_after:g}"})
+
+            delay = self.latency + random.uniform(-self.jitter, self.jitter) if self.jitter else self.latency
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            payload = await request.json()
+            if isinstance(payload, list):
+                body = [self._answer(item) for item in payload]
+            else:
+                body = self._answer(payload)
+            text = json.dumps(body)
+            self.bytes_sent += len(text)
+            response = web.Response(text=text, content_type='application/json')
+            if self.compression:
+                response.enable_compression()  # gzip/deflate conforme o Accept-Encoding do cliente
+            return response
+        finally:
+            self.in_flight -= 1
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            'calls': self.calls,
+            'total_calls': sum(self.calls.values()),
+            'http_requests': self.http_requests,
+            'throttled': self.throttled,
+            'bytes_sent': self.bytes_sent,
+            'peak_in_flight': self.peak_in_flight
+        })
+
+    async def handle_reset(self, request: web.Request) -> web.Response:
+        self.reset()
+        return web.json_response({'ok': True})
+
+    async def handle_mints(self, request: web.Request) -> web.Response:
+        return web.json_response({profile: self.chain.mint_address(profile) for profile in PROFILES})
+
+    async def handle_grow(self, request: web.Request) -> web.Response:
+        mint = request.query.get('mint') or self.chain.mint_address(request.query.get('profile', 'small'))
+        count = self.chain.grow(mint, int(request.query.get('count', '5')))
+        return web.json_response({'mint': mint, 'added': count})
+
+def load_fixtures(path: str) -> Dict:
+    """
+    Fixtures gravadas: JSONL (opcionalmente .gz), uma chamada {"method", "params", "result"} por linha
+    Aceita também as gravações do transport.py (TRANSPORT_MODE=record)
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    fixtures = {}
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if entry.get('service', 'rpc') != 'rpc':
+                continue  # Gravações do transport.py também têm Solscan/Jupiter
+            if entry.get('method') == 'batch' and isinstance(entry.get('response'), list):
+                by_id = {item.get('id'): item for item in entry['response'] if isinstance(item, dict)}
+                for i, (method, params) in enumerate(entry['params']):
+                    if 'result' in by_id.get(i, {}):
+                        fixtures[canonical(method, params)] = by_id[i]['result']
+            elif 'result' in entry:
+                fixtures[canonical(entry['method'], entry.get('params', []))] = entry['result']
+    print(f"📼 {len(fixtures)} respostas carregadas de {path}")
+    return fixtures
+
+def main():
+    parser = argparse.ArgumentParser(description='RPC Solana local para testes e benchmarks')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8899)
+    parser.add_argument('--seed', type=int, default=1, help='Semente dos dados sintéticos')
+    parser.add_argument('--fixtures', help='Arquivo .jsonl/.jsonl.gz com respostas gravadas')
+    parser.add_argument('--latency', type=float, default=0.0, help='Latência base por requisição (segundos)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Variação aleatória da latência (± segundos)')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='Probabilidade de responder 429')
+    parser.add_argument('--max-concurrency', type=int, default=0, help='Responde 429 acima de N requisições simultâneas')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Valor do cabeçalho Retry-After nos 429')
+    parser.add_argument('--no-compression', action='store_true', help='Nunca comprime as respostas')
+    args = parser.parse_args()
+
+    chain = SyntheticChain(seed=args.seed)
+    fixtures = load_fixtures(args.fixtures) if args.fixtures else {}
+    server = MockRpcServer(chain, fixtures, latency=args.latency, jitter=args.jitter, rate_429=args.rate_429,
+                           max_concurrency=args.max_concurrency, retry_after=args.retry_after,
+                           compression=not args.no_compression)
+    for profile in PROFILES:
+        print(f"🪙 {profile}: {chain.mint_address(profile)}")
+    web.run_app(server.app(), host=args.host, port=args.port, access_log=None, print=lambda *_: None)
+
+if __name__ == '__main__':
+    main()
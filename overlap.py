@@ -0,0 +1,91 @@
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np  # Opcional: contagem vetorizada para muitos tokens
+except ImportError:
+    np = None
+
+class WalletOverlapEngine:
+    """
+    Calcula sobreposição de compradores entre vários tokens
+    Cada wallet vira um ID inteiro (interning) e cada token guarda um
+    conjunto de IDs; assim a interseção compara inteiros em vez de strings
+    e a contagem "comprou pelo menos k de N" é um único passe linear.
+    """
+    def __init__(self):
+        self.wallet_ids: Dict[str, int] = {}
+        self.wallets: List[str] = []  # ID -> wallet (ordem da primeira aparição)
+        self.token_sets: Dict[str, frozenset] = {}
+        self.token_arrays: Dict[str, array] = {}
+
+    def intern(self, wallet: str) -> int:
+        """ID inteiro da wallet (cria se ainda não existir)"""
+        wallet_id = self.wallet_ids.get(wallet)
+        if wallet_id is None:
+            wallet_id = len(self.wallets)
+            self.wallet_ids[wallet] = wallet_id
+            self.wallets.append(wallet)
+        return wallet_id
+
+    def add_token(self, token: str, buyers: Iterable[str]):
+        """Registra os compradores de um token (duplicatas são ignoradas)"""
+        ids = frozenset(self.intern(wallet) for wallet in buyers if wallet)
+        self.token_sets[token] = ids
+        self.token_arrays[token] = array('I', sorted(ids))
+
+    def intersect_all(self, tokens: Optional[List[str]] = None) -> List[str]:
+        """
+        Wallets presentes em TODOS os tokens
+        Começa pelo menor conjunto e para assim que a interseção fica vazia
+        """
+        tokens = tokens or list(self.token_sets)
+        if not tokens:
+            return []
+
+        ordered = sorted(tokens, key=lambda t: len(self.token_sets[t]))
+        common = set(self.token_sets[ordered[0]])
+        for token in ordered[1:]:
+            if not common:
+                break
+            common &= self.token_sets[token]
+
+        return [self.wallets[wallet_id] for wallet_id in sorted(common)]
+
+    def counts(self, tokens: Optional[List[str]] = None):
+        """Quantos dos tokens cada wallet comprou (indexado pelo ID)"""
+        tokens = tokens or list(self.token_sets)
+        total_wallets = len(self.wallets)
+
+        if np is not None:
+            arrays = [np.frombuffer(self.token_arrays[t], dtype=np.uint32) for t in tokens if self.token_arrays[t]]
+            if not arrays:
+                return np.zeros(total_wallets, dtype=np.int64)
+            return np.bincount(np.concatenate(arrays), minlength=total_wallets)
+
+        counts = array('H', bytes(2 * total_wallets))
+        for token in tokens:
+            for wallet_id in self.token_arrays[token]:
+                counts[wallet_id] += 1
+        return counts
+
+    def at_least(self, k: int, tokens: Optional[List[str]] = None) -> List[Tuple[str, int]]:
+        """
+        Wallets que compraram pelo menos k dos tokens, com a quantidade de cada uma
+        Ordenadas por quantidade (maior primeiro) e depois pela ordem de aparição
+        """
+        tokens = tokens or list(self.token_sets)
+        if k >= len(tokens):
+            # Caso "todos": interseção com saída antecipada é mais barata que contar
+            return [(wallet, len(tokens)) for wallet in self.intersect_all(tokens)]
+
+        counts = self.counts(tokens)
+        if np is not None:
+            hits = np.nonzero(counts >= k)[0]
+            # lexsort: última chave é a principal (quantidade decrescente), desempate pelo ID
+            order = hits[np.lexsort((hits, -counts[hits]))]
+            return [(self.wallets[int(wallet_id)], int(counts[wallet_id])) for wallet_id in order]
+
+        hits = [wallet_id for wallet_id, count in enumerate(counts) if count >= k]
+        hits.sort(key=lambda wallet_id: (-counts[wallet_id], wallet_id))
+        return [(self.wallets[wallet_id], counts[wallet_id]) for wallet_id in hits]
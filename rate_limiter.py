@@ -0,0 +1,136 @@
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from config import (
+    RPC_MAX_CONCURRENCY, RPC_MIN_CONCURRENCY, RPC_INITIAL_CONCURRENCY,
+    AIMD_INCREASE, AIMD_DECREASE, AIMD_DECREASE_COOLDOWN, RPC_MAX_SHARED_PAUSE,
+    RPC_BACKOFF_BASE, RPC_BACKOFF_MAX
+)
+
+# Peso de cada método no orçamento de requisições em voo (padrão 1)
+# Métodos que leem muitos dados custam mais para o provedor
+METHOD_WEIGHTS: Dict[str, float] = {
+    'getTransaction': 3,
+    'getSignaturesForAddress': 3,
+    'getProgramAccounts': 10,
+    'getTokenLargestAccounts': 2,
+    'getMultipleAccounts': 2,
+}
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Cabeçalho Retry-After em segundos (aceita número ou data HTTP)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class AdaptiveLimiter:
+    """
+    Controla quantas requisições RPC (ponderadas por método) ficam em voo
+    AIMD: cada resposta bem-sucedida aumenta o limite aos poucos (~+1 por
+    janela completa); um 429 ou timeout corta o limite pela metade (no máximo
+    uma vez por AIMD_DECREASE_COOLDOWN, para uma rajada de 429 não zerar tudo).
+    Retry-After: a requisição recusada espera o tempo pedido (backoff); as outras
+    só pausam quando o AIMD já está no piso, e apenas as da mesma classe de peso
+    (ou batches), por no máximo RPC_MAX_SHARED_PAUSE. Assim um provedor ruidoso
+    não serializa o bot inteiro.
+    """
+    def __init__(self, initial: float = RPC_INITIAL_CONCURRENCY, min_limit: float = RPC_MIN_CONCURRENCY,
+                 max_limit: float = RPC_MAX_CONCURRENCY):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = min(max(initial, min_limit), max_limit)
+        self.in_flight = 0.0
+        self.paused_until: Dict[str, float] = {}  # Classe de peso -> fim da pausa (Retry-After)
+        self._last_decrease = 0.0
+        self._condition: Optional[asyncio.Condition] = None
+        self.stats = {'throttled': 0, 'decreases': 0, 'waits': 0}
+
+    @staticmethod
+    def weight(method: str) -> float:
+        return METHOD_WEIGHTS.get(method, 1)
+
+    @classmethod
+    def pause_class(cls, method: str = '') -> str:
+        """Métodos de mesmo peso dividem a pausa; batches (sem método) têm a sua"""
+        return f"w{cls.weight(method):g}" if method else 'batch'
+
+    @asynccontextmanager
+    async def slot(self, method: str = '', weight: Optional[float] = None):
+        """Reserva espaço para uma requisição enquanto ela estiver em voo"""
+        weight = self.weight(method) if weight is None else weight
+        await self._acquire(weight, self.pause_class(method))
+        try:
+            yield
+        finally:
+            await self._release(weight)
+
+    async def _acquire(self, weight: float, pause_class: str):
+        if self._condition is None:
+            self._condition = asyncio.Condition()  # Criada dentro do event loop
+        waited = False
+        while True:
+            # Pausa pedida pelo provedor: espera fora da condição (wait_for em Condition.wait
+            # pode perder o lock ao estourar o tempo)
+            pause = self.paused_until.get(pause_class, 0.0) - time.monotonic()
+            if pause > 0:
+                waited = True
+                await asyncio.sleep(pause)
+                continue
+            async with self._condition:
+                if self.paused_until.get(pause_class, 0.0) > time.monotonic():
+                    continue
+                if self.in_flight == 0 or self.in_flight + weight <= self.limit:
+                    self.in_flight += weight
+                    break
+                waited = True
+                await self._condition.wait()
+        if waited:
+            self.stats['waits'] += 1
+
+    async def _release(self, weight: float):
+        async with self._condition:
+            self.in_flight -= weight
+            self._condition.notify_all()
+
+    def on_success(self, method: str = '', weight: Optional[float] = None):
+        """Aumento aditivo: cresce ~AIMD_INCREASE a cada 'limite' de respostas"""
+        weight = self.weight(method) if weight is None else weight
+        self.limit = min(self.max_limit, self.limit + AIMD_INCREASE * weight / max(self.limit, 1))
+
+    def on_throttle(self, retry_after: Optional[float] = None, method: str = ''):
+        """Redução multiplicativa e pausa pedida pelo provedor (Retry-After), só na classe do método"""
+        now = time.monotonic()
+        self.stats['throttled'] += 1
+        if now - self._last_decrease >= AIMD_DECREASE_COOLDOWN:
+            self.limit = max(self.min_limit, self.limit * AIMD_DECREASE)
+            self._last_decrease = now
+            self.stats['decreases'] += 1
+            print(f"🐢 Limite de requisições RPC reduzido para {self.limit:.1f}")
+        if retry_after and self.limit <= self.min_limit and RPC_MAX_SHARED_PAUSE > 0:
+            retry_after = min(retry_after, RPC_MAX_SHARED_PAUSE)
+            pause_class = self.pause_class(method)
+            self.paused_until[pause_class] = max(self.paused_until.get(pause_class, 0.0), now + retry_after)
+
+    @staticmethod
+    def backoff(attempt: int, retry_after: Optional[float] = None) -> float:
+        """Espera antes de tentar de novo: exponencial com jitter total (respeita Retry-After)"""
+        delay = random.uniform(0, min(RPC_BACKOFF_MAX, RPC_BACKOFF_BASE * (2 ** attempt)))
+        return max(delay, retry_after or 0.0)
+
+    def snapshot(self) -> Dict:
+        return {
+            'limit': round(self.limit, 2),
+            'in_flight': self.in_flight,
+            'paused_for': max([0.0] + [round(until - time.monotonic(), 2) for until in self.paused_until.values()]),
+            **self.stats
+        }
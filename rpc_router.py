@@ -0,0 +1,141 @@
+import random
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from config import (
+    ROUTER_EWMA_ALPHA, ROUTER_FAILURE_THRESHOLD, ROUTER_OPEN_SECONDS, ROUTER_MAX_OPEN_SECONDS
+)
+from rate_limiter import AdaptiveLimiter
+
+# Estados do circuit breaker
+CLOSED = 'closed'        # Em rotação
+OPEN = 'open'            # Fora de rotação até o tempo de espera acabar
+HALF_OPEN = 'half_open'  # Uma requisição de teste decide se volta
+
+class EndpointHealth:
+    """Saúde de um endpoint RPC: latência e taxa de erro móveis (EWMA) e estado do breaker"""
+    def __init__(self, url: str):
+        self.url = url
+        self.limiter = AdaptiveLimiter()  # Cada provedor tem seu próprio limite (429 é por provedor)
+        self.latency = 0.0  # Segundos por unidade de peso (EWMA)
+        self.error_rate = 0.0  # 0..1 (EWMA)
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.open_seconds = ROUTER_OPEN_SECONDS
+        self.opened_at = 0.0
+        self.probing = False
+        self.requests = 0
+        self.failures = 0
+
+    def score(self) -> float:
+        """Vazão estimada: sucesso / latência, reduzida pela ocupação atual do limite"""
+        latency = self.latency or 0.05  # Sem medição ainda: trata como rápido para ser testado
+        headroom = max(0.05, 1 - self.limiter.in_flight / max(self.limiter.limit, 1))
+        return (1 - self.error_rate) * headroom / latency
+
+class RpcRouter:
+    """
+    Distribui as requisições entre todos os endpoints saudáveis, na proporção
+    da vazão medida de cada um (sorteio ponderado pelo score)
+    Após ROUTER_FAILURE_THRESHOLD falhas seguidas o endpoint sai de rotação
+    (breaker aberto); passado o tempo de espera, uma requisição de teste
+    decide se volta (sucesso) ou fica fora pelo dobro do tempo (falha).
+    """
+    def __init__(self, urls: List[str]):
+        self.endpoints: Dict[str, EndpointHealth] = {url: EndpointHealth(url) for url in urls}
+
+    def __len__(self) -> int:
+        return len(self.endpoints)
+
+    def get(self, url: str) -> EndpointHealth:
+        return self.endpoints[url]
+
+    def pick(self, exclude: Optional[Set[str]] = None) -> Tuple[EndpointHealth, bool]:
+        """
+        Escolhe o endpoint da próxima requisição (evitando os já tentados)
+        Retorna (endpoint, probe): probe=True quando esta requisição é o teste do breaker
+        e deve liberá-lo com release_probe ao terminar
+        """
+        exclude = exclude or set()
+        now = time.monotonic()
+        candidates = []
+        for endpoint in self.endpoints.values():
+            if endpoint.url in exclude:
+                continue
+            if endpoint.state == OPEN and now - endpoint.opened_at >= endpoint.open_seconds:
+                endpoint.state = HALF_OPEN
+                print(f"🩺 Testando RPC novamente: {endpoint.url[:40]}...")
+            if endpoint.state == CLOSED or (endpoint.state == HALF_OPEN and not endpoint.probing):
+                candidates.append(endpoint)
+
+        if not candidates:
+            # Todos fora de rotação: usa o que está fechado há mais tempo (melhor que falhar direto)
+            remaining = [e for e in self.endpoints.values() if e.url not in exclude] or list(self.endpoints.values())
+            return min(remaining, key=lambda e: e.opened_at), False
+
+        # Endpoint em teste recebe uma única requisição por vez
+        probes = [e for e in candidates if e.state == HALF_OPEN]
+        if probes:
+            probes[0].probing = True
+            return probes[0], True
+
+        if len(candidates) == 1:
+            return candidates[0], False
+        return random.choices(candidates, weights=[e.score() for e in candidates])[0], False
+
+    def release_probe(self, endpoint: EndpointHealth):
+        """Libera o teste do breaker (só quem recebeu probe=True no pick)"""
+        endpoint.probing = False
+
+    def record_success(self, endpoint: EndpointHealth, elapsed: float, weight: float = 1):
+        endpoint.requests += 1
+        per_unit = elapsed / max(weight, 1)
+        endpoint.latency = per_unit if not endpoint.latency else \
+            ROUTER_EWMA_ALPHA * per_unit + (1 - ROUTER_EWMA_ALPHA) * endpoint.latency
+        endpoint.error_rate *= (1 - ROUTER_EWMA_ALPHA)
+        endpoint.consecutive_failures = 0
+        if endpoint.state != CLOSED:
+            print(f"✅ RPC de volta à rotação: {endpoint.url[:40]}...")
+        endpoint.state = CLOSED
+        endpoint.probing = False
+        endpoint.open_seconds = ROUTER_OPEN_SECONDS
+
+    def record_failure(self, endpoint: EndpointHealth, trip: bool = True):
+        """
+        Registra uma falha (erro HTTP, timeout, 429...)
+        trip=False só piora o score, sem contar para abrir o breaker
+        """
+        endpoint.requests += 1
+        endpoint.failures += 1
+        endpoint.error_rate = ROUTER_EWMA_ALPHA + (1 - ROUTER_EWMA_ALPHA) * endpoint.error_rate
+        if not trip:
+            if endpoint.state == HALF_OPEN:
+                endpoint.probing = False
+            return
+
+        endpoint.consecutive_failures += 1
+        if endpoint.state == HALF_OPEN:
+            # Teste falhou: fica fora pelo dobro do tempo
+            endpoint.open_seconds = min(endpoint.open_seconds * 2, ROUTER_MAX_OPEN_SECONDS)
+            self._open(endpoint)
+        elif endpoint.state == CLOSED and endpoint.consecutive_failures >= ROUTER_FAILURE_THRESHOLD:
+            self._open(endpoint)
+
+    def _open(self, endpoint: EndpointHealth):
+        endpoint.state = OPEN
+        endpoint.opened_at = time.monotonic()
+        endpoint.probing = False
+        print(f"🚫 RPC fora de rotação por {endpoint.open_seconds:.0f}s: {endpoint.url[:40]}...")
+
+    def snapshot(self) -> List[Dict]:
+        return [
+            {
+                'url': e.url,
+                'state': e.state,
+                'latency_ms': round(e.latency * 1000, 1),
+                'error_rate': round(e.error_rate, 3),
+                'requests': e.requests,
+                'failures': e.failures,
+                'limit': e.limiter.snapshot()
+            }
+            for e in self.endpoints.values()
+        ]
@@ -0,0 +1,155 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, Hashable, Optional
+from config import SCHED_GLOBAL_CONCURRENCY, SCHED_PER_USER_CONCURRENCY
+
+# Callback chamado quando a posição na fila muda: (posição, espera_estimada_segundos)
+QueueCallback = Callable[[int, float], Awaitable[None]]
+
+class Ticket:
+    """Vaga de execução de um job (entregue a quem chamou acquire)"""
+    def __init__(self, user_id: Hashable, fast: bool, on_queued: Optional[QueueCallback]):
+        self.user_id = user_id
+        self.fast = fast
+        self.on_queued = on_queued
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.position = 0  # Última posição informada (0 = não ficou na fila)
+        self.started = asyncio.Event()
+
+    @property
+    def waited(self) -> float:
+        """Tempo que ficou na fila (segundos)"""
+        return (self.started_at or time.monotonic()) - self.enqueued_at
+
+class JobScheduler:
+    """
+    Fila justa entre os handlers do Telegram e as buscas pesadas
+    No máximo SCHED_GLOBAL_CONCURRENCY buscas ao mesmo tempo e
+    SCHED_PER_USER_CONCURRENCY por usuário; quem espera é atendido em
+    rodízio (round-robin) entre usuários, então um usuário com vários
+    pedidos não passa na frente dos outros. Consultas já em cache vão
+    pela via rápida e nunca esperam atrás de buscas completas.
+    """
+    def __init__(self, global_limit: int = SCHED_GLOBAL_CONCURRENCY, per_user_limit: int = SCHED_PER_USER_CONCURRENCY):
+        self.global_limit = global_limit
+        self.per_user_limit = per_user_limit
+        self.queues: "OrderedDict[Hashable, Deque[Ticket]]" = OrderedDict()  # Ordem = vez no rodízio
+        self.running: Dict[Hashable, int] = {}
+        self.running_total = 0
+        self.avg_duration = 30.0  # Duração média de uma busca (EWMA), para estimar a espera
+        self.stats = {'started': 0, 'queued': 0, 'fast_lane': 0, 'max_wait': 0.0}
+
+    def queue_depth(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+    def _can_start(self, user_id: Hashable) -> bool:
+        return (self.running_total < self.global_limit and
+                self.running.get(user_id, 0) < self.per_user_limit)
+
+    def _start(self, ticket: Ticket):
+        ticket.started_at = time.monotonic()
+        self.running[ticket.user_id] = self.running.get(ticket.user_id, 0) + 1
+        self.running_total += 1
+        self.stats['started'] += 1
+        self.stats['max_wait'] = max(self.stats['max_wait'], ticket.waited)
+        ticket.started.set()
+
+    def _dispatch(self):
+        """Libera jobs da fila em rodízio enquanto houver vagas"""
+        progress = True
+        while progress and self.running_total < self.global_limit:
+            progress = False
+            for user_id in list(self.queues):
+                queue = self.queues[user_id]
+                if not self._can_start(user_id):
+                    continue
+                self._start(queue.popleft())
+                # Usuário atendido vai para o fim do rodízio
+                del self.queues[user_id]
+                if queue:
+                    self.queues[user_id] = queue
+                progress = True
+                break
+        self._notify_positions()
+
+    def _positions(self) -> Dict[Ticket, int]:
+        """Posição de cada job na ordem em que o rodízio os atenderia"""
+        positions = {}
+        queues = [list(queue) for queue in self.queues.values()]
+        position = 0
+        for depth in range(max((len(q) for q in queues), default=0)):
+            for queue in queues:
+                if depth < len(queue):
+                    position += 1
+                    positions[queue[depth]] = position
+        return positions
+
+    def _notify_positions(self):
+        for ticket, position in self._positions().items():
+            if position != ticket.position:
+                ticket.position = position
+                if ticket.on_queued:
+                    estimate = self.avg_duration * position / max(self.global_limit, 1)
+                    asyncio.ensure_future(self._safe_callback(ticket.on_queued, position, estimate))
+
+    @staticmethod
+    async def _safe_callback(callback: QueueCallback, position: int, estimate: float):
+        try:
+            await callback(position, estimate)
+        except Exception as e:
+            print(f"⚠️ Erro ao atualizar posição na fila: {e}")
+
+    async def acquire(self, user_id: Hashable, fast: bool = False,
+                      on_queued: Optional[QueueCallback] = None) -> Ticket:
+        """Espera a vez do job; fast=True (resultado em cache) executa na hora"""
+        ticket = Ticket(user_id, fast, on_queued)
+        if fast:
+            ticket.started_at = ticket.enqueued_at
+            self.stats['fast_lane'] += 1
+            return ticket
+
+        if not self.queues and self._can_start(user_id):
+            self._start(ticket)
+            return ticket
+
+        self.queues.setdefault(user_id, deque()).append(ticket)
+        self._dispatch()
+        if not ticket.started.is_set():
+            self.stats['queued'] += 1
+        try:
+            await ticket.started.wait()
+        except asyncio.CancelledError:
+            if ticket.started.is_set():
+                self.release(ticket)
+            else:
+                queue = self.queues.get(user_id)
+                if queue and ticket in queue:
+                    queue.remove(ticket)
+                    if not queue:
+                        del self.queues[user_id]
+                self._notify_positions()
+            raise
+        return ticket
+
+    def release(self, ticket: Ticket):
+        """Libera a vaga do job e chama o próximo da fila"""
+        if ticket.fast:
+            return
+        duration = time.monotonic() - (ticket.started_at or time.monotonic())
+        self.avg_duration = 0.2 * duration + 0.8 * self.avg_duration
+        self.running[ticket.user_id] -= 1
+        if not self.running[ticket.user_id]:
+            del self.running[ticket.user_id]
+        self.running_total -= 1
+        self._dispatch()
+
+    def snapshot(self) -> Dict:
+        return {
+            'running': self.running_total,
+            'queued': self.queue_depth(),
+            'users_waiting': len(self.queues),
+            'avg_duration': round(self.avg_duration, 1),
+            **self.stats
+        }
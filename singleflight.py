@@ -0,0 +1,43 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+class SingleFlight:
+    """
+    Junta chamadas idênticas simultâneas em uma só execução
+    O primeiro chamador de uma chave inicia o trabalho; quem chegar enquanto
+    ele estiver em andamento espera o mesmo resultado (ou a mesma exceção).
+    A execução é protegida (shield): se um chamador desistir, os outros
+    continuam recebendo o resultado.
+    """
+    def __init__(self, name: str = 'singleflight'):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.executions = 0
+        self.shared = 0  # Chamadas que aproveitaram uma execução em andamento
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._calls.get(key)
+        if future is not None:
+            self.shared += 1
+            label = key[0] if isinstance(key, tuple) else key
+            print(f"🔗 {self.name}: aguardando busca em andamento para {str(label)[:8]}...")
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(fn())
+        self._calls[key] = future
+        self.executions += 1
+
+        def _done(finished: asyncio.Future):
+            if self._calls.get(key) is finished:
+                del self._calls[key]
+            if not finished.cancelled():
+                finished.exception()  # Marca a exceção como lida mesmo sem nenhum chamador restante
+
+        future.add_done_callback(_done)
+        return await asyncio.shield(future)
+
+    def stats(self) -> Dict:
+        return {'name': self.name, 'in_flight': len(self._calls), 'executions': self.executions, 'shared': self.shared}
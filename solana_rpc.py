@@ -1,20 +1,48 @@
-import aiohttp
 import asyncio
 import json
 import random
 import time
-from typing import List, Dict, Optional, Set
-from config import SOLANA_RPC_URLS, RPC_RETRY_ATTEMPTS, RPC_RETRY_DELAY, RPC_REQUEST_DELAY, RPC_CONFIGS
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, List, Dict, Optional, Set, Tuple
+from config import SOLANA_RPC_URLS, RPC_RETRY_ATTEMPTS, RPC_RETRY_DELAY, RPC_REQUEST_DELAY, RPC_CONFIGS, SIGNATURE_PAGE_SIZE, RPC_THROTTLE_RETRIES, HEDGE_ENABLED, TX_ENCODING, HOLDER_DISCOVERY_MODE
+from transport import transport
+from rate_limiter import AdaptiveLimiter, parse_retry_after
+from rpc_router import RpcRouter
+from hedging import RequestHedger, HEDGEABLE_METHODS
+from metrics import metrics, endpoint_label
+from balance_service import BalanceService
+from buyer_pipeline import BuyerPipeline, StaleCursorError
+from tx_store import tx_store
+from tx_decoder import decode_transaction, decode_available
+from token_metadata import TokenMetadataResolver
+from mint_store import MintResultStore
+from buyer_records import BuyerRecords
 import base64
 import base58
 
+TOKEN_PROGRAM_ID = 'TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA'
+TOKEN_2022_PROGRAM_ID = 'TokenzQdBNbLqP5VEhdkAS6EPFLC1PHnBqCXEpPxuEb'
+# Layout de uma conta SPL Token: mint (0..32), owner (32..64), amount u64 little-endian (64..72), ...
+TOKEN_ACCOUNT_SIZE = 165
+TOKEN_ACCOUNT_OWNER_OFFSET = 32
+
+# Requisições da busca atual: cada extract_buyers_from_mint tem o seu contador, mesmo com buscas em paralelo
+_scan_requests: ContextVar[Optional[List[int]]] = ContextVar('scan_requests', default=None)
+
 class SolanaRPC:
     def __init__(self):
         self.rpc_urls = SOLANA_RPC_URLS
-        self.current_rpc_index = 0
-        self.blacklisted_rpcs = {}  # RPC -> tempo_de_blacklist
-        self.request_count = 0
-        self.token_cache = {}  # Cache para consistência cronológica
+        # Distribui requisições entre os RPCs saudáveis; cada um tem seu limite adaptativo (AIMD)
+        self.router = RpcRouter(self.rpc_urls)
+        self.last_rpc_url = self.rpc_urls[0]
+        self.hedger = RequestHedger()  # Cópia de chamadas lentas (só leitura) para cortar a cauda de latência
+        self.request_count = 0  # Total do processo (o de cada busca fica em _scan_requests)
+        self.mint_results = MintResultStore()  # Último resultado por token (atualização incremental)
+        self.balance_service = BalanceService(self)  # Saldos agrupados em lote
+        self.metadata = TokenMetadataResolver(self)  # Metadados de tokens com cache
+        self.buyer_watchers: Dict[str, List[Callable[[Dict], None]]] = {}  # Progresso por token (watch_buyers)
+        metrics.register_collector(self.collect_metrics)
         
         # Endereços de programas do sistema Solana que devem ser filtrados
         self.SYSTEM_PROGRAMS = {
@@ -30,44 +58,38 @@ class SolanaRPC:
             'BPFLoaderUpgradeab1e11111111111111111111111',  # BPF Upgradeable Loader
         }
         
-    async def get_current_rpc_url(self) -> str:
-        """Retorna a URL RPC atual evitando RPCs blacklisted"""
-        import time
-        
-        # Remove RPCs expirados da blacklist (após 5 minutos)
-        current_time = time.time()
-        expired_rpcs = [rpc for rpc, blacklist_time in self.blacklisted_rpcs.items() 
-                       if current_time - blacklist_time > 300]
-        for rpc in expired_rpcs:
-            del self.blacklisted_rpcs[rpc]
-            print(f"🔓 RPC removido da blacklist: {rpc}")
-        
-        # Procura um RPC não blacklisted
-        attempts = 0
-        while attempts < len(self.rpc_urls):
-            rpc_url = self.rpc_urls[self.current_rpc_index % len(self.rpc_urls)]
-            
-            if rpc_url not in self.blacklisted_rpcs:
-                return rpc_url
-            
-            self.current_rpc_index += 1
-            attempts += 1
-        
-        # Se todos estão blacklisted, usa o primeiro mesmo assim
-        print("⚠️ Todos os RPCs estão blacklisted, usando o primeiro mesmo assim")
-        return self.rpc_urls[0]
-    
-    def rotate_rpc(self):
-        """Roda para próxima URL RPC em caso de erro"""
-        self.current_rpc_index += 1
+    def collect_metrics(self):
+        """Métricas lidas na hora: caches, limites por endpoint e hedge"""
+        caches = [self.balance_service.cache, self.metadata.cache, self.mint_results.cache]
+        for cache in caches:
+            stats = cache.stats()
+            labels = {'cache': stats['name']}
+            yield 'cache_hits_total', 'counter', labels, stats['hits']
+            yield 'cache_misses_total', 'counter', labels, stats['misses']
+            yield 'cache_entries', 'gauge', labels, stats['entries']
+            yield 'cache_hit_ratio', 'gauge', labels, stats['hit_ratio']
+        if tx_store is not None:
+            labels = {'cache': 'tx_store'}
+            yield 'cache_hits_total', 'counter', labels, tx_store.hits
+            yield 'cache_misses_total', 'counter', labels, tx_store.misses
+            yield 'cache_entries', 'gauge', labels, tx_store.entry_count
+            total = tx_store.hits + tx_store.misses
+            yield 'cache_hit_ratio', 'gauge', labels, tx_store.hits / total if total else 0.0
+        for endpoint in self.router.endpoints.values():
+            labels = {'endpoint': endpoint_label(endpoint.url)}
+            yield 'rpc_concurrency_limit', 'gauge', labels, endpoint.limiter.limit
+            yield 'rpc_in_flight', 'gauge', labels, endpoint.limiter.in_flight
+            yield 'rpc_throttled_total', 'counter', labels, endpoint.limiter.stats['throttled']
+            yield 'rpc_endpoint_error_rate', 'gauge', labels, endpoint.error_rate
+            yield 'rpc_endpoint_open', 'gauge', labels, 0 if endpoint.state == 'closed' else 1
+        hedge = self.hedger.stats
+        yield 'rpc_hedged_total', 'counter', {}, hedge['hedged']
+        yield 'rpc_hedge_wins_total', 'counter', {}, hedge['hedge_wins']
+        yield 'rpc_hedge_budget_denied_total', 'counter', {}, hedge['budget_denied']
     
     def is_using_premium_rpc(self) -> bool:
-        """Verifica se está usando RPC premium (Tatum) atualmente"""
-        try:
-            current_rpc = self.rpc_urls[self.current_rpc_index % len(self.rpc_urls)]
-            return current_rpc in RPC_CONFIGS
-        except:
-            return False
+        """Verifica se a última requisição usou RPC premium (Tatum)"""
+        return self.last_rpc_url in RPC_CONFIGS
     
     def is_valid_user_wallet(self, wallet_address: str, mint_address: str) -> bool:
         """
@@ -95,37 +117,67 @@ class SolanaRPC:
         """
         Busca o saldo de SOL de uma wallet
         Retorna o saldo em SOL (convertido de lamports)
+        A consulta é agrupada com outras simultâneas em um único getMultipleAccounts
         """
         try:
-            result = await self.rpc_request('getBalance', [wallet_address])
-            if result and 'value' in result:
-                lamports = result['value']
-                # Converte lamports para SOL (1 SOL = 1,000,000,000 lamports)
-                sol_balance = lamports / 1_000_000_000
-                return sol_balance
+            return await self.balance_service.get_balance(wallet_address)
         except Exception as e:
             print(f"⚠️ Erro ao buscar saldo: {e}")
         return 0.0
     
+    async def get_wallet_balances(self, wallets: List[str]) -> Dict[str, float]:
+        """
+        Busca o saldo de SOL de várias wallets em lote
+        Retorna dicionário wallet -> saldo em SOL (0.0 se falhar)
+        """
+        try:
+            return await self.balance_service.get_balances(wallets)
+        except Exception as e:
+            print(f"⚠️ Erro ao buscar saldos em lote: {e}")
+        return {}
+    
     async def rpc_request(self, method: str, params: list, timeout: int = 60) -> Optional[Dict]:
-        """Faz requisição RPC para Solana com retry automático e rate limiting"""
+        """
+        Faz requisição RPC para Solana com retry automático e rate limiting
+        Métodos só de leitura que demoram além do normal recebem uma cópia (hedge)
+        """
+        if HEDGE_ENABLED and method in HEDGEABLE_METHODS:
+            return await self.hedger.run(method, lambda: self._rpc_request(method, params, timeout))
+        return await self._rpc_request(method, params, timeout)
+    
+    def _record_response(self, method: str, rpc_url: str, status, started: float, size: int = 0, wire_size: int = 0):
+        """Métricas de uma tentativa: latência, status e bytes recebidos/na rede (por método e endpoint)"""
+        metrics.record_request('rpc', status, started, size, wire_size, method=method, endpoint=endpoint_label(rpc_url))
+    
+    async def _rpc_request(self, method: str, params: list, timeout: int = 60) -> Optional[Dict]:
+        """Uma requisição RPC (com retry e troca de RPC), sem hedge"""
+        weight = AdaptiveLimiter.weight(method)
+        tried = set()
+        attempts = 0
         
-        for rpc_attempt in range(len(self.rpc_urls)):
-            rpc_url = await self.get_current_rpc_url()
+        for rpc_attempt in range(len(self.router)):
+            # Endpoint sorteado na proporção da vazão medida (sem repetir os que já falharam)
+            endpoint, probe = self.router.pick(exclude=tried)
+            tried.add(endpoint.url)
+            rpc_url = self.last_rpc_url = endpoint.url
             
-            # Tenta várias vezes na mesma RPC antes de trocar
-            for retry_attempt in range(RPC_RETRY_ATTEMPTS):
+            # Tenta várias vezes na mesma RPC antes de trocar (429 tem contagem própria, com backoff)
+            retry_attempt = 0
+            throttled = 0
+            while retry_attempt < RPC_RETRY_ATTEMPTS:
                 payload = {
                     "jsonrpc": "2.0",
                     "id": random.randint(1, 10000),
                     "method": method,
                     "params": params
                 }
+                delay = 0.0
+                attempts += 1
+                if attempts > 1:
+                    metrics.inc('rpc_retries_total', method=method)
+                started = time.monotonic()
                 
                 try:
-                    # Helius não precisa de delays - processo contínuo
-                    pass  # Sem delays entre tentativas
-                    
                     # Verifica se este RPC precisa de headers especiais (ex: Tatum)
                     headers = {}
                     if rpc_url in RPC_CONFIGS:
@@ -134,46 +186,159 @@ class SolanaRPC:
                         if retry_attempt == 0:  # Log apenas na primeira tentativa
                             print(f"🔑 Usando RPC premium ({rpc_type}): {rpc_url[:30]}...")
                     
-                    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
-                        async with session.post(rpc_url, json=payload, headers=headers) as response:
-                            if response.status == 200:
-                                data = await response.json()
-                                if 'result' in data:
-                                    return data['result']
-                                elif 'error' in data:
-                                    error_msg = data['error']
-                                    print(f"❌ RPC Error: {error_msg}")
-                                    # Se é erro de método ou parâmetro, não tentar novamente
-                                    if error_msg.get('code') in [-32601, -32602]:
-                                        return None
-                                    # Para outros erros, continua tentando
-                                    continue
-                            elif response.status == 429:
-                                print(f"⚠️ Rate limit atingido em {rpc_url} - tentativa {retry_attempt + 1}/{RPC_RETRY_ATTEMPTS}")
-                                # Se é a última tentativa, blacklista o RPC
-                                if retry_attempt >= RPC_RETRY_ATTEMPTS - 1:
-                                    import time
-                                    self.blacklisted_rpcs[rpc_url] = time.time()
-                                    print(f"🚫 RPC blacklisted por 5 min: {rpc_url}")
-                                continue  # Tenta novamente com delay
-                            else:
-                                print(f"❌ HTTP Error {response.status} em {rpc_url}")
-                                break  # Troca de RPC
+                    # Transporte compartilhado: conexão keep-alive com o RPC (e gravação/replay, se ativados)
+                    # Limite adaptativo do endpoint (compartilhado entre buscas paralelas, ponderado pelo método)
+                    async with endpoint.limiter.slot(method):
+                        started = time.monotonic()
+                        response = await transport.request('rpc', method, 'POST', rpc_url, params, json_body=payload,
+                                                           headers=headers, timeout=timeout)
+                        self._record_response(method, rpc_url, response.status, started,
+                                              len(response.body), response.wire_size)
+                        if response.status == 200:
+                            data = await response.json_async()
+                            endpoint.limiter.on_success(method)
+                            if 'result' in data:
+                                self.router.record_success(endpoint, time.monotonic() - started, weight)
+                                return data['result']
+                            elif 'error' in data:
+                                error_msg = data['error']
+                                print(f"❌ RPC Error: {error_msg}")
+                                # Se é erro de método ou parâmetro, não tentar novamente (e não conta para o breaker)
+                                if error_msg.get('code') in [-32601, -32602]:
+                                    self.router.record_failure(endpoint, trip=False)
+                                    return None
+                                self.router.record_failure(endpoint)
+                                # Para outros erros, continua tentando
+                        elif response.status == 429:
+                            throttled += 1
+                            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                            endpoint.limiter.on_throttle(retry_after, method)
+                            exhausted = throttled > RPC_THROTTLE_RETRIES
+                            self.router.record_failure(endpoint, trip=exhausted)
+                            # Com outro RPC disponível, troca em vez de esperar
+                            if exhausted or len(tried) < len(self.router):
+                                print(f"⚠️ Rate limit em {rpc_url} ({method}) - trocando de RPC")
+                                break
+                            delay = AdaptiveLimiter.backoff(throttled, retry_after)
+                            print(f"⚠️ Rate limit atingido em {rpc_url} ({method}) - nova tentativa em {delay:.2f}s")
+                        else:
+                            print(f"❌ HTTP Error {response.status} em {rpc_url}")
+                            self.router.record_failure(endpoint)
+                            break  # Troca de RPC
                                 
                 except asyncio.TimeoutError:
                     print(f"⏰ Timeout em {rpc_url} - tentativa {retry_attempt + 1}/{RPC_RETRY_ATTEMPTS}")
-                    continue
+                    self._record_response(method, rpc_url, 'timeout', started)
+                    endpoint.limiter.on_throttle()  # Timeout também indica sobrecarga
+                    self.router.record_failure(endpoint)
                 except Exception as e:
                     print(f"❌ Erro na RPC {rpc_url}: {e}")
+                    self._record_response(method, rpc_url, 'error', started)
+                    self.router.record_failure(endpoint)
                     break  # Troca de RPC
+                finally:
+                    if probe:
+                        self.router.release_probe(endpoint)  # Libera o teste do breaker mesmo se cancelada
+                        probe = False
+                
+                if delay:
+                    await asyncio.sleep(delay)  # Fora do limite: não ocupa espaço enquanto espera
+                else:
+                    retry_attempt += 1
             
-            # Roda para próxima RPC se todas as tentativas falharam
-            print(f"🔄 Trocando para próxima RPC...")
-            self.rotate_rpc()
+            if len(tried) < len(self.router):
+                print(f"🔄 Trocando para próxima RPC...")
         
         print("❌ Todas as RPCs falharam")
         return None
     
+    async def rpc_batch_request(self, calls: List[tuple], timeout: int = 60) -> List[Optional[Dict]]:
+        """
+        Envia várias chamadas em um único array JSON-RPC batch
+        calls: lista de (método, params); retorna os resultados na mesma ordem (None se falhar)
+        """
+        payload = [
+            {"jsonrpc": "2.0", "id": i, "method": method, "params": params}
+            for i, (method, params) in enumerate(calls)
+        ]
+        # O batch pesa a soma das chamadas
+        weight = sum(AdaptiveLimiter.weight(method) for method, _ in calls)
+        tried = set()
+        
+        for rpc_attempt in range(len(self.router)):
+            endpoint, probe = self.router.pick(exclude=tried)
+            tried.add(endpoint.url)
+            rpc_url = self.last_rpc_url = endpoint.url
+            headers = RPC_CONFIGS[rpc_url]['headers'] if rpc_url in RPC_CONFIGS else {}
+            # Limitado ao teto do endpoint para sempre poder entrar
+            slot_weight = min(weight, endpoint.limiter.max_limit)
+            
+            throttled = 0
+            while True:
+                delay = 0.0
+                started = time.monotonic()
+                try:
+                    async with endpoint.limiter.slot(weight=slot_weight):
+                        started = time.monotonic()
+                        response = await transport.request('rpc', 'batch', 'POST', rpc_url, calls, json_body=payload,
+                                                           headers=headers, timeout=timeout)
+                        self._record_response('batch', rpc_url, response.status, started,
+                                              len(response.body), response.wire_size)
+                        if response.status == 200:
+                            data = await response.json_async()
+                            endpoint.limiter.on_success(weight=slot_weight)
+                            items = [item for item in data if isinstance(item, dict)] if isinstance(data, list) else []
+                            errors = sum(1 for item in items if 'error' in item)
+                            if not items:
+                                # Erro no batch inteiro (objeto de erro único): troca de RPC
+                                print(f"❌ RPC Error em {rpc_url} (batch): {data.get('error') if isinstance(data, dict) else data}")
+                                self.router.record_failure(endpoint)
+                            else:
+                                if errors:
+                                    print(f"❌ RPC Error em {errors} de {len(calls)} chamadas do batch")
+                                    self.router.record_failure(endpoint, trip=errors == len(items))
+                                else:
+                                    self.router.record_success(endpoint, time.monotonic() - started, weight)
+                                # Respostas podem vir fora de ordem: mapeia pelo id
+                                by_id = {item.get('id'): item.get('result') for item in items}
+                                return [by_id.get(i) for i in range(len(calls))]
+                        elif response.status == 429:
+                            throttled += 1
+                            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                            endpoint.limiter.on_throttle(retry_after)
+                            exhausted = throttled > RPC_THROTTLE_RETRIES
+                            self.router.record_failure(endpoint, trip=exhausted)
+                            if not exhausted and len(tried) >= len(self.router):
+                                delay = AdaptiveLimiter.backoff(throttled, retry_after)
+                            print(f"⚠️ Rate limit atingido em {rpc_url} (batch de {len(calls)} chamadas)")
+                        else:
+                            print(f"❌ HTTP Error {response.status} em {rpc_url} (batch)")
+                            self.router.record_failure(endpoint)
+                except asyncio.TimeoutError:
+                    print(f"⏰ Timeout em {rpc_url} (batch de {len(calls)} chamadas)")
+                    self._record_response('batch', rpc_url, 'timeout', started)
+                    endpoint.limiter.on_throttle()
+                    self.router.record_failure(endpoint)
+                except Exception as e:
+                    print(f"❌ Erro na RPC {rpc_url} (batch): {e}")
+                    self._record_response('batch', rpc_url, 'error', started)
+                    self.router.record_failure(endpoint)
+                finally:
+                    if probe:
+                        self.router.release_probe(endpoint)
+                        probe = False
+                
+                if not delay:
+                    break
+                metrics.inc('rpc_retries_total', method='batch')
+                await asyncio.sleep(delay)
+            
+            if len(tried) < len(self.router):
+                print(f"🔄 Trocando para próxima RPC...")
+        
+        print("❌ Todas as RPCs falharam (batch)")
+        return [None] * len(calls)
+    
     async def get_token_accounts_by_mint(self, mint_address: str) -> List[Dict]:
         """
         Busca todas as contas de token para um mint específico
@@ -200,6 +365,68 @@ class SolanaRPC:
         
         return []
     
+    async def get_token_holders(self, mint_address: str, program_id: str = TOKEN_PROGRAM_ID) -> Optional[List[Tuple[bytes, int]]]:
+        """
+        Todas as contas de token do mint em UMA chamada getProgramAccounts (duas no Token-2022)
+        Filtro memcmp no mint (offset 0) e dataSlice só com owner + amount (40 bytes por conta)
+        Retorna [(owner em 32 bytes, amount)] somado por owner, maior saldo primeiro (contas
+        zeradas ficam de fora); None se o RPC recusar a consulta ou falhar
+        """
+        mint_filter = {"memcmp": {"offset": 0, "bytes": mint_address}}
+        queries = [[mint_filter, {"dataSize": TOKEN_ACCOUNT_SIZE}]]
+        if program_id == TOKEN_2022_PROGRAM_ID:
+            # Token-2022: contas sem extensões têm 165 bytes; com extensões, o byte 165 = 2 identifica
+            # conta de token. Duas consultas (unidas pelo pubkey) para cobrir os dois casos
+            queries.append([mint_filter, {"memcmp": {"offset": TOKEN_ACCOUNT_SIZE, "bytes": base58.b58encode(b'\x02').decode()}}])
+        results = await asyncio.gather(*[
+            self.rpc_request("getProgramAccounts", [
+                program_id,
+                {
+                    "encoding": "base64",
+                    "commitment": "confirmed",
+                    "filters": filters,
+                    "dataSlice": {"offset": TOKEN_ACCOUNT_OWNER_OFFSET, "length": 40}
+                }
+            ], timeout=120)
+            for filters in queries
+        ])
+        if not all(isinstance(result, list) for result in results):
+            return None
+        accounts = {item.get('pubkey'): item for result in results for item in result if isinstance(item, dict)}
+        result = list(accounts.values())
+        
+        amounts: Dict[bytes, int] = {}
+        for item in result:
+            try:
+                raw = base64.b64decode(item['account']['data'][0])
+            except (KeyError, IndexError, TypeError, ValueError):
+                continue
+            if len(raw) < 40:
+                continue
+            amount = int.from_bytes(raw[32:40], 'little')
+            if amount:
+                owner = raw[:32]
+                amounts[owner] = amounts.get(owner, 0) + amount
+        print(f"📋 getProgramAccounts: {len(result)} contas de token, {len(amounts)} holders com saldo")
+        return sorted(amounts.items(), key=lambda item: (-item[1], item[0]))
+    
+    async def get_holders_snapshot(self, mint_address: str, program_id: str = TOKEN_PROGRAM_ID) -> Optional[BuyerRecords]:
+        """
+        Holders atuais do token (HOLDER_DISCOVERY_MODE=program_accounts), maior saldo de token primeiro
+        account_index guarda a posição no ranking (sem timestamp, a ordenação cronológica
+        mantém essa ordem); balance é o saldo de SOL, como na busca pelo histórico
+        """
+        self.count_request()
+        holders = await self.get_token_holders(mint_address, program_id)
+        if holders is None:
+            return None
+        
+        records = BuyerRecords()
+        for rank, (owner, _) in enumerate(holders):
+            records.append_key(owner, account_index=rank)
+        records.set_balances(await self.get_wallet_balances(records.wallets()))
+        return records
+    
     async def get_token_supply(self, mint_address: str) -> Dict:
         """
         Busca informações de supply do token
@@ -214,44 +441,97 @@ class SolanaRPC:
             return result['value']
         return {}
     
-    async def get_signatures_for_address(self, address: str, limit: int = 1000) -> List[Dict]:
+    async def get_signatures_page(self, address: str, limit: int = 1000, before: Optional[str] = None,
+                                  until: Optional[str] = None) -> List[Dict]:
         """
-        Busca assinaturas de transações para um endereço
+        Busca UMA página de assinaturas (mais novas primeiro, como o RPC devolve)
+        before/until delimitam a página por signature
         """
-        params = [
-            address,
-            {
-                "limit": limit,
-                "commitment": "confirmed"
-            }
-        ]
-        
-        result = await self.rpc_request("getSignaturesForAddress", params)
-        
-        # Ordena signatures por blockTime (das mais antigas para as mais novas) para ordem cronológica consistente
-        if result:
-            # Filtra signatures que têm blockTime e ordena cronologicamente
-            signatures_with_time = [sig for sig in result if sig.get('blockTime')]
-            signatures_with_time.sort(key=lambda x: x.get('blockTime', 0))
-            print(f"📅 Signatures ordenadas cronologicamente: {len(signatures_with_time)} de {len(result)}")
-            return signatures_with_time
+        options = {
+            "limit": min(limit, 1000),
+            "commitment": "confirmed"
+        }
+        if before:
+            options["before"] = before
+        if until:
+            options["until"] = until
         
+        result = await self.rpc_request("getSignaturesForAddress", [address, options])
         return result if result else []
     
-    async def get_transaction(self, signature: str) -> Optional[Dict]:
+    async def get_signatures_raw(self, address: str, limit: int = 1000, until: Optional[str] = None) -> List[Dict]:
         """
-        Busca detalhes de uma transação específica
+        Busca assinaturas na ordem do RPC (mais novas primeiro)
+        Pagina com 'before' em blocos de SIGNATURE_PAGE_SIZE até atingir o limite
+        Com 'until', para na signature informada (só as mais novas que ela)
         """
-        params = [
+        result = []
+        before = None
+        while len(result) < limit:
+            page_size = min(SIGNATURE_PAGE_SIZE, limit - len(result))
+            page = await self.get_signatures_page(address, page_size, before=before, until=until)
+            result.extend(page)
+            if len(page) < page_size:
+                break  # Não há mais páginas
+            before = page[-1].get('signature')
+        return result
+    
+    @staticmethod
+    def sort_signatures_chronologically(signatures: List[Dict]) -> List[Dict]:
+        """
+        Ordena signatures por blockTime (das mais antigas para as mais novas) para ordem cronológica consistente
+        Filtra signatures sem blockTime
+        """
+        if not signatures:
+            return []
+        signatures_with_time = [sig for sig in signatures if sig.get('blockTime')]
+        signatures_with_time.sort(key=lambda x: x.get('blockTime', 0))
+        print(f"📅 Signatures ordenadas cronologicamente: {len(signatures_with_time)} de {len(signatures)}")
+        return signatures_with_time
+    
+    async def get_signatures_for_address(self, address: str, limit: int = 1000) -> List[Dict]:
+        """
+        Busca assinaturas de transações para um endereço
+        """
+        result = await self.get_signatures_raw(address, limit)
+        return self.sort_signatures_chronologically(result)
+    
+    @staticmethod
+    def transaction_params(signature: str, encoding: str = 'jsonParsed') -> list:
+        return [
             signature,
             {
-                "encoding": "jsonParsed",
+                "encoding": encoding,
                 "commitment": "confirmed",
                 "maxSupportedTransactionVersion": 0
             }
         ]
+    
+    async def get_transaction(self, signature: str) -> Optional[Dict]:
+        """
+        Busca detalhes de uma transação específica
+        Lê primeiro do armazenamento local (transações confirmadas não mudam)
+        """
+        if tx_store is not None:
+            stored = await tx_store.get_async(signature)
+            if stored is not None:
+                return stored
+        
+        # base64 + solders: resposta bem menor que jsonParsed e decodificação mais rápida
+        encoding = 'base64' if TX_ENCODING == 'base64' and decode_available() else 'jsonParsed'
+        result = await self.rpc_request("getTransaction", self.transaction_params(signature, encoding))
+        if result and encoding == 'base64':
+            decoded = decode_transaction(result)
+            if decoded is None:
+                print(f"⚠️ Não foi possível decodificar {signature[:8]}... em base64, buscando em jsonParsed")
+                result = await self.rpc_request("getTransaction", self.transaction_params(signature, 'jsonParsed'))
+            else:
+                result = decoded
         
-        return await self.rpc_request("getTransaction", params)
+        # Só armazena transações já incluídas em um bloco
+        if result and result.get('slot') and tx_store is not None:
+            return await tx_store.put_async(signature, result)
+        return result
     
     async def get_account_info(self, address: str) -> Optional[Dict]:
         """
@@ -267,78 +547,141 @@ class SolanaRPC:
         
         return await self.rpc_request("getAccountInfo", params)
     
-    async def get_token_metadata_jupiter(self, mint_address: str) -> Dict:
+    async def get_token_metadata_jupiter(self, mint_address: str, timeout: float = 30) -> Optional[Dict]:
         """
         Busca metadados do token usando a API do Jupiter
-        Retorna informações como nome, símbolo e outras propriedades
+        Retorna informações como nome, símbolo e outras propriedades; {} se o Jupiter
+        não conhece o token (404) e None se a consulta falhou (timeout, 429, 5xx)
         """
         try:
             url = f"https://tokens.jup.ag/token/{mint_address}"
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=30)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        print(f"✅ Jupiter API: Metadados encontrados para {mint_address[:8]}...")
-                        return {
-                            'name': data.get('name', 'Token Solana'),
-                            'symbol': data.get('symbol', 'UNKNOWN'),
-                            'decimals': data.get('decimals', 9),
-                            'logoURI': data.get('logoURI', ''),
-                            'tags': data.get('tags', [])
-                        }
-                    else:
-                        print(f"⚠️ Jupiter API: Token não encontrado (status {response.status})")
-                        return {}
-                        
+            response = await transport.request('jupiter', 'token', 'GET', url, {'mint': mint_address}, timeout=timeout)
+            if response.status == 200:
+                data = await response.json_async()
+                print(f"✅ Jupiter API: Metadados encontrados para {mint_address[:8]}...")
+                return {
+                    'name': data.get('name', 'Token Solana'),
+                    'symbol': data.get('symbol', 'UNKNOWN'),
+                    'decimals': data.get('decimals', 9),
+                    'logoURI': data.get('logoURI', ''),
+                    'tags': data.get('tags', [])
+                }
+            elif response.status == 404:
+                print(f"⚠️ Jupiter API: Token não encontrado (status {response.status})")
+                return {}
+            else:
+                print(f"⚠️ Jupiter API falhou (status {response.status})")
+                return None
+                    
         except Exception as e:
             print(f"⚠️ Erro ao buscar metadados via Jupiter API: {e}")
-            return {}
+            return None
     
-    async def extract_buyers_from_mint(self, mint_address: str) -> tuple[List[str], Dict]:
+    @contextmanager
+    def watch_buyers(self, mint_address: str, callback: Callable[[Dict], None]):
+        """
+        Recebe cada comprador do token assim que o pipeline o entrega (com saldo), sem esperar
+        o fim da busca; serve para mostrar progresso. Vale também para buscas compartilhadas
+        (single-flight), já que o registro é por token.
+        """
+        watchers = self.buyer_watchers.setdefault(mint_address, [])
+        watchers.append(callback)
+        try:
+            yield
+        finally:
+            watchers.remove(callback)
+            if not watchers:
+                del self.buyer_watchers[mint_address]
+    
+    def count_request(self):
+        """Conta uma requisição no total do processo e na busca em andamento"""
+        self.request_count += 1
+        counter = _scan_requests.get()
+        if counter is not None:
+            counter[0] += 1
+    
+    def _notify_buyer(self, mint_address: str, buyer: Dict):
+        for callback in list(self.buyer_watchers.get(mint_address, ())):
+            try:
+                callback(buyer)
+            except Exception as e:
+                print(f"⚠️ Erro ao notificar progresso: {e}")
+    
+    async def _fetch_token_info(self, mint_address: str) -> Tuple[Dict, Optional[Dict]]:
+        """token_info do token (metadados + decimais/supply on-chain) e o getAccountInfo do mint"""
+        # Busca informações básicas do token (cache -> Solscan -> Jupiter -> on-chain)
+        print("📊 Buscando metadados do token...")
+        metadata = await self.metadata.resolve(mint_address)
+        
+        # Informações básicas do token (com metadados se disponíveis)
+        token_info = {
+            'name': metadata.get('name', 'Token Solana'),
+            'symbol': metadata.get('symbol', 'UNKNOWN'), 
+            'decimals': metadata.get('decimals', 9),
+            'supply': '0',
+            'logoURI': metadata.get('logoURI', ''),
+            'tags': metadata.get('tags', [])
+        }
+        
+        self.count_request()
+        # Helius é rápido - sem delay
+        
+        account_info = await self.get_account_info(mint_address)
+        if account_info and account_info.get('value'):
+            parsed_info = account_info['value'].get('data', {}).get('parsed', {}).get('info', {})
+            token_info.update({
+                'decimals': parsed_info.get('decimals', 9),
+                'supply': parsed_info.get('supply', '0')
+            })
+            print(f"✅ Token info: {token_info.get('decimals', 9)} decimais")
+        return token_info, account_info
+    
+    async def extract_buyers_from_mint(self, mint_address: str, accounts: Optional[List[Dict]] = None,
+                                       holder_mode: Optional[str] = None,
+                                       scope: str = 'largest_accounts') -> tuple[List[str], Dict, BuyerRecords]:
         """
         Extrai compradores de um token usando RPC direto da Solana (versão otimizada)
         Método alternativo quando API do Solscan não funciona
+        accounts: endereços cujo histórico será percorrido (padrão: as maiores contas do token;
+        o planejador de descoberta passa as já sondadas ou o próprio mint)
+        holder_mode: HOLDER_DISCOVERY_MODE desta busca (padrão: o da configuração)
+        scope: onde fica o estado incremental desta busca no mint_results (um por conjunto de contas)
         """
+        holder_mode = holder_mode or HOLDER_DISCOVERY_MODE
         print(f"🔍 Buscando compradores via RPC Solana para: {mint_address}")
         print("⚡ Versão otimizada com menos requisições para evitar rate limiting")
         
+        scan_requests = [0]
+        token = _scan_requests.set(scan_requests)
         try:
-            self.request_count = 0
-            
-            # Busca informações básicas do token via Jupiter API primeiro
-            print("📊 Buscando metadados do token via Jupiter API...")
-            jupiter_metadata = await self.get_token_metadata_jupiter(mint_address)
-            
-            # Informações básicas do token (com metadados do Jupiter se disponível)
-            token_info = {
-                'name': jupiter_metadata.get('name', 'Token Solana'),
-                'symbol': jupiter_metadata.get('symbol', 'UNKNOWN'), 
-                'decimals': jupiter_metadata.get('decimals', 9),
-                'supply': '0',
-                'logoURI': jupiter_metadata.get('logoURI', ''),
-                'tags': jupiter_metadata.get('tags', [])
-            }
+            # Resultado anterior do mesmo token: busca só as signatures novas de cada conta
+            stored = self.mint_results.get(mint_address, scope)
+            account_info = None
+            if stored and stored.get('token_info') and holder_mode != 'program_accounts':
+                token_info = None  # Só é buscado de novo se houver transações novas
+            else:
+                token_info, account_info = await self._fetch_token_info(mint_address)
             
-            self.request_count += 1
-            # Helius é rápido - sem delay
+            if holder_mode == 'program_accounts':
+                # Todas as contas do token em 1 requisição (holders atuais, sem histórico de compras)
+                print("🔎 Listando todas as contas do token (getProgramAccounts)...")
+                program_id = ((account_info or {}).get('value') or {}).get('owner', TOKEN_PROGRAM_ID)
+                holders = await self.get_holders_snapshot(mint_address, program_id)
+                if holders is not None:
+                    print(f"🎉 Processo concluído! Encontrados {len(holders)} holders via getProgramAccounts")
+                    print(f"📊 Total de requisições feitas: {scan_requests[0]}")
+                    return holders.wallets(), token_info, holders
+                print("⚠️ getProgramAccounts indisponível neste RPC - usando as maiores contas")
             
-            account_info = await self.get_account_info(mint_address)
-            if account_info and account_info.get('value'):
-                parsed_info = account_info['value'].get('data', {}).get('parsed', {}).get('info', {})
-                token_info.update({
-                    'decimals': parsed_info.get('decimals', 9),
-                    'supply': parsed_info.get('supply', '0')
-                })
-                print(f"✅ Token info: {token_info.get('decimals', 9)} decimais")
-            
-            # Busca as maiores contas do token (1 requisição)
-            print("🔎 Buscando maiores contas do token...")
-            
-            self.request_count += 1 
-            # Helius é rápido - sem delay
-            
-            largest_accounts = await self.get_token_accounts_by_mint(mint_address)
+            if accounts is None:
+                # Busca as maiores contas do token (1 requisição)
+                print("🔎 Buscando maiores contas do token...")
+                self.count_request()
+                # Helius é rápido - sem delay
+                largest_accounts = await self.get_token_accounts_by_mint(mint_address)
+            else:
+                largest_accounts = accounts
             
             if not largest_accounts:
                 print("❌ Nenhuma conta de token encontrada")
@@ -346,141 +689,76 @@ class SolanaRPC:
                 print("   - Token não existe na blockchain")  
                 print("   - Endereço de token inválido")
                 print("   - Token muito novo sem holders")
-                return [], token_info, []
+                return [], token_info or stored['token_info'], BuyerRecords()
             
             print(f"✅ Encontradas {len(largest_accounts)} contas de token")
             
             buyers_list = []
-            buyers_with_balance = []  # Lista com wallets e saldos
-            processed_owners = set()
+            buyers_with_balance = BuyerRecords()  # Wallets, saldos e posição cronológica (em colunas)
+            
+            stored_buyers = stored['buyers'].copy() if stored else BuyerRecords()
+            cursors = stored['accounts'] if stored else {}
+            if stored:
+                print(f"♻️ Atualização incremental: {len(stored_buyers)} wallets salvas, buscando só transações novas")
             
-            # Calcula quantas contas processar - mais agressivo com RPC premium
             # Helius - processa TODAS as contas sem limitações
             max_accounts_to_process = len(largest_accounts)
             print(f"🚀 Helius: Processando TODAS as {max_accounts_to_process} contas (sem limites)")
             
-            # Para cada conta de token, busca apenas algumas transações
-            for i, account in enumerate(largest_accounts[:max_accounts_to_process]):
-                # account é um dicionário com chaves: address, amount, decimals, uiAmount, uiAmountString
-                account_address = account.get('address') if isinstance(account, dict) else None
-                if not account_address:
-                    print(f"⚠️ Conta {i+1} sem endereço válido: {account}")
-                    continue
-                
-                print(f"📜 Conta {i+1}/{max_accounts_to_process}: {account_address[:8]}...")
-                
-                # Busca signatures para a conta
-                self.request_count += 1
-                
-                # Helius - busca TODAS as transações (sem limite)
-                signatures_limit = 1000  # Limite alto para pegar mais wallets
-                
-                signatures = await self.get_signatures_for_address(account_address, signatures_limit)
-                
-                if not signatures:
-                    print(f"⚠️ Nenhuma transação encontrada para {account_address[:8]}")
-                    continue
-                
-                print(f"✅ Encontradas {len(signatures)} transações")
-                
-                # Helius - processa TODAS as transações (sem limite)
-                max_sigs_to_process = len(signatures)
-                print(f"🚀 Helius: processando TODAS as {max_sigs_to_process} transações")
-                
-                # Processa signatures em ordem cronológica (já ordenadas das mais antigas para mais novas)
-                for j, sig_info in enumerate(signatures[:max_sigs_to_process]):
-                    try:
-                        signature = sig_info.get('signature')
-                        block_time = sig_info.get('blockTime', 0)
-                        
-                        if not signature:
-                            continue
-                        
-                        print(f"🔍 Transação {j+1}/{max_sigs_to_process}...")
-                        
-                        self.request_count += 1
-                        
-                        # Helius não precisa de delay entre transações
-                        pass  # Processamento contínuo
-                        
-                        # Busca detalhes da transação
-                        tx_details = await self.get_transaction(signature)
-                        
-                        if not tx_details:
-                            continue
-                        
-                        # Extrai wallets das contas envolvidas
-                        transaction = tx_details.get('transaction', {})
-                        message = transaction.get('message', {})
-                        account_keys = message.get('accountKeys', [])
-                        
-                        # Adiciona as primeiras contas como possíveis compradores
-                        for account_key in account_keys[:3]:  # Apenas 3 primeiras
-                            if isinstance(account_key, str):
-                                wallet = account_key
-                            else:
-                                wallet = account_key.get('pubkey', '')
-                            
-                            # Usa o filtro robusto para validar wallets
-                            if (wallet and 
-                                self.is_valid_user_wallet(wallet, mint_address) and
-                                wallet not in processed_owners):
-                                
-                                # Busca saldo da wallet
-                                print(f"💰 Buscando saldo para: {wallet[:8]}...")
-                                balance = await self.get_wallet_balance(wallet)
-                                
-                                # Timestamp mais preciso e estável
-                                final_timestamp = block_time if block_time > 0 else int(time.time())
-                                
-                                buyers_list.append(wallet)
-                                buyers_with_balance.append({
-                                    'wallet': wallet,
-                                    'balance': balance,
-                                    'timestamp': final_timestamp,
-                                    'account_index': i,  # Índice da conta processada
-                                    'sig_index': j       # Índice da signature processada
-                                })
-                                processed_owners.add(wallet)
-                                
-                                print(f"✅ Wallet: {wallet[:8]}... | Saldo: {balance:.2f} | TS: {final_timestamp} | Conta: {i} | Sig: {j}")
-                                
-                                # Helius - continua coletando TODAS as wallets (sem limite)
-                                    
-                            elif wallet and wallet in self.SYSTEM_PROGRAMS:
-                                print(f"🔧 Programa filtrado: {wallet[:8]}... (sistema Solana)")
-                        
-                                                        # Helius - continua coletando TODAS as wallets
-                            
-                    except Exception as e:
-                        print(f"⚠️ Erro ao processar transação: {e}")
-                        continue
+            # Pipeline em streaming: signatures -> transações -> wallets -> saldos
+            pipeline = BuyerPipeline(
+                self, mint_address, largest_accounts[:max_accounts_to_process],
+                cursors=cursors, known_wallets=stored_buyers.wallets()
+            )
+            try:
+                async for buyer in pipeline.run():
+                    buyers_with_balance.append_dict(buyer)
+                    self._notify_buyer(mint_address, buyer)  # Progresso ao vivo (primeiras wallets antes do fim)
+            except StaleCursorError as e:
+                # Buraco entre o cursor e as signatures novas: o resultado salvo não serve mais
+                print(f"♻️ Resultado salvo desatualizado ({e}) - refazendo a busca do zero")
+                self.mint_results.invalidate(mint_address, scope)
+                return await self.extract_buyers_from_mint(mint_address, accounts, holder_mode, scope)
+            if tx_store is not None:
+                await tx_store.flush_async()  # Transações desta busca gravadas em um único commit
+            
+            if stored and pipeline.stats['signatures'] == 0:
+                # Nada mudou: devolve o resultado salvo (já ordenado) sem metadados, saldos novos nem salvar de novo
+                # Só os saldos que já estão no cache de saldos são aproveitados (nenhuma requisição)
+                print("✅ Nenhuma transação nova desde a última consulta - usando resultado salvo")
+                stored_buyers.set_balances(self.balance_service.cached_balances(stored_buyers.wallets()))
+                print(f"📊 Total de requisições feitas: {scan_requests[0]}")
+                return stored_buyers.wallets(), dict(token_info or stored['token_info']), stored_buyers
+            
+            if token_info is None:
+                token_info, _ = await self._fetch_token_info(mint_address)
+            
+            if stored:
+                print(f"✅ {pipeline.stats['signatures']} transações novas, {len(buyers_with_balance)} wallets novas")
                 
-                                                # Helius - continua coletando TODAS as wallets
+                # Saldos das wallets salvas são atualizados (cache de saldos evita repetir consultas recentes)
+                balances = await self.get_wallet_balances(stored_buyers.wallets())
+                stored_buyers.set_balances(balances)
                 
-                # Helius processa tudo sem delays
-                print("⚡ Helius: processamento contínuo sem delays...")
+                stored_buyers.extend(buyers_with_balance)
+                buyers_with_balance = stored_buyers
             
             # ORDENAÇÃO CRONOLÓGICA ROBUSTA E DETERMINÍSTICA
             if buyers_with_balance:
                 print(f"🔄 APLICANDO ORDENAÇÃO CRONOLÓGICA DETERMINÍSTICA...")
                 
                 # Ordena por timestamp, índice da conta, índice da signature e wallet (100% determinístico)
-                buyers_with_balance.sort(key=lambda x: (
-                    x.get('timestamp', 0), 
-                    x.get('account_index', 0), 
-                    x.get('sig_index', 0), 
-                    x.get('wallet', '')
-                ))
-                buyers_list = [item['wallet'] for item in buyers_with_balance]
+                buyers_with_balance = buyers_with_balance.sort_chronological()
+                buyers_list = buyers_with_balance.wallets()
                 
                 print(f"📅 {len(buyers_with_balance)} wallets ordenadas cronologicamente")
                 print(f"🎯 VERIFICAÇÃO DE CONSISTÊNCIA CRONOLÓGICA:")
                 
                 # Log DETALHADO das primeiras 5 wallets com timestamps
-                for i, item in enumerate(buyers_with_balance[:min(5, len(buyers_with_balance))], 1):
-                    ts = item.get('timestamp', 0)
-                    wallet = item.get('wallet', '')
+                for i in range(1, min(5, len(buyers_with_balance)) + 1):
+                    item = buyers_with_balance.to_dict(i - 1)
+                    ts = item['timestamp']
+                    wallet = item['wallet']
                     
                     # Converte timestamp para data legível (se > 0)
                     if ts > 0:
@@ -490,20 +768,21 @@ class SolanaRPC:
                     else:
                         print(f"⏰ {i}. {wallet[:12]}... | TS: {ts} | Data: SEM TIMESTAMP")
                 
-                # Cache do resultado para consistência
-                cache_key = f"{mint_address}_{len(buyers_with_balance)}"
-                self.token_cache[cache_key] = buyers_with_balance.copy()
-                print(f"💾 Resultado cacheado: {cache_key}")
+                # Salva o resultado e os cursores para a próxima consulta incremental
+                self.mint_results.save(mint_address, buyers_with_balance, pipeline.updated_cursors(), scope, token_info)
+                print(f"💾 Resultado salvo para atualização incremental: {len(buyers_with_balance)} wallets")
             
             print(f"🎉 Processo concluído! Encontradas {len(buyers_list)} wallets via RPC Solana")
-            print(f"📊 Total de requisições feitas: {self.request_count}")
+            print(f"📊 Total de requisições feitas: {scan_requests[0]}")
             
             # Retorna tanto a lista simples quanto os dados detalhados com saldos
             return buyers_list, token_info, buyers_with_balance
             
         except Exception as e:
             print(f"❌ Erro geral ao buscar compradores via RPC: {e}")
-            return [], {}, []
+            return [], {}, BuyerRecords()
+        finally:
+            _scan_requests.reset(token)
 
 # Instância global da RPC
 solana_rpc = SolanaRPC()
\ No newline at end of file
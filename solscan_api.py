@@ -1,14 +1,29 @@
-import aiohttp
 import asyncio
-from typing import List, Dict, Set
-import json
-from config import SOLSCAN_API_BASE, SOLSCAN_HEADERS, SOLSCAN_PRO_API_KEY
+from typing import AsyncIterator, List, Dict, Optional
+import time
+from config import (
+    SOLSCAN_API_BASE, SOLSCAN_HEADERS, SOLSCAN_PRO_API_KEY, MAX_WALLETS_DISPLAY,
+    SOLSCAN_PAGE_SIZE, SOLSCAN_PREFETCH_PAGES, SOLSCAN_MAX_PAGES, DISCOVERY_STRATEGY,
+    SOURCE_RACE_ENABLED, SOURCE_RACE_STAGGER
+)
 from solana_rpc import solana_rpc
+from discovery import DiscoveryPlanner, race_sources, valid_result
+from transport import transport
+from singleflight import SingleFlight
+from buyer_records import BuyerRecords
+from metrics import metrics
+
+class SolscanPageError(Exception):
+    """Página de transferências que falhou: a lista ficaria incompleta (sem como pular a página)"""
 
 class SolscanAPI:
     def __init__(self):
         self.base_url = SOLSCAN_API_BASE
         self.headers = SOLSCAN_HEADERS
+        # Mesmo token pedido por vários usuários ao mesmo tempo: uma única busca compartilhada
+        self.scans = SingleFlight('extract_buyers')
+        # Escolhe entre Solscan e as estratégias via RPC pelo custo estimado
+        self.planner = DiscoveryPlanner(solana_rpc, self)
         
         # Endereços de programas do sistema Solana que devem ser filtrados  
         self.SYSTEM_PROGRAMS = {
@@ -58,107 +73,201 @@ class SolscanAPI:
             print(f"⚠️ Erro ao buscar saldo via Solscan: {e}")
             return 0.0
         
-    async def get_token_transactions(self, token_address: str, limit: int = 10000) -> List[Dict]:
+    async def get_wallet_balances(self, wallets: List[str]) -> Dict[str, float]:
         """
-        Busca transações de um token específico no Solscan
-        Retorna transações ordenadas por tempo (mais antigas primeiro)
+        Busca o saldo de SOL de várias wallets em lote usando RPC
+        """
+        try:
+            return await solana_rpc.get_wallet_balances(wallets)
+        except Exception as e:
+            print(f"⚠️ Erro ao buscar saldos via Solscan: {e}")
+            return {}
+        
+    async def get_transfers_page(self, token_address: str, page: int, page_size: int = SOLSCAN_PAGE_SIZE) -> Optional[List[Dict]]:
+        """
+        Busca uma página de transferências do token, já ordenada pelo Solscan
+        (block_time crescente: mais antigas primeiro)
+        Retorna None em caso de erro
         """
         url = f"{self.base_url}/token/transfer"
         params = {
             'address': token_address,
-            'limit': limit,
-            'offset': 0
+            'page': page,
+            'page_size': page_size,
+            'sort_by': 'block_time',
+            'sort_order': 'asc'
         }
         
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(url, headers=self.headers, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        transactions = data.get('data', [])
-                        
-                        # Ordena transações por timestamp (mais antigas primeiro)
-                        # Para pegar as primeiras wallets que compraram
-                        sorted_transactions = sorted(
-                            transactions, 
-                            key=lambda x: x.get('blockTime', 0) or x.get('slot', 0)
-                        )
-                        
-                        return sorted_transactions
-                    else:
-                        print(f"Erro na API: {response.status}")
-                        return []
-            except Exception as e:
-                print(f"Erro ao buscar transações: {e}")
-                return []
+        started = time.monotonic()
+        try:
+            response = await transport.request('solscan', 'token/transfer', 'GET', url, params=params,
+                                               headers=self.headers, timeout=60)
+            metrics.record_request('solscan', response.status, started, len(response.body), response.wire_size,
+                                   endpoint='token/transfer')
+            if response.status == 200:
+                data = await response.json_async()
+                return data.get('data', []) or []
+            else:
+                print(f"Erro na API: {response.status} (página {page})")
+                return None
+        except Exception as e:
+            metrics.record_request('solscan', 'error', started, endpoint='token/transfer')
+            print(f"Erro ao buscar transações (página {page}): {e}")
+            return None
     
-    async def get_token_info(self, token_address: str) -> Dict:
+    async def iter_token_transfers(self, token_address: str, max_pages: int = SOLSCAN_MAX_PAGES) -> AsyncIterator[Dict]:
         """
-        Busca informações básicas do token
-        Tenta primeiro via Solscan, depois via Jupiter API como fallback
+        Produz as transferências do token em ordem cronológica, página por página
+        As próximas SOLSCAN_PREFETCH_PAGES páginas são buscadas em paralelo
+        enquanto a atual é processada; quem consome pode parar a qualquer
+        momento e as buscas pendentes são canceladas
+        Se uma página falhar, levanta SolscanPageError (a lista parcial não é um resultado)
         """
-        url = f"{self.base_url}/token/meta"
-        params = {'address': token_address}
+        pending = []  # (página, task) em ordem
+        next_page = 1
         
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(url, headers=self.headers, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        token_data = data.get('data', {})
-                        if token_data and token_data.get('symbol'):
-                            print(f"✅ Solscan: Metadados encontrados para {token_address[:8]}...")
-                            return token_data
-                    else:
-                        print(f"⚠️ Solscan API falhou (status {response.status}), tentando Jupiter...")
-            except Exception as e:
-                print(f"⚠️ Erro no Solscan: {e}, tentando Jupiter API...")
+        def schedule():
+            nonlocal next_page
+            while len(pending) < SOLSCAN_PREFETCH_PAGES + 1 and next_page <= max_pages:
+                pending.append((next_page, asyncio.create_task(self.get_transfers_page(token_address, next_page))))
+                next_page += 1
         
-        # Fallback: Jupiter API
         try:
-            jupiter_url = f"https://tokens.jup.ag/token/{token_address}"
-            async with session.get(jupiter_url, timeout=aiohttp.ClientTimeout(total=30)) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    print(f"✅ Jupiter API: Metadados encontrados para {token_address[:8]}...")
-                    return {
-                        'name': data.get('name', 'Token Desconhecido'),
-                        'symbol': data.get('symbol', 'N/A'),
-                        'decimals': data.get('decimals', 9),
-                        'logoURI': data.get('logoURI', ''),
-                        'tags': data.get('tags', [])
-                    }
-                else:
-                    print(f"⚠️ Jupiter API também falhou (status {response.status})")
-        except Exception as e:
-            print(f"⚠️ Erro na Jupiter API: {e}")
-        
-        return {}
+            schedule()
+            while pending:
+                page, task = pending.pop(0)
+                transfers = await task
+                if transfers is None:
+                    # Erro: não dá para pular a página sem perder a ordem nem devolver só parte das transferências
+                    raise SolscanPageError(f"página {page} de transferências falhou")
+                
+                for transfer in transfers:
+                    yield transfer
+                
+                if len(transfers) < SOLSCAN_PAGE_SIZE:
+                    print(f"📄 Solscan: fim das transferências na página {page}")
+                    return  # Última página
+                schedule()
+        finally:
+            for _, task in pending:
+                task.cancel()
+    
+    async def get_token_transactions(self, token_address: str, limit: int = 10000) -> List[Dict]:
+        """
+        Busca transações de um token específico no Solscan
+        Retorna transações ordenadas por tempo (mais antigas primeiro)
+        Levanta SolscanPageError se uma página falhar
+        """
+        max_pages = min(SOLSCAN_MAX_PAGES, -(-limit // SOLSCAN_PAGE_SIZE))
+        transactions = []
+        transfers = self.iter_token_transfers(token_address, max_pages=max_pages)
+        try:
+            async for transfer in transfers:
+                transactions.append(transfer)
+                if len(transactions) >= limit:
+                    break
+        finally:
+            await transfers.aclose()
+        return transactions
     
-    async def extract_buyers(self, token_address: str) -> tuple[List[str], Dict]:
+    async def get_token_info(self, token_address: str) -> Dict:
+        """
+        Busca informações básicas do token
+        Tenta primeiro via Solscan, depois via Jupiter API e on-chain como fallback
+        Resultados (inclusive "não encontrado") ficam em cache
+        """
+        return await solana_rpc.metadata.resolve(token_address)
+    
+    def is_cached(self, token_address: str, max_buyers: Optional[int] = MAX_WALLETS_DISPLAY) -> bool:
+        """
+        Busca barata: já há uma busca igual em andamento ou (sem Solscan Pro)
+        um resultado salvo que só precisa da atualização incremental
+        """
+        if self.scans.in_flight((token_address, max_buyers)):
+            return True
+        return not SOLSCAN_PRO_API_KEY and solana_rpc.mint_results.contains(token_address)
+    
+    async def extract_buyers(self, token_address: str, max_buyers: Optional[int] = MAX_WALLETS_DISPLAY) -> tuple[List[str], Dict, BuyerRecords]:
         """
         Extrai a lista de wallets que compraram o token em ordem cronológica
-        Usa API Pro do Solscan (se disponível) ou RPC Solana como fallback
-        Retorna: (lista_de_wallets_ordenada, info_do_token)
+        Padrão (DISCOVERY_STRATEGY=legacy): Solscan Pro e depois RPC; com auto, o planejador de
+        descoberta escolhe entre Solscan Pro e as estratégias via RPC pelo custo estimado
+        Com SOURCE_RACE_ENABLED, Solscan e RPC correm em paralelo (início escalonado)
+        No Solscan, para de paginar ao juntar max_buyers wallets (None = todas)
+        Buscas simultâneas do mesmo token compartilham uma única execução;
+        cada chamador recebe sua própria cópia (pode filtrar/ordenar à vontade)
+        Retorna: (lista_de_wallets_ordenada, info_do_token, BuyerRecords com saldos)
         """
+        buyers, token_info, buyers_with_balance = await self.scans.do(
+            (token_address, max_buyers), lambda: self._extract_buyers(token_address, max_buyers)
+        )
+        return list(buyers), dict(token_info), buyers_with_balance.copy()
+    
+    async def _extract_buyers(self, token_address: str, max_buyers: Optional[int]) -> tuple[List[str], Dict, BuyerRecords]:
+        """Busca efetiva dos compradores (sem compartilhamento)"""
         print(f"Buscando compradores para o token: {token_address}")
         
+        if DISCOVERY_STRATEGY != 'legacy':
+            result = await self.planner.run(token_address, max_buyers)
+            if result:
+                return result
+            print("❌ Nenhuma fonte de dados funcionou")
+            return [], {}, BuyerRecords()
+        
+        if SOLSCAN_PRO_API_KEY and SOURCE_RACE_ENABLED:
+            # Solscan Pro e RPC em paralelo (RPC começa depois): a primeira resposta válida vence
+            winner = await race_sources(
+                [('solscan', lambda: self.extract_buyers_solscan(token_address, max_buyers)),
+                 ('rpc', lambda: solana_rpc.extract_buyers_from_mint(token_address))],
+                SOURCE_RACE_STAGGER, lambda result: valid_result(result, token_address)
+            )
+            if winner:
+                print(f"✅ {winner[0]}: {len(winner[1][0])} wallets encontradas")
+                return winner[1]
+            print("❌ Nenhuma fonte de dados funcionou")
+            return [], {}, BuyerRecords()
+        
         # Verifica se tem API key do Solscan Pro
+        if SOLSCAN_PRO_API_KEY:
+            result = await self.extract_buyers_solscan(token_address, max_buyers)
+            if result:
+                return result
+        
+        # Fallback: usar RPC direto da Solana (gratuito)
+        print("🔄 Usando RPC Solana como alternativa...")
+        try:
+            buyers_rpc, token_info_rpc, balance_info = await solana_rpc.extract_buyers_from_mint(token_address)
+            if buyers_rpc:
+                print(f"✅ RPC Solana: {len(buyers_rpc)} wallets encontradas")
+                return buyers_rpc, token_info_rpc, balance_info
+        except Exception as e:
+            print(f"❌ Erro no RPC Solana: {e}")
+        
+        # Se ambos falharam
+        print("❌ Nenhuma fonte de dados funcionou")
+        return [], {}, BuyerRecords()
+    
+    async def extract_buyers_solscan(self, token_address: str, max_buyers: Optional[int]) -> Optional[tuple[List[str], Dict, BuyerRecords]]:
+        """
+        Compradores pelas transferências do Solscan Pro (ordem cronológica)
+        Retorna None se a API falhar ou não encontrar wallets
+        """
         if SOLSCAN_PRO_API_KEY:
             print("Tentando usar API Pro do Solscan...")
             try:
                 # Busca informações do token
                 token_info = await self.get_token_info(token_address)
                 
-                # Busca transações do token (já ordenadas por tempo)
-                transactions = await self.get_token_transactions(token_address)
+                # Transferências do token página por página (já ordenadas por tempo)
+                transactions = self.iter_token_transfers(token_address)
+                buyers_ordered = []  # Lista ordenada para manter sequência cronológica
+                seen_wallets = set()  # Para evitar duplicatas
                 
-                if transactions:
-                    buyers_ordered = []  # Lista ordenada para manter sequência cronológica
-                    buyers_with_balance = []  # Lista com wallets e saldos
-                    seen_wallets = set()  # Para evitar duplicatas
-                    
-                    for tx in transactions:
+                try:
+                    async for tx in transactions:
+                        if max_buyers and len(buyers_ordered) >= max_buyers:
+                            print(f"⏹️ Solscan: {max_buyers} compradores encontrados, parando a paginação")
+                            break
                         try:
                             # Verifica se é uma transação de compra
                             if 'to_address' in tx and 'from_address' in tx:
@@ -190,49 +299,30 @@ class SolscanAPI:
                         except Exception as e:
                             print(f"Erro ao processar transação: {e}")
                             continue
+                finally:
+                    await transactions.aclose()  # Cancela as páginas ainda em busca
+                
+                if max_buyers:
+                    buyers_ordered = buyers_ordered[:max_buyers]
+                
+                if buyers_ordered:
+                    print(f"✅ API Pro Solscan: {len(buyers_ordered)} wallets encontradas")
+                    
+                    # Busca saldos das wallets encontradas (em lote)
+                    print("💰 Buscando saldos das wallets via RPC...")
+                    balances = await self.get_wallet_balances(buyers_ordered)
+                    # Solscan não tem timestamp individual: a posição na lista é a ordem
+                    buyers_with_balance = BuyerRecords.from_wallets(buyers_ordered, balances)
                     
-                    if buyers_ordered:
-                        print(f"✅ API Pro Solscan: {len(buyers_ordered)} wallets encontradas")
-                        
-                        # Busca saldos das wallets encontradas  
-                        print("💰 Buscando saldos das wallets via RPC...")
-                        buyers_with_balance = []
-                        for wallet in buyers_ordered:  # Busca saldo de todas as wallets
-                            try:
-                                balance = await self.get_wallet_balance(wallet)
-                                buyers_with_balance.append({
-                                    'wallet': wallet,
-                                    'balance': balance,
-                                    'timestamp': 0  # Solscan não tem timestamp individual
-                                })
-                                print(f"💰 {wallet[:8]}... {balance:.2f}")
-                            except:
-                                buyers_with_balance.append({
-                                    'wallet': wallet, 
-                                    'balance': 0.0,
-                                    'timestamp': 0
-                                })
-                        
-                        # Garante ordem cronológica final mesmo no Solscan
-                        print(f"📅 Solscan: Ordem cronológica mantida - {len(buyers_ordered)} wallets")
-                        return buyers_ordered, token_info, buyers_with_balance
+                    # Garante ordem cronológica final mesmo no Solscan
+                    print(f"📅 Solscan: Ordem cronológica mantida - {len(buyers_ordered)} wallets")
+                    return buyers_ordered, token_info, buyers_with_balance
                     
+            except SolscanPageError as e:
+                print(f"❌ Solscan incompleto ({e}) - resultado parcial descartado")
             except Exception as e:
                 print(f"❌ Erro na API Pro do Solscan: {e}")
-        
-        # Fallback: usar RPC direto da Solana (gratuito)
-        print("🔄 Usando RPC Solana como alternativa...")
-        try:
-            buyers_rpc, token_info_rpc, balance_info = await solana_rpc.extract_buyers_from_mint(token_address)
-            if buyers_rpc:
-                print(f"✅ RPC Solana: {len(buyers_rpc)} wallets encontradas")
-                return buyers_rpc, token_info_rpc, balance_info
-        except Exception as e:
-            print(f"❌ Erro no RPC Solana: {e}")
-        
-        # Se ambos falharam
-        print("❌ Nenhuma fonte de dados funcionou")
-        return [], {}, []
+        return None
     
     def validate_token_address(self, address: str) -> bool:
         """
@@ -0,0 +1,190 @@
+import asyncio
+import json
+import os
+import time
+from typing import Dict, Optional
+from config import (
+    SOLSCAN_API_BASE, SOLSCAN_HEADERS, SOLSCAN_PRO_API_KEY,
+    METADATA_CACHE_TTL, METADATA_NEGATIVE_TTL, METADATA_CACHE_MAX_ENTRIES,
+    METADATA_CACHE_PATH, METADATA_FETCH_TIMEOUT, METADATA_SAVE_DELAY
+)
+from cache import TTLCache
+from singleflight import SingleFlight
+from transport import transport
+from metrics import metrics
+
+class TokenMetadataResolver:
+    """
+    Resolve nome/símbolo/decimais de um token: Solscan -> Jupiter -> on-chain
+    Metadados quase nunca mudam, então ficam em cache por METADATA_CACHE_TTL
+    e são salvos em disco para sobreviver a reinícios. Tokens não encontrados
+    (ou só com decimais on-chain) ficam em cache por METADATA_NEGATIVE_TTL,
+    para não pagar toda a cadeia de fallbacks a cada consulta; falhas temporárias
+    (timeout, 5xx, 429) não entram no cache. Consultas simultâneas do mesmo token
+    compartilham uma só busca.
+    As gravações em disco são agrupadas (uma a cada METADATA_SAVE_DELAY segundos)
+    e feitas fora do event loop; flush() grava o que faltar ao encerrar.
+    """
+    def __init__(self, rpc, path: str = METADATA_CACHE_PATH):
+        self.rpc = rpc  # Instância de SolanaRPC (Jupiter e getAccountInfo)
+        self.path = path
+        self.cache = TTLCache(ttl=METADATA_CACHE_TTL, max_entries=METADATA_CACHE_MAX_ENTRIES, name='metadata')
+        self._expires_at: Dict[str, float] = {}  # mint -> expiração em tempo real (para salvar em disco)
+        self.flights = SingleFlight('metadata')
+        self._loaded = False
+        self._dirty = False
+        self._save_task = None  # Gravação agendada (uma por vez)
+
+    def _read(self) -> Dict:
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    async def _load(self):
+        """Carrega o cache salvo em disco, descartando entradas expiradas"""
+        self._loaded = True
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            saved = await asyncio.to_thread(self._read)
+            now = time.time()
+            for mint, entry in saved.items():
+                remaining = entry.get('expires_at', 0) - now
+                if remaining > 0:
+                    self.cache.set(mint, entry.get('data', {}), ttl=remaining)
+                    self._expires_at[mint] = entry['expires_at']
+            print(f"💾 Cache de metadados carregado: {len(self.cache)} tokens")
+        except Exception as e:
+            print(f"⚠️ Erro ao carregar cache de metadados: {e}")
+
+    def _snapshot(self) -> Dict:
+        """Entradas ainda válidas, no formato do arquivo"""
+        now = time.time()
+        saved = {}
+        for mint, expires_at in list(self._expires_at.items()):
+            data = self.cache.peek(mint)
+            if expires_at <= now or data is None:
+                del self._expires_at[mint]
+                continue
+            saved[mint] = {'data': data, 'expires_at': expires_at}
+        return saved
+
+    def _write(self, saved: Dict):
+        """Escrita atômica (roda em outra thread)"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(saved, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    async def _save(self):
+        """Salva o cache em disco se houver alterações"""
+        if not self.path or not self._dirty:
+            return
+        self._dirty = False
+        try:
+            await asyncio.to_thread(self._write, self._snapshot())
+        except Exception as e:
+            self._dirty = True  # Tenta de novo na próxima gravação
+            print(f"⚠️ Erro ao salvar cache de metadados: {e}")
+
+    async def _save_later(self):
+        await asyncio.sleep(METADATA_SAVE_DELAY)
+        await self._save()
+
+    def _store(self, mint_address: str, data: Dict, ttl: float):
+        self.cache.set(mint_address, data, ttl=ttl)
+        self._expires_at[mint_address] = time.time() + ttl
+        self._dirty = True
+        # Agrupa as gravações: uma só tarefa pendente por vez
+        if self.path and (self._save_task is None or self._save_task.done()):
+            self._save_task = asyncio.get_running_loop().create_task(self._save_later())
+
+    async def flush(self):
+        """Grava imediatamente as alterações pendentes (ao encerrar o bot)"""
+        if self._save_task is not None and not self._save_task.done():
+            self._save_task.cancel()
+            try:
+                await self._save_task
+            except asyncio.CancelledError:
+                pass
+        self._save_task = None
+        await self._save()
+
+    async def resolve(self, mint_address: str) -> Dict:
+        """
+        Retorna os metadados do token (name, symbol, decimals, logoURI, tags, source)
+        Dicionário vazio se nenhuma fonte conhecer o token
+        """
+        if not self._loaded:
+            await self._load()
+
+        cached = self.cache.get(mint_address)
+        if cached is not None:
+            print(f"💾 Metadados em cache para {mint_address[:8]}... ({cached.get('source', 'não encontrado')})")
+            return dict(cached)
+
+        return dict(await self.flights.do(mint_address, lambda: self._resolve(mint_address)))
+
+    async def _resolve(self, mint_address: str) -> Dict:
+        """
+        Cadeia de fontes; cada fetch devolve os metadados, {} se a fonte não conhece
+        o token ou None se falhou (e aí o resultado não pode ser dado como "não encontrado")
+        """
+        solscan = await self._fetch_solscan(mint_address)
+        if solscan:
+            self._store(mint_address, solscan, METADATA_CACHE_TTL)
+            return solscan
+        jupiter = await self._fetch_jupiter(mint_address)
+        if jupiter:
+            self._store(mint_address, jupiter, METADATA_CACHE_TTL)
+            return jupiter
+
+        # Sem nome/símbolo: guarda o que houver on-chain (ou nada) por pouco tempo
+        onchain = await self._fetch_onchain(mint_address)
+        if solscan is None or jupiter is None or onchain is None:
+            print(f"⚠️ Metadados de {mint_address[:8]}... incompletos por falha temporária - fora do cache")
+            return onchain or {}
+        self._store(mint_address, onchain, METADATA_NEGATIVE_TTL)
+        return onchain
+
+    async def _fetch_solscan(self, mint_address: str) -> Optional[Dict]:
+        if not SOLSCAN_PRO_API_KEY:
+            return {}
+        started = time.monotonic()
+        try:
+            response = await transport.request('solscan', 'token/meta', 'GET', f"{SOLSCAN_API_BASE}/token/meta",
+                                               params={'address': mint_address}, headers=SOLSCAN_HEADERS,
+                                               timeout=METADATA_FETCH_TIMEOUT)
+            metrics.record_request('solscan', response.status, started, len(response.body), response.wire_size,
+                                   endpoint='token/meta')
+            if response.status == 200:
+                data = await response.json_async()
+                token_data = data.get('data', {})
+                if token_data and token_data.get('symbol'):
+                    print(f"✅ Solscan: Metadados encontrados para {mint_address[:8]}...")
+                    return {**token_data, 'source': 'solscan'}
+                return {}
+            if response.status == 404:
+                return {}
+            print(f"⚠️ Solscan API falhou (status {response.status}), tentando Jupiter...")
+        except Exception as e:
+            metrics.record_request('solscan', 'error', started, endpoint='token/meta')
+            print(f"⚠️ Erro no Solscan: {e}, tentando Jupiter API...")
+        return None
+
+    async def _fetch_jupiter(self, mint_address: str) -> Optional[Dict]:
+        metadata = await self.rpc.get_token_metadata_jupiter(mint_address, timeout=METADATA_FETCH_TIMEOUT)
+        return {**metadata, 'source': 'jupiter'} if metadata else metadata
+
+    async def _fetch_onchain(self, mint_address: str) -> Optional[Dict]:
+        """Conta do mint: só decimais (o programa de token não guarda nome/símbolo)"""
+        try:
+            account_info = await self.rpc.get_account_info(mint_address)
+        except Exception as e:
+            print(f"⚠️ Erro ao buscar metadados on-chain: {e}")
+            return None
+        if account_info is None:
+            return None  # Todas as RPCs falharam (conta inexistente vem como value: null)
+        parsed_info = ((account_info.get('value') or {}).get('data') or {}).get('parsed', {}).get('info', {})
+        if 'decimals' in parsed_info:
+            return {'decimals': parsed_info['decimals'], 'source': 'onchain'}
+        return {}
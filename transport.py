@@ -0,0 +1,255 @@
+import aiohttp
+import asyncio
+import atexit
+import gzip
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Deque, Dict, Optional, Tuple
+from config import (
+    TRANSPORT_MODE, TRANSPORT_FIXTURE_PATH, TRANSPORT_REPLAY_SPEED, HTTP_COMPRESSION, JSON_OFFLOAD_BYTES
+)
+from http_session import http_session
+
+try:
+    import orjson  # Opcional: decodificação JSON bem mais rápida
+except ImportError:
+    orjson = None
+
+try:
+    from aiohttp.compression_utils import HAS_BROTLI  # aiohttp só descompacta br com o pacote Brotli
+except ImportError:
+    HAS_BROTLI = False
+
+# Sem compressão pede 'identity' explicitamente (o aiohttp pediria gzip por padrão)
+ACCEPT_ENCODING = ('gzip, deflate, br' if HAS_BROTLI else 'gzip, deflate') if HTTP_COMPRESSION else 'identity'
+
+# Chamadas em lote cujo agrupamento depende do tempo (janela do BalanceService): no replay
+# a resposta é remontada item a item quando o lote exato não foi gravado
+SPLITTABLE_METHODS = {'getMultipleAccounts', 'batch'}
+
+# Cabeçalhos de resposta guardados na gravação (nunca os da requisição, que têm chaves de API)
+RECORDED_HEADERS = ('Retry-After', 'Content-Type')
+
+class ReplayMissError(aiohttp.ClientError):
+    """Requisição sem resposta gravada (tratada pelos chamadores como erro de rede)"""
+
+def json_loads(data: bytes) -> Any:
+    """orjson quando instalado, json da biblioteca padrão como alternativa"""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass  # Ex.: inteiros acima de 64 bits; o json padrão aceita
+    return json.loads(data)
+
+class TransportResponse:
+    """Resposta HTTP já lida (da rede ou do arquivo gravado)"""
+    def __init__(self, status: int, body: bytes, headers: Optional[Dict[str, str]] = None,
+                 wire_size: Optional[int] = None):
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+        self.wire_size = len(body) if wire_size is None else wire_size  # Bytes na rede (comprimidos)
+
+    def json(self) -> Any:
+        return json_loads(self.body)
+
+    async def json_async(self) -> Any:
+        """Decodifica o corpo; respostas grandes são decodificadas em outra thread para não travar o event loop"""
+        if len(self.body) >= JSON_OFFLOAD_BYTES:
+            return await asyncio.to_thread(json_loads, self.body)
+        return json_loads(self.body)
+
+def _canonical(key: Any) -> str:
+    return json.dumps(key, sort_keys=True, separators=(',', ':'))
+
+class Transport:
+    """
+    Ponto único de saída HTTP do bot (RPC, Solscan, Jupiter)
+    - live: só faz a requisição
+    - record: faz a requisição e grava requisição/resposta/latência em JSONL (gzip)
+    - replay: responde do arquivo gravado, sem rede (inclusive 429, timeouts e erros)
+    Cada chamada é identificada por (serviço, nome, chave): para RPC, o método e os params.
+    Chamadas repetidas com a mesma chave recebem as respostas na ordem gravada
+    (a última se repete quando acabarem).
+    """
+    def __init__(self, mode: str = TRANSPORT_MODE, path: str = TRANSPORT_FIXTURE_PATH,
+                 replay_speed: float = TRANSPORT_REPLAY_SPEED):
+        self.mode = mode
+        self.path = path
+        self.replay_speed = replay_speed
+        self._file = None
+        self._writer: Optional[ThreadPoolExecutor] = None  # Uma thread: grava fora do event loop, na ordem das respostas
+        self._replay: Dict[Tuple[str, str, str], Deque[Dict]] = {}
+        self._last: Dict[Tuple[str, str, str], Dict] = {}
+        self._items: Dict[Tuple[str, str], Any] = {}  # Itens de lotes gravados: (método, params) -> resultado
+        self._loaded = False
+        self.stats = {'requests': 0, 'recorded': 0, 'replayed': 0, 'misses': 0}
+
+    @property
+    def live(self) -> bool:
+        return self.mode != 'replay'
+
+    def _load(self):
+        """Carrega as respostas gravadas (modo replay)"""
+        self._loaded = True
+        try:
+            with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    key = (entry['service'], entry['method'], _canonical(entry.get('params')))
+                    self._replay.setdefault(key, deque()).append(entry)
+                    if entry['method'] in SPLITTABLE_METHODS and entry.get('status') == 200:
+                        self._index_items(entry)
+            print(f"📼 Replay: {sum(len(q) for q in self._replay.values())} respostas carregadas de {self.path}")
+        except Exception as e:
+            print(f"⚠️ Erro ao carregar gravação {self.path}: {e}")
+
+    def _index_items(self, entry: Dict):
+        response = entry.get('response')
+        if entry['method'] == 'batch' and isinstance(response, list):
+            by_id = {item.get('id'): item for item in response if isinstance(item, dict)}
+            for i, (method, params) in enumerate(entry['params']):
+                if 'result' in by_id.get(i, {}):
+                    self._items[(method, _canonical(params))] = by_id[i]['result']
+        elif entry['method'] == 'getMultipleAccounts' and isinstance(response, dict) and 'result' in response:
+            addresses, options = entry['params'][0], entry['params'][1:]
+            for address, value in zip(addresses, response['result'].get('value', [])):
+                self._items[('getAccountInfo', _canonical([address] + options))] = value
+
+    def _split_replay(self, method: str, key: Any) -> Optional[Any]:
+        """Resposta de um lote não gravado montada a partir dos itens de outros lotes (None se faltar algum)"""
+        missing = object()
+        if method == 'batch':
+            results = [self._items.get((inner, _canonical(params)), missing) for inner, params in key]
+            if any(result is missing for result in results):
+                return None
+            return [{'jsonrpc': '2.0', 'id': i, 'result': result} for i, result in enumerate(results)]
+        addresses, options = key[0], list(key[1:])
+        values = [self._items.get(('getAccountInfo', _canonical([address] + options)), missing) for address in addresses]
+        if any(value is missing for value in values):
+            return None
+        return {'jsonrpc': '2.0', 'id': 0, 'result': {'context': {'slot': 0}, 'value': values}}
+
+    def _write(self, entry: Dict):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Append em gzip cria um novo membro; gzip.open lê todos em sequência
+            self._file = gzip.open(self.path, 'at', encoding='utf-8')
+            atexit.register(self.close)
+            print(f"⏺️ Gravando requisições em {self.path}")
+        self._file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        self.stats['recorded'] += 1
+
+    def close(self):
+        """Espera as gravações pendentes e fecha o arquivo (chamado no encerramento)"""
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+            self._writer = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    async def request(self, service: str, method: str, http_method: str, url: str, key: Any = None, *,
+                      json_body: Any = None, params: Optional[Dict] = None, headers: Optional[Dict] = None,
+                      timeout: float = 60) -> TransportResponse:
+        """
+        Faz (ou reproduz) uma requisição HTTP e retorna a resposta já lida
+        key identifica a chamada na gravação (padrão: params da query)
+        Timeouts e erros de rede são propagados como asyncio.TimeoutError / aiohttp.ClientError
+        """
+        self.stats['requests'] += 1
+        key = params if key is None else key
+        if self.mode == 'replay':
+            return await self._replayed(service, method, key)
+
+        started = time.monotonic()
+        try:
+            session = await http_session.get_session()
+            headers = {**(headers or {}), 'Accept-Encoding': ACCEPT_ENCODING}
+            async with session.request(http_method, url, json=json_body, params=params, headers=headers,
+                                       timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                body = await response.read()
+                # O aiohttp já entrega descomprimido; o tamanho na rede vem do Content-Length
+                compressed = response.headers.get('Content-Encoding', 'identity') != 'identity'
+                wire_size = response.content_length if compressed and response.content_length else len(body)
+                result = TransportResponse(response.status, body,
+                                           {name: response.headers[name] for name in RECORDED_HEADERS
+                                            if name in response.headers}, wire_size)
+        except asyncio.TimeoutError:
+            self._record(service, method, key, started, outcome='timeout')
+            raise
+        except aiohttp.ClientError as e:
+            self._record(service, method, key, started, outcome='error', error=str(e))
+            raise
+        self._record(service, method, key, started, response=result)
+        return result
+
+    def _record(self, service: str, method: str, key: Any, started: float, response: Optional[TransportResponse] = None,
+                outcome: str = 'response', error: str = ''):
+        if self.mode != 'record':
+            return
+        entry = {'service': service, 'method': method, 'params': key, 'outcome': outcome,
+                 'elapsed': round(time.monotonic() - started, 4)}
+        if error:
+            entry['error'] = error
+        # Decodificar a resposta e comprimir a linha custa caro em sessões grandes: fica na thread de gravação
+        if self._writer is None:
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='transport-record')
+        self._writer.submit(self._record_entry, entry, response)
+
+    def _record_entry(self, entry: Dict, response: Optional[TransportResponse]):
+        """Monta e grava uma linha da gravação (roda na thread de gravação; erros só viram aviso)"""
+        try:
+            if response is not None:
+                entry['status'] = response.status
+                entry['headers'] = response.headers
+                entry['wire_size'] = response.wire_size
+                try:
+                    entry['response'] = response.json()
+                except ValueError:
+                    entry['text'] = response.body.decode('utf-8', 'replace')
+                # Resultado de chamada RPC simples também no formato das fixtures do mock_rpc_server.py
+                if entry['service'] == 'rpc' and isinstance(entry.get('response'), dict) and 'result' in entry['response']:
+                    entry['result'] = entry['response']['result']
+            self._write(entry)
+        except Exception as e:
+            print(f"⚠️ Erro ao gravar requisição em {self.path}: {e}")
+
+    async def _replayed(self, service: str, method: str, key: Any) -> TransportResponse:
+        if not self._loaded:
+            self._load()
+        lookup = (service, method, _canonical(key))
+        queue = self._replay.get(lookup)
+        entry = queue.popleft() if queue else self._last.get(lookup)
+        if entry is None and method in SPLITTABLE_METHODS:
+            response = self._split_replay(method, key)
+            if response is not None:
+                entry = {'outcome': 'response', 'status': 200, 'response': response}
+        if entry is None:
+            self.stats['misses'] += 1
+            raise ReplayMissError(f"sem resposta gravada para {service} {method}")
+        self._last[lookup] = entry
+        self.stats['replayed'] += 1
+
+        if self.replay_speed > 0:
+            await asyncio.sleep(entry.get('elapsed', 0) * self.replay_speed)
+        if entry['outcome'] == 'timeout':
+            raise asyncio.TimeoutError()
+        if entry['outcome'] == 'error':
+            raise aiohttp.ClientError(entry.get('error', 'erro gravado'))
+        if 'response' in entry:
+            body = json.dumps(entry['response']).encode()
+        else:
+            body = entry.get('text', '').encode()
+        return TransportResponse(entry['status'], body, entry.get('headers'), entry.get('wire_size'))
+
+# Instância global do transporte
+transport = Transport()
@@ -0,0 +1,31 @@
+import base64
+from typing import Dict, Optional
+from tx_store import trim_transaction
+
+try:
+    from solders.transaction import VersionedTransaction  # Decodificação binária em Rust
+except ImportError:
+    VersionedTransaction = None
+
+def decode_available() -> bool:
+    return VersionedTransaction is not None
+
+def decode_transaction(tx: Dict) -> Optional[Dict]:
+    """
+    Resposta de getTransaction com encoding base64 -> formato de trim_transaction
+    accountKeys = chaves estáticas da mensagem + endereços carregados de lookup tables
+    (writable, depois readonly), na mesma ordem do jsonParsed.
+    Retorna None se não for possível decodificar (o chamador busca em jsonParsed).
+    """
+    data = tx.get('transaction')
+    if VersionedTransaction is None or not isinstance(data, list) or len(data) < 2 or data[1] != 'base64':
+        return None
+    try:
+        decoded = VersionedTransaction.from_bytes(base64.b64decode(data[0]))
+    except Exception:
+        return None
+
+    loaded = (tx.get('meta') or {}).get('loadedAddresses') or {}
+    account_keys = [str(key) for key in decoded.message.account_keys]
+    account_keys += loaded.get('writable', []) + loaded.get('readonly', [])
+    return trim_transaction({**tx, 'transaction': {'message': {'accountKeys': account_keys}}})
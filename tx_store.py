@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Armazenamento local (SQLite) de transações confirmadas, indexado por signature
+
+Uma transação confirmada nunca muda, então cada signature só precisa ser
+buscada no RPC uma vez. Guarda apenas os campos usados pelo extrator de
+compradores: accountKeys, blockTime, slot, err e saldos de token.
+
+Uso pela linha de comando:
+    python tx_store.py stats      # Mostra tamanho e contadores
+    python tx_store.py compact    # Aplica os limites (entradas e tamanho) e faz VACUUM
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, Optional
+from config import TX_STORE_ENABLED, TX_STORE_PATH, TX_STORE_MAX_ENTRIES, TX_STORE_MAX_MB, TX_STORE_WRITE_BATCH
+
+def trim_transaction(tx: Dict) -> Dict:
+    """
+    Reduz a resposta de getTransaction aos campos que o extrator usa
+    Mantém o mesmo formato (transaction.message.accountKeys, meta, blockTime, slot)
+    """
+    meta = tx.get('meta') or {}
+    message = (tx.get('transaction') or {}).get('message', {})
+
+    account_keys = []
+    for account_key in message.get('accountKeys', []):
+        if isinstance(account_key, str):
+            account_keys.append(account_key)
+        else:
+            account_keys.append(account_key.get('pubkey', ''))
+
+    return {
+        'blockTime': tx.get('blockTime'),
+        'slot': tx.get('slot'),
+        'meta': {
+            'err': meta.get('err'),
+            'preTokenBalances': meta.get('preTokenBalances', []),
+            'postTokenBalances': meta.get('postTokenBalances', []),
+            'loadedAddresses': meta.get('loadedAddresses', {})
+        },
+        'transaction': {
+            'message': {
+                'accountKeys': account_keys
+            }
+        }
+    }
+
+class TransactionStore:
+    """
+    Cache em disco de transações com remoção das menos acessadas ao passar de um dos
+    limites: número de entradas ou tamanho (soma dos dados, TX_STORE_MAX_MB)
+    Inserções e atualizações de accessed_at ficam em memória e são gravadas em lote
+    (um commit a cada TX_STORE_WRITE_BATCH escritas); o bot usa get_async/put_async,
+    que fazem o acesso ao SQLite em outra thread, fora do event loop.
+    """
+    def __init__(self, path: str = TX_STORE_PATH, max_entries: int = TX_STORE_MAX_ENTRIES,
+                 write_batch: int = TX_STORE_WRITE_BATCH, max_bytes: int = int(TX_STORE_MAX_MB * 1024 * 1024)):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes  # Soma de length(data): jsonParsed e base64 têm tamanhos bem diferentes
+        self.write_batch = max(1, write_batch)
+        self.conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()  # A conexão é usada pelas threads do asyncio.to_thread, uma por vez
+        self._pending: Dict[str, tuple] = {}  # Inserções ainda não gravadas (signature -> linha)
+        self._touched: Dict[str, float] = {}  # accessed_at ainda não gravados
+        self.entry_count = 0
+        self.data_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS transactions (
+                    signature TEXT PRIMARY KEY,
+                    slot INTEGER,
+                    block_time INTEGER,
+                    data TEXT NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_transactions_accessed ON transactions (accessed_at)")
+            self.conn.commit()
+            self._recount()
+            print(f"💾 Armazenamento de transações: {self.entry_count} entradas "
+                  f"({self.data_bytes / 1024 / 1024:.1f} MB) em {self.path}")
+        return self.conn
+
+    def _recount(self):
+        self.entry_count, self.data_bytes = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length(data)), 0) FROM transactions"
+        ).fetchone()
+
+    def over_limit(self) -> bool:
+        return self.entry_count > self.max_entries or self.data_bytes > self.max_bytes
+
+    def get(self, signature: str) -> Optional[Dict]:
+        """Retorna a transação armazenada (formato reduzido) ou None"""
+        with self._lock:
+            pending = self._pending.get(signature)
+            if pending is not None:
+                data = pending[3]
+            else:
+                row = self._connect().execute("SELECT data FROM transactions WHERE signature = ?", (signature,)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                data = row[0]
+                self._touched[signature] = time.time()
+                self._maybe_flush()
+            self.hits += 1
+        return json.loads(data)
+
+    def put(self, signature: str, tx: Dict) -> Dict:
+        """Armazena a transação (reduzida) e devolve a versão reduzida"""
+        trimmed = trim_transaction(tx)
+        row = (signature, trimmed.get('slot'), trimmed.get('blockTime'),
+               json.dumps(trimmed, separators=(',', ':')), time.time())
+        with self._lock:
+            self._pending[signature] = row
+            self._maybe_flush()
+        return trimmed
+
+    async def get_async(self, signature: str) -> Optional[Dict]:
+        return await asyncio.to_thread(self.get, signature)
+
+    async def put_async(self, signature: str, tx: Dict) -> Dict:
+        return await asyncio.to_thread(self.put, signature, tx)
+
+    async def flush_async(self):
+        await asyncio.to_thread(self.flush)
+
+    def _maybe_flush(self):
+        if len(self._pending) + len(self._touched) >= self.write_batch:
+            self.flush()
+
+    def flush(self):
+        """Grava as inserções e os accessed_at pendentes em um único commit"""
+        with self._lock:
+            if not self._pending and not self._touched:
+                return
+            conn = self._connect()
+            if self._pending:
+                cursor = conn.executemany(
+                    "INSERT OR IGNORE INTO transactions (signature, slot, block_time, data, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    list(self._pending.values())
+                )
+                if cursor.rowcount == len(self._pending):
+                    self.entry_count += cursor.rowcount
+                    self.data_bytes += sum(len(row[3]) for row in self._pending.values())
+                else:
+                    self._recount()  # Alguma já existia (INSERT OR IGNORE): soma exata pelo banco
+            if self._touched:
+                conn.executemany("UPDATE transactions SET accessed_at = ? WHERE signature = ?",
+                                 [(accessed_at, signature) for signature, accessed_at in self._touched.items()])
+            conn.commit()
+            self._pending.clear()
+            self._touched.clear()
+
+            if self.over_limit():
+                self.evict()
+
+    def evict(self, ratio: float = 0.9) -> int:
+        """
+        Remove as entradas acessadas há mais tempo até ficar em ratio (90%) dos dois limites
+        (folga para não remover a cada nova transação)
+        """
+        with self._lock:
+            conn = self._connect()
+            target_entries = int(self.max_entries * ratio)
+            target_bytes = int(self.max_bytes * ratio)
+            excess_entries = self.entry_count - target_entries
+            excess_bytes = self.data_bytes - target_bytes
+            if excess_entries <= 0 and excess_bytes <= 0:
+                return 0
+
+            # Mais antigas primeiro, até cobrir o excesso de entradas e o de bytes
+            victims = []
+            freed = 0
+            for signature, size in conn.execute(
+                "SELECT signature, length(data) FROM transactions ORDER BY accessed_at ASC"
+            ):
+                if len(victims) >= excess_entries and freed >= excess_bytes:
+                    break
+                victims.append((signature,))
+                freed += size
+            conn.executemany("DELETE FROM transactions WHERE signature = ?", victims)
+            conn.commit()
+            self._recount()
+        print(f"🧹 Armazenamento de transações: {len(victims)} entradas antigas removidas "
+              f"({freed / 1024 / 1024:.1f} MB)")
+        return len(victims)
+
+    def compact(self) -> Dict:
+        """Aplica os limites e devolve o espaço livre ao disco (VACUUM)"""
+        size_before = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        self.flush()
+        conn = self._connect()
+        removed = self.evict(ratio=1.0) if self.over_limit() else 0
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("VACUUM")
+        size_after = os.path.getsize(self.path)
+        return {'removed': removed, 'entries': self.entry_count,
+                'size_before': size_before, 'size_after': size_after}
+
+    def stats(self) -> Dict:
+        self.flush()
+        self._connect()
+        return {
+            'entries': self.entry_count,
+            'max_entries': self.max_entries,
+            'data_bytes': self.data_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'size_bytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        }
+
+    def close(self):
+        """Grava o que estiver pendente e fecha a conexão"""
+        with self._lock:
+            self.flush()
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+# Instância global (None se desativado no .env)
+tx_store = TransactionStore() if TX_STORE_ENABLED else None
+
+def main():
+    """Comandos de manutenção do armazenamento"""
+    command = sys.argv[1] if len(sys.argv) > 1 else 'stats'
+    store = TransactionStore()
+
+    if command == 'compact':
+        result = store.compact()
+        print(f"✅ Compactação concluída: {result['removed']} removidas, {result['entries']} entradas")
+        print(f"📦 Tamanho: {result['size_before'] / 1024 / 1024:.1f} MB → {result['size_after'] / 1024 / 1024:.1f} MB")
+    elif command == 'stats':
+        stats = store.stats()
+        print(f"📊 Entradas: {stats['entries']}/{stats['max_entries']}")
+        print(f"🗃️ Dados: {stats['data_bytes'] / 1024 / 1024:.1f}/{stats['max_bytes'] / 1024 / 1024:.0f} MB")
+        print(f"📦 Tamanho: {stats['size_bytes'] / 1024 / 1024:.1f} MB")
+    else:
+        print(f"❌ Comando desconhecido: {command}")
+        print("💡 Use: python tx_store.py [stats|compact]")
+        sys.exit(1)
+
+    store.close()
+
+if __name__ == "__main__":
+    main()